@@ -1,308 +1,25 @@
-import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
-import joblib
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import os, sys, subprocess
-import difflib
-
-# ================= LOAD MODELS =================
-
-def ensure_models():
-    required = {
-        'ensemble_crop_model.pkl': 'Crop_training_model.py',
-        'crop_label_encoders.pkl': 'Crop_training_model.py',
-        'fertilizer_model.pkl': 'Fertilizer_training_model.py',
-        'fertilizer_label_encoders.pkl': 'Fertilizer_training_model.py'
-    }
-
-    missing = [f for f in required if not os.path.exists(f)]
-    if missing:
-        root = tk.Tk()
-        root.withdraw()
-        msg = (
-            "Missing model files:\n" + "\n".join(missing) +
-            "\n\nWould you like to try to create them by running the training scripts?"
-        )
-        if messagebox.askyesno("Missing model files", msg):
-            train_scripts = set(required[file] for file in missing)
-            for script in train_scripts:
-                try:
-                    subprocess.check_call([sys.executable, script])
-                except Exception as e:
-                    messagebox.showerror("Training error", f"Failed to run {script}: {e}")
-                    sys.exit(1)
-
-            missing = [f for f in required if not os.path.exists(f)]
-            if missing:
-                messagebox.showerror("Error", "Still missing: " + ", ".join(missing))
-                sys.exit(1)
-        else:
-            messagebox.showerror("Missing files", "Please run the training scripts to create missing files.")
-            sys.exit(1)
-
-
-ensure_models()
+import time
 
-crop_model = joblib.load('ensemble_crop_model.pkl')
-crop_label_encoders = joblib.load('crop_label_encoders.pkl')
-fertilizer_model = joblib.load('fertilizer_model.pkl')
-fertilizer_label_encoders = joblib.load('fertilizer_label_encoders.pkl')
+import agro_core
+from agro_core import CROP_TARGETS, FERTILIZER_TARGET
+from stage_metrics import METRICS, stage
 
+# The chatbot logic lives here and needs no display. The Tk window is in agro_gui and
+# the models are loaded by agro_core on first use, so importing this module is cheap.
 
-# ================= GUI CLASS =================
-class AgroAidGUI:
-    def __init__(self):
-        self.root = tk.Tk()
-        self.root.title("Agro Aid - Crop & Fertilizer Recommendation")
-        self.root.geometry("800x600")
-        self.root.configure(bg='#1a1a1a')
-
-        self.bot = AgroAidBot()
-        self.bot.display_message = self.display_bot_message
-        self.bot.gui = self            # ⭐ IMPORTANT LINK
-
-        self.setup_gui()
-
-    def setup_gui(self):
-        style = ttk.Style()
-        style.theme_use('clam')
-        style.configure('Dark.TFrame', background='#1a1a1a')
-        style.configure('Dark.TButton', background='#444444', foreground='white', padding=8)
-        style.map('Dark.TButton', background=[('active', '#666666')])
-        style.configure('Input.TEntry', fieldbackground='#333333',
-                        foreground='white', insertcolor='white')
-
-        main_frame = ttk.Frame(self.root, style='Dark.TFrame')
-        main_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
-
-        self.chat_display = scrolledtext.ScrolledText(
-            main_frame, wrap=tk.WORD, width=70, height=20,
-            font=('Arial', 11), bg='#1a1a1a',
-            fg='white', insertbackground='white'
-        )
-        self.chat_display.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
-        self.chat_display.tag_configure('bot', foreground='#008cff', font=('Arial', 11, 'bold'))
-        self.chat_display.tag_configure('user', foreground='#ffffff')
-
-        input_frame = ttk.Frame(main_frame, style='Dark.TFrame')
-        input_frame.pack(fill=tk.X, pady=(0, 10))
-
-        self.input_field = ttk.Entry(input_frame, font=('Arial', 11), style='Input.TEntry')
-        self.input_field.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
-        self.input_field.bind('<Return>', lambda e: self.send_message())
-
-        send_button = ttk.Button(input_frame, text="Send",
-                                 style='Dark.TButton', command=self.send_message)
-        send_button.pack(side=tk.RIGHT)
-
-        # Quick-select area shown below the input for categorical choices (Soil_Type, Crop)
-        self.quick_select_frame = ttk.Frame(main_frame, style='Dark.TFrame')
-        self.quick_select_frame.pack(fill=tk.X, pady=(8, 0))
-        self.quick_options_visible = False
-
-        options_frame = ttk.Frame(main_frame, style='Dark.TFrame')
-        options_frame.pack(fill=tk.X)
-
-        options = [("Crop Prediction", "1"), ("Fertilizer Recommendation", "2")]
-        for text, value in options:
-            ttk.Button(
-                options_frame, text=text, style='Dark.TButton',
-                command=lambda v=value: self.quick_option(v)
-            ).pack(side=tk.LEFT, padx=5)
-
-        self.display_bot_message("Hello! I am Agro Aid. How can I help you today?\n")
-        self.display_bot_message(
-            "Please choose an option:\n1) Crop prediction\n2) Fertilizer recommendation\nType 'quit' to exit"
-        )
-
-    # ========== GRAPH FUNCTION (STEP 2) ==========
-    def show_graph(self, data, title, position='center'):
-        # Position the new graph relative to the main window
-        self.root.update_idletasks()
-        root_x = self.root.winfo_x()
-        root_y = self.root.winfo_y()
-        root_w = self.root.winfo_width()
-        win_w = 600
-        win_h = 400
-
-        if position == 'left':
-            x = root_x + 50
-            y = root_y + 50
-        elif position == 'right':
-            x = root_x + 50 + win_w + 50
-            y = root_y + 50
-        else:
-            x = root_x + max(0, (root_w - win_w) // 2)
-            y = root_y + 50
-
-        window = tk.Toplevel(self.root)
-        window.title(title)
-        window.geometry(f"{win_w}x{win_h}+{x}+{y}")
-
-        labels = list(data.keys())
-        values = list(data.values())
-
-        fig, ax = plt.subplots(figsize=(6, 4))
-        bars = ax.bar(labels, values, color='#008cff')
-        ax.set_title(title, color='white')
-
-        # Friendly parameter names with units when known
-        param_label_map = {
-            'Temperature': 'Temperature (°C)',
-            'Humidity': 'Humidity (%)',
-            'Moisture': 'Moisture (%)',
-            'Nitrogen': 'Nitrogen Level',
-            'Phosphorus': 'Phosphorus Level',
-            'Potassium': 'Potassium Level',
-            'pH_Value': 'pH Value',
-            'Rainfall': 'Rainfall (mm)'
-        }
-
-        # Customize axis labels per-chart according to user request
-        if 'Prediction Probabilities' in title or '%' in title or 'Probabilities' in title:
-            # Probabilities charts: X = class names, Y = percent
-            if 'Crop' in title:
-                xlabel = 'Crop Types'
-            elif 'Fertilizer' in title:
-                xlabel = 'Fertilizer Types'
-            else:
-                xlabel = 'Classes'
-            ylabel = 'Prediction Probability (%)'
-            display_labels = labels
-        elif title == 'Crop Input Analysis':
-            xlabel = 'Soil & Environmental Parameters'
-            ylabel = 'Parameter Value (Units)'
-            display_labels = [param_label_map.get(lbl, lbl) for lbl in labels]
-        elif title == 'Fertilizer Decision Factors':
-            xlabel = 'Nutrient & Soil Factors'
-            ylabel = 'Nutrient Value (kg/ha or %)'
-            display_labels = [param_label_map.get(lbl, lbl) for lbl in labels]
-        else:
-            xlabel = 'Parameters'
-            ylabel = 'Measured Value'
-            display_labels = [param_label_map.get(lbl, lbl) for lbl in labels]
-
-        ax.set_xlabel(xlabel, color='white', labelpad=25)
-        ax.set_ylabel(ylabel, color='white')
-
-        # Ensure tick positions match labels to avoid matplotlib warnings
-        ax.set_xticks(range(len(labels)))
-        ax.set_xticklabels(display_labels, rotation=30, ha='right', color='white')
-        ax.tick_params(colors='white')
-        # Match the GUI dark background for better contrast
-        fig.patch.set_facecolor('#1a1a1a')
-        ax.set_facecolor('#1a1a1a')
-
-        # Annotate bars with their exact values for clarity
-        try:
-            max_val = max(values) if len(values) else 0
-        except Exception:
-            max_val = 0
-        y_offset = max_val * 0.02 if max_val else 0.5
-        for bar, val in zip(bars, values):
-            # Format value: integer if close to int, else 2 decimal places
-            try:
-                fval = float(val)
-                if abs(fval - round(fval)) < 1e-6:
-                    label_text = f"{int(round(fval))}"
-                else:
-                    label_text = f"{fval:.2f}"
-            except Exception:
-                label_text = str(val)
-
-            # Append percent sign for percentage charts
-            if '%' in title or 'Percent' in title:
-                label_text = f"{label_text}%"
 
-            ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + y_offset, label_text,
-                    ha='center', color='white', fontsize=10, weight='bold')
+def __getattr__(name):
+    # Keep the old module-level names (Agro.crop_model, Agro.AgroAidGUI, ...) working lazily
+    if name in agro_core.MODEL_FILES:
+        return agro_core.load(name)
+    if name in ('AgroAidGUI', 'ensure_models'):
+        import agro_gui
+        return getattr(agro_gui, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-        canvas = FigureCanvasTkAgg(fig, master=window)
-        # Use tight_layout to avoid x-label clipping where possible
-        try:
-            fig.tight_layout()
-        except Exception:
-            pass
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True) 
-
-    def display_bot_message(self, message):
-        self.chat_display.insert(tk.END, f"🤖 Bot: {message}\n", 'bot')
-        self.chat_display.see(tk.END)
-
-    def display_user_message(self, message):
-        self.chat_display.insert(tk.END, f"👤 You: {message}\n", 'user')
-        self.chat_display.see(tk.END)
-
-    def send_message(self):
-        message = self.input_field.get().strip()
-        if message:
-            self.input_field.delete(0, tk.END)
-            self.display_user_message(message)
-            if message.lower() == 'quit':
-                self.display_bot_message("Goodbye! 👋")
-                self.root.after(1000, self.root.destroy)
-                return
-            self.bot.process_input(message)
-
-    def quick_option(self, option):
-        self.input_field.delete(0, tk.END)
-        self.input_field.insert(0, option)
-        self.send_message()
-
-    def run(self):
-        self.root.mainloop()
-
-    # ---------- Inline quick-select helpers (GUI methods) ----------
-    def show_quick_options(self, key):
-        # Clear existing
-        for child in self.quick_select_frame.winfo_children():
-            child.destroy()
-
-        options = []
-        label_text = key
-        if key == 'Soil_Type':
-            options = list(fertilizer_label_encoders['Soil_Type'].classes_)
-            label_text = 'Soil Types:'
-        elif key == 'Crop':
-            options = list(fertilizer_label_encoders['Crop'].classes_)
-            label_text = 'Crops:'
-
-        # Title label
-        lbl = tk.Label(self.quick_select_frame, text=label_text, bg='#1a1a1a', fg='white')
-        lbl.pack(anchor='w', padx=5)
-
-        btn_frame = ttk.Frame(self.quick_select_frame, style='Dark.TFrame')
-        btn_frame.pack(fill=tk.X, padx=5, pady=5)
-
-        # Create buttons for options
-        for opt in options:
-            b = tk.Button(btn_frame, text=opt, bg='#333333', fg='white', activebackground='#555555',
-                          relief=tk.RAISED, bd=1, command=lambda o=opt: self.select_quick_option(o))
-            b.pack(side=tk.LEFT, padx=4, pady=2)
-
-        # Also print options in the chat for visibility (in case buttons aren't visible)
-        if options:
-            try:
-                self.display_bot_message('Options: ' + ', '.join(options))
-            except Exception:
-                pass
 
-        self.quick_options_visible = True
-
-    def hide_quick_options(self):
-        for child in self.quick_select_frame.winfo_children():
-            child.destroy()
-        self.quick_options_visible = False
-
-    def select_quick_option(self, option):
-        # Insert into input and submit
-        self.input_field.delete(0, tk.END)
-        self.input_field.insert(0, option)
-        # Auto-send selection
-        self.send_message()
+# Ranked alternatives listed after each recommendation
+TOP_K = 3
 
 
 # ================= BOT CLASS =================
@@ -313,6 +30,9 @@ class AgroAidBot:
         self.step_index = 0
         self.display_message = print
         self.gui = None
+        # runner(compute, deliver) moves model work off the caller's thread (set by the GUI);
+        # when None, predictions run synchronously
+        self.runner = None
 
         self.crop_steps = [
             'Nitrogen', 'Phosphorus', 'Potassium',
@@ -348,7 +68,7 @@ class AgroAidBot:
             if self.step_index < len(self.crop_steps):
                 self.display_message(f"Please enter {self.crop_steps[self.step_index]}:")
             else:
-                self.run_crop_prediction()
+                self.request_prediction('crop')
                 self.state = 'main_menu'
 
         elif self.state == 'fertilizer_start':
@@ -377,18 +97,21 @@ class AgroAidBot:
                 else:
                     self.display_message(f"Please enter {next_key}:")
             else:
-                self.run_fertilizer_prediction()
+                self.request_prediction('fertilizer')
                 self.state = 'main_menu'
 
     def prompt_selection(self, key):
         # Keep modal selection for backward compatibility (not used by inline flow)
+        import tkinter as tk
+        from tkinter import ttk
+
         options = []
         title = key
         if key == 'Soil_Type':
-            options = list(fertilizer_label_encoders['Soil_Type'].classes_)
+            options = list(agro_core.fertilizer_label_encoders()['Soil_Type'].classes_)
             title = 'Select Soil Type'
         elif key == 'Crop':
-            options = list(fertilizer_label_encoders['Crop'].classes_)
+            options = list(agro_core.fertilizer_label_encoders()['Crop'].classes_)
             title = 'Select Crop'
         else:
             return None
@@ -427,140 +150,203 @@ class AgroAidBot:
         # Auto-send selection
         self.send_message()
 
+    # ---------- Predictions: compute (any thread) / present (GUI thread) ----------
+    def request_prediction(self, flow, background=True):
+        # Snapshot the inputs so the user can start the next question while this computes
+        compute = self.compute_crop_prediction if flow == 'crop' else self.compute_fertilizer_prediction
+        inputs = dict(self.inputs)
+        start = time.perf_counter()
+
+        def deliver(result):
+            self.present_result(result)
+            METRICS.observe(flow, 'total', time.perf_counter() - start)
+
+        if background and self.runner is not None:
+            self.runner(lambda: compute(inputs), deliver)
+        else:
+            deliver(compute(inputs))
+
     def run_crop_prediction(self):
-        try:
-            for key in self.crop_steps:
-                self.inputs[key] = float(self.inputs[key])
+        self.request_prediction('crop', background=False)
 
-            df = pd.DataFrame([self.inputs])
-            pred = crop_model.predict(df)[0]
+    def run_fertilizer_prediction(self):
+        self.request_prediction('fertilizer', background=False)
 
-            # Correctly map outputs: [Crop, Soil_Type, Variety]
-            crop_pred = crop_label_encoders['Crop'].inverse_transform([pred[0]])[0]
-            soil = crop_label_encoders['Soil_Type'].inverse_transform([pred[1]])[0]
-            variety = crop_label_encoders['Variety'].inverse_transform([pred[2]])[0]
+    def present_result(self, result):
+        try:
+            for message in result['messages']:
+                self.display_message(message)
+            for stage_name, data, title, position in result['graphs']:
+                with stage(result['flow'], stage_name):
+                    self.gui.show_graph(data, title, position=position)
+        except Exception as e:
+            self.display_message(f"❌ Error: {e}")
 
-            self.display_message(f"🌾 Recommended Crop: {crop_pred}")
-            self.display_message(f"✅ Suitable Soil Type: {soil}")
-            self.display_message(f"🌾 Recommended Crop Variety: {variety}")
+    def compute_crop_prediction(self, inputs):
+        # Model work only, no display calls, so it is safe off the Tk thread
+        messages, graphs = [], []
+        try:
+            with stage('crop', 'parse'):
+                problems = agro_core.input_errors('crop', inputs)
+                if problems:
+                    messages.extend(f"❌ {problem}" for problem in problems)
+                    return {'flow': 'crop', 'messages': messages, 'graphs': graphs}
+                messages.extend(f"⚠️ {warning}" for warning in agro_core.input_warnings('crop', inputs))
+                inputs = {key: float(inputs[key]) for key in self.crop_steps}
+
+            with stage('crop', 'frame'):
+                df = agro_core.crop_frame([inputs])
+            # One predict_proba pass per output; labels are its argmax
+            with stage('crop', 'predict'):
+                results = agro_core.predict_crop(df)
+
+            with stage('crop', 'decode'):
+                # Correctly map outputs: [Crop, Soil_Type, Variety]
+                crop_pred, soil, variety = (agro_core.top_labels(*results[t])[0][0] for t in CROP_TARGETS)
+                # Best (Crop, Soil_Type, Variety) combinations seen in training, ranked jointly
+                plans, plan_probs = agro_core.rank_crop_plans(results, TOP_K)
+
+            messages.append(f"🌾 Recommended Crop: {crop_pred}")
+            messages.append(f"✅ Suitable Soil Type: {soil}")
+            messages.append(f"🌾 Recommended Crop Variety: {variety}")
+            messages.append("🏆 Top crop plans: " + "; ".join(
+                f"{' / '.join(plan)} ({p:.1%})" for plan, p in zip(plans[0], plan_probs[0])))
+
+            # Exact tree attributions for the recommended crop (compact model exports keep
+            # no internal-node values, so they predict without an explanation)
+            with stage('crop', 'explain'):
+                from attributions import describe
+                try:
+                    _, proba, explanation = agro_core.explain_crop(df)['Crop']
+                    messages.append(f"🔍 Why {crop_pred}: {describe(explanation, proba.argmax(axis=1))[0]}")
+                except ValueError:
+                    pass
 
             # Show input factors graph
             graph_data = {
-                "Nitrogen": self.inputs["Nitrogen"],
-                "Phosphorus": self.inputs["Phosphorus"],
-                "Potassium": self.inputs["Potassium"],
-                "Temperature": self.inputs["Temperature"],
-                "Humidity": self.inputs["Humidity"],
-                "Rainfall": self.inputs["Rainfall"]
+                "Nitrogen": inputs["Nitrogen"],
+                "Phosphorus": inputs["Phosphorus"],
+                "Potassium": inputs["Potassium"],
+                "Temperature": inputs["Temperature"],
+                "Humidity": inputs["Humidity"],
+                "Rainfall": inputs["Rainfall"]
             }
-            self.gui.show_graph(graph_data, "Crop Input Analysis", position='left')
+            graphs.append(('render_inputs', graph_data, "Crop Input Analysis", 'left'))
 
             # Show crop probability percentages (model confidence)
-            try:
-                prob_list = crop_model.predict_proba(df)
-                # prob_list[0] -> array shape (n_samples, n_classes) for 'Crop' output
-                crop_probs = prob_list[0][0]
-                crop_encoder = crop_label_encoders['Crop']
-                classes = list(range(len(crop_encoder.classes_)))
-                class_names = crop_encoder.inverse_transform(classes)
-                crop_percentages = {name: round(float(prob) * 100, 2) for name, prob in zip(class_names, crop_probs)}
-                self.gui.show_graph(crop_percentages, "Crop Prediction Probabilities (%)", position='right')
-            except Exception:
-                # If predict_proba not supported for some reason, skip gracefully
-                pass
+            class_names, crop_probs = results['Crop']
+            crop_percentages = {name: round(float(prob) * 100, 2) for name, prob in zip(class_names, crop_probs[0])}
+            graphs.append(('render_probabilities', crop_percentages, "Crop Prediction Probabilities (%)", 'right'))
 
         except Exception as e:
-            self.display_message(f"❌ Error: {e}")
+            messages.append(f"❌ Error: {e}")
+        return {'flow': 'crop', 'messages': messages, 'graphs': graphs}
 
-    def run_fertilizer_prediction(self):
+    def compute_fertilizer_prediction(self, inputs):
+        # Model work only, no display calls, so it is safe off the Tk thread
+        messages, graphs = [], []
+        result = {'flow': 'fertilizer', 'messages': messages, 'graphs': graphs}
         try:
-            for key in ['Temperature', 'Humidity', 'Moisture',
-                        'Nitrogen', 'Potassium', 'Phosphorus']:
-                self.inputs[key] = float(self.inputs[key])
-
-            # Validate Soil_Type input against known encoder classes
-            soil = self.inputs['Soil_Type']
-            soil_encoder = fertilizer_label_encoders['Soil_Type']
-            if soil not in soil_encoder.classes_:
-                suggestion = difflib.get_close_matches(soil, soil_encoder.classes_, n=1, cutoff=0.6)
-                if suggestion:
-                    self.display_message(f"❌ Unknown Soil_Type '{soil}'. Did you mean '{suggestion[0]}'? Allowed: {', '.join(soil_encoder.classes_)}")
-                else:
-                    self.display_message(f"❌ Unknown Soil_Type '{soil}'. Allowed values: {', '.join(soil_encoder.classes_)}")
-                return
-            soil_encoded = soil_encoder.transform([soil])[0]
-
-            # Validate Crop input against known encoder classes
-            crop = self.inputs['Crop']
-            crop_encoder = fertilizer_label_encoders['Crop']
-            if crop not in crop_encoder.classes_:
-                suggestion = difflib.get_close_matches(crop, crop_encoder.classes_, n=1, cutoff=0.6)
-                if suggestion:
-                    self.display_message(f"❌ Unknown Crop '{crop}'. Did you mean '{suggestion[0]}'? Allowed: {', '.join(crop_encoder.classes_)}")
-                else:
-                    self.display_message(f"❌ Unknown Crop '{crop}'. Allowed values: {', '.join(crop_encoder.classes_)}")
-                return
-            crop_encoded = crop_encoder.transform([crop])[0]
-
-            fert_input = [
-                int(self.inputs['Temperature']),
-                int(self.inputs['Humidity']),
-                int(self.inputs['Moisture']),
-                soil_encoded,
-                crop_encoded,
-                int(self.inputs['Nitrogen']),
-                int(self.inputs['Potassium']),
-                int(self.inputs['Phosphorus'])
-            ]
-
-            # Use DataFrame with column names to avoid sklearn warning about feature names
-            cols = ['Temperature','Humidity','Moisture','Soil_Type','Crop','Nitrogen','Potassium','Phosphorus']
-            fert_df = pd.DataFrame([fert_input], columns=cols)
-
-            result = fertilizer_model.predict(fert_df)[0]
-            fert_name = fertilizer_label_encoders['FertilizerName'].inverse_transform([result])[0]
-
-            self.display_message(f"💡 Recommended Fertilizer: {fert_name}")
+            inputs = dict(inputs)
+            with stage('fertilizer', 'parse'):
+                problems = agro_core.input_errors('fertilizer', inputs)
+                if problems:
+                    messages.extend(f"❌ {problem}" for problem in problems)
+                    return result
+                messages.extend(f"⚠️ {warning}" for warning in agro_core.input_warnings('fertilizer', inputs))
+                for key in ['Temperature', 'Humidity', 'Moisture',
+                            'Nitrogen', 'Potassium', 'Phosphorus']:
+                    inputs[key] = float(inputs[key])
+
+            with stage('fertilizer', 'encode'):
+                # Validate Soil_Type and Crop through the codecs: case and whitespace
+                # differences are accepted, typos only get a suggestion since the user can retype
+                codecs = agro_core.categorical_codecs('fertilizer')
+                encoded = {}
+                for col in ('Soil_Type', 'Crop'):
+                    value = inputs[col]
+                    codec = codecs[col]
+                    codes, corrections, unknown = codec.encode([value])
+                    fixed, confidence = corrections.get(value, (None, 1.0))
+                    if codes[0] < 0 or confidence < 1.0:
+                        suggestion = fixed or unknown[value][0]
+                        if suggestion:
+                            messages.append(f"❌ Unknown {col} '{value}'. Did you mean '{suggestion}'? Allowed: {', '.join(codec.classes)}")
+                        else:
+                            messages.append(f"❌ Unknown {col} '{value}'. Allowed values: {', '.join(codec.classes)}")
+                        return result
+                    if fixed is not None:
+                        messages.append(f"🔧 Using {col} '{fixed}' for '{value}'")
+                    encoded[col] = codes[0]
+                soil_encoded, crop_encoded = encoded['Soil_Type'], encoded['Crop']
+
+            with stage('fertilizer', 'frame'):
+                fert_input = [
+                    int(inputs['Temperature']),
+                    int(inputs['Humidity']),
+                    int(inputs['Moisture']),
+                    soil_encoded,
+                    crop_encoded,
+                    int(inputs['Nitrogen']),
+                    int(inputs['Potassium']),
+                    int(inputs['Phosphorus'])
+                ]
+
+                # Use DataFrame with column names to avoid sklearn warning about feature names
+                fert_df = agro_core.fertilizer_frame([fert_input])
+
+            # One predict_proba pass; the label is its argmax
+            with stage('fertilizer', 'predict'):
+                class_names, probs = agro_core.predict_fertilizer(fert_df)[FERTILIZER_TARGET]
+            with stage('fertilizer', 'decode'):
+                fert_name = agro_core.top_labels(class_names, probs)[0][0]
+                ranked, ranked_probs = agro_core.rank({FERTILIZER_TARGET: (class_names, probs)}, TOP_K)[FERTILIZER_TARGET]
+
+            messages.append(f"💡 Recommended Fertilizer: {fert_name}")
+            messages.append(f"🏆 Top {TOP_K} fertilizers: " + ", ".join(
+                f"{name} ({p:.1%})" for name, p in zip(ranked[0], ranked_probs[0])))
+
+            with stage('fertilizer', 'explain'):
+                from attributions import describe
+                try:
+                    _, proba, explanation = agro_core.explain_fertilizer(fert_df)[FERTILIZER_TARGET]
+                    messages.append(f"🔍 Why {fert_name}: {describe(explanation, proba.argmax(axis=1))[0]}")
+                except ValueError:
+                    pass
 
             # Echo the numeric inputs used so users can verify values match the graph
             try:
-                nit = int(round(self.inputs['Nitrogen']))
-                phos = int(round(self.inputs['Phosphorus']))
-                pot = int(round(self.inputs['Potassium']))
-                moist = int(round(self.inputs['Moisture']))
-                self.display_message(f"🔢 Inputs used — Nitrogen: {nit}, Phosphorus: {phos}, Potassium: {pot}, Moisture: {moist}")
+                nit = int(round(inputs['Nitrogen']))
+                phos = int(round(inputs['Phosphorus']))
+                pot = int(round(inputs['Potassium']))
+                moist = int(round(inputs['Moisture']))
+                messages.append(f"🔢 Inputs used — Nitrogen: {nit}, Phosphorus: {phos}, Potassium: {pot}, Moisture: {moist}")
             except Exception:
                 # Fallback: print raw dictionary
-                self.display_message(f"🔢 Inputs used — { {k: self.inputs[k] for k in ['Nitrogen','Phosphorus','Potassium','Moisture'] if k in self.inputs} }")
+                messages.append(f"🔢 Inputs used — { {k: inputs[k] for k in ['Nitrogen','Phosphorus','Potassium','Moisture'] if k in inputs} }")
 
             graph_data = {
-                "Nitrogen": self.inputs["Nitrogen"],
-                "Phosphorus": self.inputs["Phosphorus"],
-                "Potassium": self.inputs["Potassium"],
-                "Moisture": self.inputs["Moisture"]
+                "Nitrogen": inputs["Nitrogen"],
+                "Phosphorus": inputs["Phosphorus"],
+                "Potassium": inputs["Potassium"],
+                "Moisture": inputs["Moisture"]
             }
             # Show decision factors on the left
-            self.gui.show_graph(graph_data, "Fertilizer Decision Factors", position='left')
+            graphs.append(('render_inputs', graph_data, "Fertilizer Decision Factors", 'left'))
 
-            # Show fertilizer prediction probabilities on the right (if model supports predict_proba)
-            try:
-                probs = fertilizer_model.predict_proba(fert_df)[0]
-                fert_encoder = fertilizer_label_encoders['FertilizerName']
-                class_names = list(fert_encoder.classes_)
-                fert_percentages = {name: round(float(p) * 100, 2) for name, p in zip(class_names, probs)}
-                # Place probability chart to the right
-                self.gui.show_graph(fert_percentages, "Fertilizer Prediction Probabilities (%)", position='right')
-            except Exception:
-                # If predict_proba not available, skip
-                pass
+            # Show fertilizer prediction probabilities on the right
+            fert_percentages = {name: round(float(p) * 100, 2) for name, p in zip(class_names, probs[0])}
+            graphs.append(('render_probabilities', fert_percentages, "Fertilizer Prediction Probabilities (%)", 'right'))
 
         except Exception as e:
-            self.display_message(f"❌ Error: {e}")
+            messages.append(f"❌ Error: {e}")
+        return result
 
 
 # ================= RUN APP =================
 if __name__ == '__main__':
     try:
+        from agro_gui import AgroAidGUI
         AgroAidGUI().run()
     except KeyboardInterrupt:
         # Gracefully handle user interrupt from the terminal (Ctrl+C)
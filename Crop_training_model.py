@@ -1,91 +1,262 @@
-import pandas as pd
-import joblib
+import argparse
+import os
+import shutil
 import time
 
+import numpy as np
+
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
+from sklearn.preprocessing import StandardScaler
 from sklearn.multioutput import MultiOutputClassifier
 from sklearn.ensemble import VotingClassifier, RandomForestClassifier
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.svm import SVC
+from sklearn.linear_model import RidgeClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.kernel_approximation import Nystroem
+from sklearn.calibration import CalibratedClassifierCV
 
+from training_utils import (timed, print_stage_times, plan_workers, plan_text, reset_n_jobs, load_params,
+                            dump_atomic, print_progress, run_signature, Checkpoints)
+from dataset_cache import load_dataset, label_encoders as build_label_encoders
 
-print("\n🧠 Model is training...")
-print("⏳ Please wait...\n")
+FEATURES = ['Nitrogen', 'Phosphorus', 'Potassium',
+            'Temperature', 'Humidity', 'pH_Value', 'Rainfall']
+TARGETS = ['Crop', 'Soil_Type', 'Variety']
 
-# Give terminal feedback immediately
-time.sleep(1)
+# Training profiles for the SVM member of the voting ensemble:
+#   full - kernel SVC with probability=True (exact RBF kernel + internal 5-fold Platt scaling)
+#   fast - Nystroem approximation of the same RBF kernel feeding a closed-form ridge
+#          classifier, with a 3-fold sigmoid calibration; training grows roughly linearly
+#          with the row count instead of quadratically
+PROFILES = ['full', 'fast']
+NYSTROEM_COMPONENTS = 300
 
-# =============================
-# Load Dataset
-# =============================
-crop_df = pd.read_csv("sensor_Crop_Dataset.csv")
-print("✅ Dataset loaded")
 
 # =============================
-# Encode Labels
+# Model Definition
 # =============================
-label_encoders = {}
+def build_svm_member(profile='full', n_jobs=None):
+    if profile == 'fast':
+        approx_svm = make_pipeline(
+            StandardScaler(),
+            Nystroem(kernel='rbf', n_components=NYSTROEM_COMPONENTS, random_state=42),
+            RidgeClassifier()
+        )
+        return CalibratedClassifierCV(approx_svm, method='sigmoid', cv=3, n_jobs=n_jobs)
+    return SVC(probability=True, random_state=42)
 
-for col in ['Crop', 'Soil_Type', 'Variety']:
-    le = LabelEncoder()
-    crop_df[col] = le.fit_transform(crop_df[col])
-    label_encoders[col] = le
 
-print("✅ Labels encoded")
+def worker_plan(profile='full', n_jobs=None):
+    # fit_members runs every (output, member) fit side by side in one pool; the workers
+    # left over become threads of the members that use them: the forest, and in the fast
+    # profile also the calibrated SVM's cross-validation fits
+    threaded = ['forest'] if profile == 'full' else ['forest', 'calibrated SVM']
+    plan = plan_workers(n_jobs, n_fits=len(TARGETS) * 3, n_threaded=len(TARGETS) * len(threaded))
+    return dict(plan, threaded=threaded)
 
-# =============================
-# Features & Targets
-# =============================
-X = crop_df[
-    ['Nitrogen', 'Phosphorus', 'Potassium',
-     'Temperature', 'Humidity', 'pH_Value', 'Rainfall']
-]
 
-y = crop_df[['Crop', 'Soil_Type', 'Variety']]
+def build_model(profile='full', n_jobs=None):
+    # Fit with fit_members: calling fit on the MultiOutputClassifier itself trains the
+    # outputs and members one after another
+    plan = worker_plan(profile, n_jobs)
+    voting = VotingClassifier(
+        estimators=[
+            ('rf', RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=plan['threads'])),
+            ('dt', DecisionTreeClassifier(random_state=42)),
+            ('svc', build_svm_member(profile, n_jobs=plan['threads']))
+        ],
+        voting='soft'
+    )
+    return MultiOutputClassifier(voting)
+
 
 # =============================
-# Train-Test Split
+# Load Dataset & Encode Labels
 # =============================
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
+def load_data(path="sensor_Crop_Dataset.csv", times=None, use_cache=True):
+    times = {} if times is None else times
+    # Columnar cache: float64 features (the SVC member, unlike the trees, does not round
+    # them to float32) and pre-encoded target codes, memory-mapped
+    with timed('load', times):
+        crop_df, categories = load_dataset(path, TARGETS, cache_dir=None if use_cache else '',
+                                           numeric_dtype=np.float64)
+    print("✅ Dataset loaded")
+
+    with timed('encode', times):
+        label_encoders = build_label_encoders(categories)
+    print("✅ Labels encoded")
+
+    with timed('split', times):
+        X = crop_df[FEATURES]
+        y = crop_df[TARGETS].astype('int64')
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=42
+        )
+    print("✅ Data split completed")
+    return X_train, X_test, y_train, y_test, label_encoders
 
-print("✅ Data split completed")
 
 # =============================
-# Model Definition
+# Train & Evaluate
 # =============================
-voting = VotingClassifier(
-    estimators=[
-        ('rf', RandomForestClassifier(n_estimators=100, random_state=42)),
-        ('dt', DecisionTreeClassifier(random_state=42)),
-        ('svc', SVC(probability=True, random_state=42))
-    ],
-    voting='soft'
-)
+def evaluate(model, X_test, y_test):
+    pred = model.predict(X_test)
+    scores = {'subset': model.score(X_test, y_test)}
+    for i, col in enumerate(TARGETS):
+        scores[col] = float((pred[:, i] == y_test[col].to_numpy()).mean())
+    return scores
 
-model = MultiOutputClassifier(voting)
 
-print("🚀 Training started...")
+def _fit_member(key, member, X, y):
+    return key, member.fit(X, y)
 
-# =============================
-# Train Model
-# =============================
-model.fit(X_train, y_train)
 
-print("✅ Training completed")
+def fit_members(model, X_train, y_train, n_jobs=1, checkpoints=None):
+    # The same fit as model.fit, with every (output, member) pair fitted side by side on
+    # n_jobs workers (worker_plan's 'fits'). With checkpoints, each member is saved as
+    # soon as it is fitted, and members already saved are loaded instead of refitted
+    from joblib import Parallel, delayed
+    from sklearn.base import clone
+    from sklearn.preprocessing import LabelEncoder
+    from sklearn.utils import Bunch
 
-# =============================
-# Accuracy
-# =============================
-accuracy = model.score(X_test, y_test)
+    template = model.estimator
+    feature_names = np.asarray(X_train.columns, dtype=object)
+    total = len(TARGETS) * len(template.estimators)
+    # VotingClassifier.fit trains its members on label-encoded targets
+    encoders = {target: LabelEncoder().fit(y_train[target]) for target in TARGETS}
+    fitted = {}
+    pending = []
+    for target in TARGETS:
+        for name, member in template.estimators:
+            key = f"{target}.{name}"
+            saved = checkpoints.load(key) if checkpoints else None
+            if saved is None:
+                pending.append((key, member, target))
+            else:
+                fitted[key] = saved
+                print_progress(len(fitted), total, f"{target} {name} (checkpoint)")
+
+    jobs = (delayed(_fit_member)(key, clone(member), X_train, encoders[target].transform(y_train[target]))
+            for key, member, target in pending)
+    for key, member in Parallel(n_jobs=n_jobs, return_as='generator_unordered')(jobs):
+        if checkpoints:
+            checkpoints.save(key, member)
+        fitted[key] = member
+        print_progress(len(fitted), total, key.replace('.', ' '))
+
+    votings = []
+    for target in TARGETS:
+        members = {name: fitted[f"{target}.{name}"] for name, _ in template.estimators}
+        voting = clone(template)
+        voting.estimators_ = list(members.values())
+        voting.named_estimators_ = Bunch(**members)
+        voting.le_ = encoders[target]
+        voting.classes_ = encoders[target].classes_
+        voting.feature_names_in_ = feature_names
+        votings.append(voting)
+    model.estimators_ = votings
+    model.classes_ = [v.classes_ for v in votings]
+    model.n_features_in_ = X_train.shape[1]
+    model.feature_names_in_ = feature_names
+    return model
+
+
+def train_profile(profile, X_train, X_test, y_train, y_test, n_jobs=None, times=None, params=None,
+                  checkpoint_dir=None):
+    times = {} if times is None else times
+    model = build_model(profile, n_jobs)
+    if params:
+        model.set_params(**params)
+    checkpoints = None
+    if checkpoint_dir:
+        checkpoints = Checkpoints(os.path.join(checkpoint_dir, profile), run_signature(model, X_train, y_train))
+    with timed(f'fit[{profile}]', times):
+        fit_members(model, X_train, y_train, worker_plan(profile, n_jobs)['fits'], checkpoints)
+    reset_n_jobs(model)
+    with timed(f'score[{profile}]', times):
+        scores = evaluate(model, X_test, y_test)
+    return model, times[f'fit[{profile}]'], scores
+
+
+def print_comparison(results, n_jobs=None):
+    print("\n📊 Profile comparison")
+    header = f"{'profile':<8} {'train (s)':>10} {'subset':>8}" + ''.join(f" {c:>10}" for c in TARGETS)
+    print(header + "  workers")
+    for profile, (_, train_s, scores) in results.items():
+        row = f"{profile:<8} {train_s:>10.1f} {scores['subset']:>8.4f}"
+        row += ''.join(f" {scores[c]:>10.4f}" for c in TARGETS)
+        print(row + f"  {plan_text(worker_plan(profile, n_jobs))}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the crop recommendation ensemble.")
+    parser.add_argument('--profile', choices=PROFILES, default='full',
+                        help="'fast' swaps the kernel SVC for a Nystroem RBF approximation feeding a "
+                             "ridge classifier, sigmoid-calibrated")
+    parser.add_argument('--compare', action='store_true',
+                        help="train every profile and report time and accuracy side by side")
+    parser.add_argument('--n-jobs', type=int, default=None,
+                        help="worker budget shared by the (output, member) fits and the forests' threads "
+                             "(-1 = all cores)")
+    parser.add_argument('--data', default="sensor_Crop_Dataset.csv", help="training dataset CSV")
+    parser.add_argument('--no-dataset-cache', action='store_true',
+                        help="parse the CSV directly instead of using the columnar cache")
+    parser.add_argument('--params', help="JSON file with tuned hyperparameters (see tune_models.py)")
+    parser.add_argument('--chunked', action='store_true',
+                        help="stream the dataset in chunks (bounded memory; see chunked_training.py)")
+    parser.add_argument('--chunksize', type=int, default=100_000, help="rows per chunk with --chunked")
+    parser.add_argument('--checkpoint-dir',
+                        help="save every fitted member here and resume an interrupted run from it")
+    args = parser.parse_args(argv)
+
+    if args.chunked:
+        from chunked_training import train_chunked
+        times = {}
+        train_chunked('crop', args.data, chunksize=args.chunksize, n_jobs=args.n_jobs,
+                      use_cache=not args.no_dataset_cache, times=times)
+        print_stage_times(times)
+        return
+
+    print("\n🧠 Model is training...")
+    print("⏳ Please wait...\n")
+
+    # Give terminal feedback immediately
+    time.sleep(1)
+
+    times = {}
+    X_train, X_test, y_train, y_test, label_encoders = load_data(args.data, times,
+                                                                 use_cache=not args.no_dataset_cache)
+
+    profiles = PROFILES if args.compare else [args.profile]
+    results = {}
+    for profile in profiles:
+        plan = worker_plan(profile, args.n_jobs)
+        print(f"🚀 Training started ({profile} profile, workers: {plan_text(plan)})...")
+        # Tuned parameters apply to the selected profile; --compare trains the others as usual
+        params = load_params(args.params, profile) if args.params and profile == args.profile else None
+        results[profile] = train_profile(profile, X_train, X_test, y_train, y_test, args.n_jobs, times, params,
+                                         args.checkpoint_dir)
+        print(f"✅ Training completed in {results[profile][1]:.1f}s")
+
+    if args.compare:
+        print_comparison(results, args.n_jobs)
+
+    # =============================
+    # Save Model
+    # =============================
+    model, _, scores = results[args.profile]
+    with timed('save', times):
+        dump_atomic(model, "ensemble_crop_model.pkl")
+        dump_atomic(label_encoders, "crop_label_encoders.pkl")
+    if args.checkpoint_dir:
+        shutil.rmtree(args.checkpoint_dir, ignore_errors=True)
+
+    print(f"\n🎉 Model saved successfully ({args.profile} profile)")
+    print(f"📊 Crop Model Accuracy: {scores['subset']:.4f}")
+    print_stage_times(times, f"Stage timings (workers: {plan_text(worker_plan(args.profile, args.n_jobs))})")
 
-# =============================
-# Save Model
-# =============================
-joblib.dump(model, "ensemble_crop_model.pkl")
-joblib.dump(label_encoders, "crop_label_encoders.pkl")
 
-print("\n🎉 Model saved successfully")
-print(f"📊 Crop Model Accuracy: {accuracy:.4f}")
+if __name__ == '__main__':
+    main()
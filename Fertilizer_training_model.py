@@ -1,33 +1,121 @@
-import pandas as pd
-import joblib
+import argparse
+import copy
+import shutil
+
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
 from sklearn.ensemble import RandomForestClassifier
 
-# Load fertilizer dataset
-df = pd.read_csv("data_core.csv")
+from training_utils import (timed, print_stage_times, resolve_n_jobs, reset_n_jobs, load_params,
+                            dump_atomic, print_progress, run_signature, Checkpoints)
+from dataset_cache import load_dataset, label_encoders as build_label_encoders
+
+FEATURES = ['Temperature', 'Humidity', 'Moisture', 'Soil_Type', 'Crop', 'Nitrogen', 'Potassium', 'Phosphorus']
+CATEGORICALS = ['Soil_Type', 'Crop', 'FertilizerName']
+TARGET = 'FertilizerName'
+
+# Trees grown between two checkpoints with --checkpoint-dir
+CHECKPOINT_TREES = 10
+
+
+def build_model(n_jobs=None):
+    # Trees are independent, so the whole worker budget goes to them
+    return RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=resolve_n_jobs(n_jobs))
+
+
+def fit_checkpointed(model, X_train, y_train, checkpoints, step=CHECKPOINT_TREES):
+    # The same forest as model.fit, grown `step` trees at a time with warm_start (tree
+    # seeds come from one random_state sequence either way). Each batch of trees is
+    # checkpointed on its own, and a resumed run picks up after the last saved batch.
+    total = model.n_estimators
+    forest = model
+    for start in range(0, total, step):
+        stop = min(start + step, total)
+        saved = checkpoints.load(f"trees.{start}")
+        if saved is None:
+            forest.set_params(n_estimators=stop, warm_start=True).fit(X_train, y_train)
+            saved = copy.copy(forest)
+            saved.estimators_ = forest.estimators_[start:stop]
+            checkpoints.save(f"trees.{start}", saved)
+        elif start == 0:
+            forest = saved
+        else:
+            forest.estimators_ = forest.estimators_ + saved.estimators_
+        forest.n_estimators = stop
+        print_progress(stop, total, "trees")
+    return forest.set_params(warm_start=False)
+
+
+def load_data(path="data_core.csv", times=None, use_cache=True):
+    times = {} if times is None else times
+    # Load fertilizer dataset (columnar cache: float32 numerics, categoricals already coded)
+    with timed('load', times):
+        df, categories = load_dataset(path, CATEGORICALS, cache_dir=None if use_cache else '')
+
+    # Label encoding
+    with timed('encode', times):
+        label_encoders = build_label_encoders(categories)  # ✅ Include 'Crop' and 'Soil_Type'
+
+    # Features and Target
+    with timed('split', times):
+        X = df[FEATURES]
+        y = df[TARGET].astype('int64')
+
+        # Train-test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    return X_train, X_test, y_train, y_test, label_encoders
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the fertilizer recommendation model.")
+    parser.add_argument('--n-jobs', type=int, default=None,
+                        help="number of trees trained in parallel (-1 = all cores)")
+    parser.add_argument('--data', default="data_core.csv", help="training dataset CSV")
+    parser.add_argument('--no-dataset-cache', action='store_true',
+                        help="parse the CSV directly instead of using the columnar cache")
+    parser.add_argument('--params', help="JSON file with tuned hyperparameters (see tune_models.py)")
+    parser.add_argument('--chunked', action='store_true',
+                        help="stream the dataset in chunks (bounded memory; see chunked_training.py)")
+    parser.add_argument('--chunksize', type=int, default=100_000, help="rows per chunk with --chunked")
+    parser.add_argument('--checkpoint-dir',
+                        help="save every batch of trees here and resume an interrupted run from it")
+    args = parser.parse_args(argv)
+
+    times = {}
+    if args.chunked:
+        from chunked_training import train_chunked
+        train_chunked('fertilizer', args.data, chunksize=args.chunksize, n_jobs=args.n_jobs,
+                      use_cache=not args.no_dataset_cache, times=times)
+        print_stage_times(times)
+        return
 
-# Label encoding
-label_encoders = {}
-for col in ['Soil_Type', 'Crop', 'FertilizerName']:  # ✅ Include 'Crop' and 'Soil_Type'
-    le = LabelEncoder()
-    df[col] = le.fit_transform(df[col])
-    label_encoders[col] = le
+    X_train, X_test, y_train, y_test, label_encoders = load_data(args.data, times,
+                                                                 use_cache=not args.no_dataset_cache)
 
-# Features and Target
-X = df[['Temperature', 'Humidity', 'Moisture', 'Soil_Type', 'Crop', 'Nitrogen', 'Potassium', 'Phosphorus']]
-y = df['FertilizerName']
+    # Train model
+    model = build_model(args.n_jobs)
+    if args.params:
+        model.set_params(**load_params(args.params))
+    with timed('fit', times):
+        if args.checkpoint_dir:
+            checkpoints = Checkpoints(args.checkpoint_dir, run_signature(model, X_train, y_train))
+            model = fit_checkpointed(model, X_train, y_train, checkpoints)
+        else:
+            model.fit(X_train, y_train)
+    reset_n_jobs(model)
 
-# Train-test split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # Save model and encoders
+    with timed('save', times):
+        dump_atomic(model, 'fertilizer_model.pkl')
+        dump_atomic(label_encoders, 'fertilizer_label_encoders.pkl')
+    if args.checkpoint_dir:
+        shutil.rmtree(args.checkpoint_dir, ignore_errors=True)
 
-# Train model
-model = RandomForestClassifier(n_estimators=100, random_state=42)
-model.fit(X_train, y_train)
+    # Optional: Accuracy
+    with timed('score', times):
+        accuracy = model.score(X_test, y_test)
+    print("✅ Fertilizer Model Accuracy:", accuracy)
+    print_stage_times(times)
 
-# Save model and encoders
-joblib.dump(model, 'fertilizer_model.pkl')
-joblib.dump(label_encoders, 'fertilizer_label_encoders.pkl')
 
-# Optional: Accuracy
-print("✅ Fertilizer Model Accuracy:", model.score(X_test, y_test))
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,434 @@
+import os
+import threading
+
+# Headless prediction core shared by the GUI, batch scoring and any other front end.
+# Nothing heavy is imported here at module level: numpy, pandas, joblib and the
+# pickled models are only pulled in the first time a prediction needs them.
+
+# ================= FEATURE LAYOUT =================
+# Column order must match the training scripts
+
+CROP_FEATURES = ['Nitrogen', 'Phosphorus', 'Potassium',
+                 'Temperature', 'Humidity', 'pH_Value', 'Rainfall']
+CROP_TARGETS = ['Crop', 'Soil_Type', 'Variety']
+
+FERTILIZER_FEATURES = ['Temperature', 'Humidity', 'Moisture', 'Soil_Type',
+                       'Crop', 'Nitrogen', 'Potassium', 'Phosphorus']
+FERTILIZER_CATEGORICALS = ['Soil_Type', 'Crop']
+FERTILIZER_TARGET = 'FertilizerName'
+
+# ================= MODEL FILES =================
+
+MODEL_DIR = os.environ.get('AGRO_MODEL_DIR', '.')
+
+# Memory-mapped exports written by model_artifacts.py, then compact files written by
+# compact_model.py, are preferred over the pickles whenever they are up to date; set
+# AGRO_ARTIFACT_DIR to an empty string to disable both.
+ARTIFACT_DIR = os.environ.get('AGRO_ARTIFACT_DIR', os.path.join(MODEL_DIR, 'model_artifacts'))
+ARTIFACT_MODELS = ('crop_model', 'fertilizer_model')
+
+# Serve the fertilizer forest through forest_engine (AGRO_FOREST_ENGINE=0 to disable)
+ENGINE_ENABLED = os.environ.get('AGRO_FOREST_ENGINE', '1') != '0'
+
+# Opt-in (AGRO_CROP_CASCADE=1): answer confident crop rows from the tree members alone
+# while crop_cascade.json (written by `python cascade.py calibrate`) matches the model
+CASCADE_ENABLED = os.environ.get('AGRO_CROP_CASCADE', '0') == '1'
+
+# Serve the distilled crop student (written by distill.py) instead of the ensemble
+STUDENT_ENABLED = os.environ.get('AGRO_CROP_STUDENT', '0') == '1'
+
+MODEL_FILES = {
+    'crop_model': 'ensemble_crop_model.pkl',
+    'crop_label_encoders': 'crop_label_encoders.pkl',
+    'fertilizer_model': 'fertilizer_model.pkl',
+    'fertilizer_label_encoders': 'fertilizer_label_encoders.pkl',
+    'crop_student': 'crop_student.pkl'
+}
+
+TRAINING_SCRIPTS = {
+    'ensemble_crop_model.pkl': 'Crop_training_model.py',
+    'crop_label_encoders.pkl': 'Crop_training_model.py',
+    'fertilizer_model.pkl': 'Fertilizer_training_model.py',
+    'fertilizer_label_encoders.pkl': 'Fertilizer_training_model.py'
+}
+
+# Optional files, built on request rather than at first run
+BUILD_SCRIPTS = dict(TRAINING_SCRIPTS, **{'crop_student.pkl': 'distill.py'})
+
+
+def model_path(name):
+    return os.path.join(MODEL_DIR, MODEL_FILES[name])
+
+
+def active_models():
+    # Names of the model files the current configuration loads
+    crop = 'crop_student' if STUDENT_ENABLED else 'crop_model'
+    return [crop, 'crop_label_encoders', 'fertilizer_model', 'fertilizer_label_encoders']
+
+
+def missing_model_files():
+    return [f for f in TRAINING_SCRIPTS if not os.path.exists(os.path.join(MODEL_DIR, f))]
+
+
+# ================= LAZY LOADING =================
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+def load(name):
+    try:
+        return _loaded[name]
+    except KeyError:
+        pass
+    with _load_lock:
+        if name not in _loaded:
+            path = model_path(name)
+            if not os.path.exists(path):
+                raise FileNotFoundError(
+                    f"Missing model file {path}. Run {BUILD_SCRIPTS[MODEL_FILES[name]]} to create it."
+                )
+            _loaded[name] = _load_file(name, path)
+        return _loaded[name]
+
+
+def _load_file(name, path):
+    model = _read_model(name, path)
+    if name == 'crop_model' and CASCADE_ENABLED:
+        from cascade import CascadeMultiOutput, cascade_path, read_thresholds
+        thresholds = read_thresholds(cascade_path(MODEL_DIR), path, CROP_TARGETS)
+        if thresholds is not None:
+            model = CascadeMultiOutput(model, thresholds)
+    return model
+
+
+def _read_model(name, path):
+    if ARTIFACT_DIR and name in ARTIFACT_MODELS:
+        import model_artifacts
+        art_dir = model_artifacts.artifact_path(name, ARTIFACT_DIR)
+        if model_artifacts.is_fresh(art_dir, path):
+            return model_artifacts.load_model(art_dir)
+        import compact_model
+        compact = compact_model.compact_path(name, ARTIFACT_DIR)
+        if compact_model.is_fresh(compact, path):
+            return compact_model.load_compact(compact)
+    import joblib
+    model = joblib.load(path)
+    if name == 'fertilizer_model' and ENGINE_ENABLED:
+        # Single rows go through the flat-array engine; large batches still use sklearn
+        from forest_engine import ForestEngine
+        model = ForestEngine.from_sklearn(model)
+    return model
+
+
+def unload():
+    # Drop cached models so the next call reloads them from disk
+    with _load_lock:
+        _loaded.clear()
+
+
+def crop_model():
+    return load('crop_student' if STUDENT_ENABLED else 'crop_model')
+
+
+def crop_label_encoders():
+    return load('crop_label_encoders')
+
+
+def fertilizer_model():
+    return load('fertilizer_model')
+
+
+def fertilizer_label_encoders():
+    return load('fertilizer_label_encoders')
+
+
+def categorical_codecs(kind):
+    # {column: CategoricalCodec} over the crop or fertilizer label encoders, built once
+    name = kind + '_codecs'
+    try:
+        return _loaded[name]
+    except KeyError:
+        pass
+    encoders = load(kind + '_label_encoders')
+    from categorical_codec import codecs_from_encoders
+    with _load_lock:
+        if name not in _loaded:
+            _loaded[name] = codecs_from_encoders(encoders)
+        return _loaded[name]
+
+
+def input_schema(kind):
+    # Numeric feature dtypes and valid ranges from input_schema.json, read once
+    name = kind + '_schema'
+    try:
+        return _loaded[name]
+    except KeyError:
+        pass
+    from input_schema import load_schema
+    with _load_lock:
+        if name not in _loaded:
+            _loaded[name] = load_schema(kind)
+        return _loaded[name]
+
+
+# ================= ENCODING =================
+
+def crop_frame(rows):
+    import pandas as pd
+    # rows: list of dicts (or a DataFrame) holding the crop features
+    return pd.DataFrame(rows, columns=CROP_FEATURES).apply(pd.to_numeric, errors='coerce')
+
+
+def fertilizer_frame(rows):
+    import pandas as pd
+    # rows: list of already-encoded feature lists in FERTILIZER_FEATURES order
+    return pd.DataFrame(rows, columns=FERTILIZER_FEATURES)
+
+
+def encode_crop_frame(frame, policy='reject'):
+    # Schema-checked crop features: cells that are missing, non-numeric or (under
+    # 'reject') outside the physical limits become NaN and their rows invalid; 'clamp'
+    # pulls values outside the limits to the nearest limit instead
+    from input_schema import validate
+    X, errors = validate(frame, input_schema('crop'), policy)
+    return X[CROP_FEATURES], ~errors.any(axis=1).to_numpy()
+
+
+def input_errors(kind, inputs):
+    # One message per field of a single input dict that is non-numeric or outside its
+    # physical limits
+    import pandas as pd
+    from input_schema import range_message, validate
+
+    schema = input_schema(kind)
+    _, errors = validate(pd.DataFrame([inputs]), schema)
+    return [range_message(schema, col, inputs.get(col)) for col in errors.columns if errors[col].iloc[0]]
+
+
+def input_warnings(kind, inputs):
+    # One message per valid field of a single input dict outside the training data
+    import pandas as pd
+    from input_schema import outside_training, training_range_message, validate
+
+    schema = input_schema(kind)
+    X, _ = validate(pd.DataFrame([inputs]), schema)
+    outside = outside_training(X, schema)
+    return [training_range_message(schema, col, X[col].iloc[0]) for col in outside.columns
+            if outside[col].iloc[0]]
+
+
+def training_range_flags(kind, X):
+    # Boolean frame of the cells of an encoded frame outside the training data
+    from input_schema import outside_training
+    return outside_training(X, input_schema(kind))
+
+
+def encode_fertilizer_frame(frame, corrections=None, policy='reject'):
+    import numpy as np
+    import pandas as pd
+    from input_schema import validate
+
+    # corrections, when given, collects {column: {raw: (class, confidence)}} for every
+    # value the codec rewrote (case, whitespace or a confident typo fix)
+    codecs = categorical_codecs('fertilizer')
+    numeric, _ = validate(frame, input_schema('fertilizer'), policy)
+    X = pd.DataFrame(index=frame.index)
+    for col in FERTILIZER_FEATURES:
+        if col in FERTILIZER_CATEGORICALS:
+            # Whole-column codec lookup; values it cannot resolve become NaN
+            codes, fixed, _ = codecs[col].encode(frame[col])
+            X[col] = np.where(codes < 0, np.nan, codes)
+            if corrections is not None and fixed:
+                corrections.setdefault(col, {}).update(fixed)
+        else:
+            # Same truncation the chatbot applies with int(float(...))
+            X[col] = np.trunc(numeric[col])
+    valid = X.notna().all(axis=1).to_numpy()
+    return X, valid
+
+
+# ================= PREDICTION =================
+# Each predict_* call runs at most one predict_proba pass and returns
+# {target: (class_names, proba)} with decoded class names in column order.
+
+def _predict_crop(X):
+    model = crop_model()
+    encoders = crop_label_encoders()
+    probas = model.predict_proba(X)
+    return {
+        target: (encoders[target].inverse_transform(estimator.classes_), proba)
+        for target, estimator, proba in zip(CROP_TARGETS, model.estimators_, probas)
+    }
+
+
+def _predict_fertilizer(X):
+    model = fertilizer_model()
+    encoder = fertilizer_label_encoders()[FERTILIZER_TARGET]
+    proba = model.predict_proba(X.astype('int64'))
+    return {FERTILIZER_TARGET: (encoder.inverse_transform(model.classes_), proba)}
+
+
+def predict_crop(X):
+    if _cache is None:
+        return _predict_crop(X)
+    return _cached_predict('crop', X, _predict_crop)
+
+
+def predict_fertilizer(X):
+    if _cache is None:
+        return _predict_fertilizer(X)
+    return _cached_predict('fertilizer', X.astype('int64'), _predict_fertilizer)
+
+
+# ================= RANKING =================
+# Ranked recommendations from predict_* results (see ranking.py).
+
+CROP_DATA = os.environ.get('AGRO_CROP_DATA', 'sensor_Crop_Dataset.csv')
+
+
+def crop_combinations():
+    # (Crop, Soil_Type, Variety) combinations seen in the crop training data, or None
+    # when the CSV is not available (every combination is then allowed)
+    try:
+        return _loaded['crop_combinations']
+    except KeyError:
+        pass
+    combos = None
+    if os.path.exists(CROP_DATA):
+        import pandas as pd
+        seen = pd.read_csv(CROP_DATA, usecols=CROP_TARGETS)[CROP_TARGETS].drop_duplicates()
+        combos = list(seen.itertuples(index=False, name=None))
+    with _load_lock:
+        return _loaded.setdefault('crop_combinations', combos)
+
+
+def rank(results, k=3):
+    # {target: (labels, probabilities)}, both (n, k), best first
+    from ranking import ranked_labels
+    return {target: ranked_labels(names, proba, k) for target, (names, proba) in results.items()}
+
+
+def rank_crop_plans(results, k=3, observed_only=True):
+    # Joint top k over (Crop, Soil_Type, Variety) from predict_crop results:
+    # labels (n, k, 3) and probabilities (n, k), best first
+    import numpy as np
+    from ranking import combination_codes, joint_top_k
+
+    class_names = [results[target][0] for target in CROP_TARGETS]
+    combos = crop_combinations() if observed_only else None
+    codes = None if combos is None else combination_codes(combos, class_names)
+    index, top = joint_top_k([results[target][1] for target in CROP_TARGETS], k, codes)
+    labels = np.empty(index.shape, dtype=object)
+    for i, names in enumerate(class_names):
+        labels[..., i] = np.asarray(names, dtype=object)[index[..., i]]
+    return labels, top
+
+
+# ================= ATTRIBUTIONS =================
+# explain_* return what predict_* return plus the exact tree attributions of every
+# row (see attributions.py), from one pass over the trees:
+# {target: (class_names, proba, explanation)}, where explanation holds 'features',
+# 'bias' (C,), 'contributions' (n, F, C) and 'residual' (n, C), in probability units.
+# They bypass the prediction cache.
+
+def _explainer(kind):
+    name = kind + '_explainer'
+    try:
+        return _loaded[name]
+    except KeyError:
+        pass
+    model = crop_model() if kind == 'crop' else fertilizer_model()
+    from attributions import build_explainer
+    with _load_lock:
+        if name not in _loaded:
+            _loaded[name] = build_explainer(model)
+        return _loaded[name]
+
+
+def _explain(explainer, X, class_names):
+    proba, bias, contributions, residual = explainer.explain(X)
+    return class_names, proba, {'features': explainer.feature_names, 'bias': bias,
+                                'contributions': contributions, 'residual': residual}
+
+
+def explain_crop(X):
+    encoders = crop_label_encoders()
+    return {
+        target: _explain(explainer, X, encoders[target].inverse_transform(explainer.classes_))
+        for target, explainer in zip(CROP_TARGETS, _explainer('crop'))
+    }
+
+
+def explain_fertilizer(X):
+    explainer = _explainer('fertilizer')
+    encoder = fertilizer_label_encoders()[FERTILIZER_TARGET]
+    return {FERTILIZER_TARGET: _explain(explainer, X.astype('int64'),
+                                        encoder.inverse_transform(explainer.classes_))}
+
+
+# ================= PREDICTION CACHE =================
+# Optional LRU cache in front of both models (see prediction_cache.py). Enable it with
+# enable_cache() or the AGRO_CACHE_SIZE / AGRO_CACHE_TTL environment variables.
+
+_cache = None
+
+
+def enable_cache(maxsize=4096, ttl=None):
+    global _cache
+    from prediction_cache import PredictionCache
+    # A changed model file clears the cache and unloads the models so both are refreshed
+    _cache = PredictionCache(maxsize, ttl, sources=[model_path(n) for n in active_models()],
+                             on_invalidate=unload)
+    return _cache
+
+
+def disable_cache():
+    global _cache
+    _cache = None
+
+
+def cache_stats():
+    return None if _cache is None else _cache.stats()
+
+
+def cascade_stats():
+    # {target: {'threshold', 'rows', 'skipped', 'skip_rate'}} while the crop cascade is on
+    from cascade import CascadeMultiOutput
+    model = _loaded.get('crop_model')
+    if not isinstance(model, CascadeMultiOutput):
+        return None
+    return dict(zip(CROP_TARGETS, model.stats()))
+
+
+def _cached_predict(kind, X, predict):
+    import numpy as np
+
+    cache = _cache
+    cache.check_sources()
+    # The encoded feature vector is the key, so inputs that normalise to the same
+    # vector (e.g. fertilizer readings truncated to int) share one entry
+    keys = [(kind,) + tuple(row) for row in X.to_numpy().tolist()]
+    rows = [cache.get(key) for key in keys]
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if missing:
+        fresh = predict(X.iloc[missing])
+        for j, i in enumerate(missing):
+            rows[i] = {target: (names, proba[j]) for target, (names, proba) in fresh.items()}
+            cache.put(keys[i], rows[i])
+    if not rows:
+        return predict(X)
+    return {target: (names, np.vstack([row[target][1] for row in rows]))
+            for target, (names, _) in rows[0].items()}
+
+
+def top_labels(class_names, proba):
+    import numpy as np
+    # Label and confidence of the most probable class for every row
+    best = proba.argmax(axis=1)
+    return np.asarray(class_names)[best], proba[np.arange(len(best)), best]
+
+
+if os.environ.get('AGRO_CACHE_SIZE'):
+    enable_cache(int(os.environ['AGRO_CACHE_SIZE']),
+                 float(os.environ['AGRO_CACHE_TTL']) if os.environ.get('AGRO_CACHE_TTL') else None)
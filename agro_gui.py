@@ -0,0 +1,327 @@
+import tkinter as tk
+from tkinter import ttk, scrolledtext, messagebox
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import os, sys
+
+import agro_core
+from Agro import AgroAidBot
+from chart_renderer import BarChart
+from inference_worker import InferenceWorker
+
+# Predictions run on a worker thread; the Tk thread collects results every POLL_MS.
+# AGRO_INFERENCE_POLICY=cancel makes a new request drop one still in flight.
+POLL_MS = 50
+INFERENCE_POLICY = os.environ.get('AGRO_INFERENCE_POLICY', 'queue')
+
+# ================= LOAD MODELS =================
+
+def ensure_models():
+    missing = agro_core.missing_model_files()
+    if missing:
+        root = tk.Tk()
+        root.withdraw()
+        msg = (
+            "Missing model files:\n" + "\n".join(missing) +
+            "\n\nWould you like to try to create them by running the training scripts?"
+        )
+        if messagebox.askyesno("Missing model files", msg):
+            # Both trainings run at once; finished members are checkpointed, so a failed
+            # or cancelled run resumes on the next start
+            from bootstrap import Bootstrap
+            bootstrap = Bootstrap().start()
+            run_bootstrap_dialog(root, bootstrap)
+            if not bootstrap.done:
+                bootstrap.cancel()
+                messagebox.showerror("Training cancelled", "Training was cancelled. "
+                                     "Finished parts are kept and the next start resumes from them.")
+                sys.exit(1)
+            if bootstrap.failed:
+                messagebox.showerror("Training error", f"Failed to run {', '.join(bootstrap.failed)}. "
+                                     "Finished parts are kept and the next start resumes from them.")
+                sys.exit(1)
+
+            missing = agro_core.missing_model_files()
+            if missing:
+                messagebox.showerror("Error", "Still missing: " + ", ".join(missing))
+                sys.exit(1)
+        else:
+            messagebox.showerror("Missing files", "Please run the training scripts to create missing files.")
+            sys.exit(1)
+        root.destroy()
+
+
+def run_bootstrap_dialog(root, bootstrap):
+    # Progress bar plus the scripts' streamed output until they exit or the window is closed
+    dialog = tk.Toplevel(root)
+    dialog.title("Training models")
+    dialog.configure(bg='#1a1a1a')
+    status = tk.Label(dialog, text="Training " + ", ".join(bootstrap.scripts) + "...",
+                      bg='#1a1a1a', fg='white')
+    status.pack(padx=10, pady=(10, 5), anchor='w')
+    bar = ttk.Progressbar(dialog, length=480, maximum=100)
+    bar.pack(padx=10, fill=tk.X)
+    log = scrolledtext.ScrolledText(dialog, width=80, height=15, bg='#2d2d2d', fg='white')
+    log.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
+    dialog.protocol('WM_DELETE_WINDOW', root.quit)
+
+    def tick():
+        for script, line in bootstrap.poll():
+            log.insert(tk.END, f"[{script}] {line}\n")
+            log.see(tk.END)
+        bar['value'] = bootstrap.fraction() * 100
+        if bootstrap.done:
+            root.quit()
+        else:
+            root.after(POLL_MS, tick)
+
+    root.after(POLL_MS, tick)
+    root.mainloop()
+    dialog.destroy()
+
+
+# ================= GUI CLASS =================
+class AgroAidGUI:
+    def __init__(self):
+        ensure_models()
+        self.root = tk.Tk()
+        self.root.title("Agro Aid - Crop & Fertilizer Recommendation")
+        self.root.geometry("800x600")
+        self.root.configure(bg='#1a1a1a')
+
+        self.bot = AgroAidBot()
+        self.bot.display_message = self.display_bot_message
+        self.bot.gui = self            # ⭐ IMPORTANT LINK
+
+        self.charts = {}               # position -> chart window, reused between predictions
+        self.worker = InferenceWorker(INFERENCE_POLICY)
+        self.bot.runner = self.submit_inference
+        self.root.protocol('WM_DELETE_WINDOW', self.close)
+
+        self.setup_gui()
+        self.root.after(POLL_MS, self.poll_inference)
+
+    def setup_gui(self):
+        style = ttk.Style()
+        style.theme_use('clam')
+        style.configure('Dark.TFrame', background='#1a1a1a')
+        style.configure('Dark.TButton', background='#444444', foreground='white', padding=8)
+        style.map('Dark.TButton', background=[('active', '#666666')])
+        style.configure('Input.TEntry', fieldbackground='#333333',
+                        foreground='white', insertcolor='white')
+
+        main_frame = ttk.Frame(self.root, style='Dark.TFrame')
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+
+        self.chat_display = scrolledtext.ScrolledText(
+            main_frame, wrap=tk.WORD, width=70, height=20,
+            font=('Arial', 11), bg='#1a1a1a',
+            fg='white', insertbackground='white'
+        )
+        self.chat_display.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
+        self.chat_display.tag_configure('bot', foreground='#008cff', font=('Arial', 11, 'bold'))
+        self.chat_display.tag_configure('user', foreground='#ffffff')
+
+        input_frame = ttk.Frame(main_frame, style='Dark.TFrame')
+        input_frame.pack(fill=tk.X, pady=(0, 10))
+
+        self.input_field = ttk.Entry(input_frame, font=('Arial', 11), style='Input.TEntry')
+        self.input_field.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
+        self.input_field.bind('<Return>', lambda e: self.send_message())
+
+        send_button = ttk.Button(input_frame, text="Send",
+                                 style='Dark.TButton', command=self.send_message)
+        send_button.pack(side=tk.RIGHT)
+
+        # Progress indicator, shown only while a prediction is computing
+        self.progress_frame = ttk.Frame(main_frame, style='Dark.TFrame')
+        self.progress_label = tk.Label(self.progress_frame, text='', bg='#1a1a1a', fg='white')
+        self.progress_label.pack(side=tk.LEFT, padx=(0, 10))
+        self.progress_bar = ttk.Progressbar(self.progress_frame, mode='indeterminate', length=160)
+        self.progress_bar.pack(side=tk.LEFT)
+        ttk.Button(self.progress_frame, text="Cancel", style='Dark.TButton',
+                   command=self.cancel_inference).pack(side=tk.LEFT, padx=10)
+        self.progress_anchor = input_frame
+
+        # Quick-select area shown below the input for categorical choices (Soil_Type, Crop)
+        self.quick_select_frame = ttk.Frame(main_frame, style='Dark.TFrame')
+        self.quick_select_frame.pack(fill=tk.X, pady=(8, 0))
+        self.quick_options_visible = False
+
+        options_frame = ttk.Frame(main_frame, style='Dark.TFrame')
+        options_frame.pack(fill=tk.X)
+
+        options = [("Crop Prediction", "1"), ("Fertilizer Recommendation", "2")]
+        for text, value in options:
+            ttk.Button(
+                options_frame, text=text, style='Dark.TButton',
+                command=lambda v=value: self.quick_option(v)
+            ).pack(side=tk.LEFT, padx=5)
+
+        self.display_bot_message("Hello! I am Agro Aid. How can I help you today?\n")
+        self.display_bot_message(
+            "Please choose an option:\n1) Crop prediction\n2) Fertilizer recommendation\nType 'quit' to exit"
+        )
+
+    # ========== GRAPH FUNCTION (STEP 2) ==========
+    def show_graph(self, data, title, position='center'):
+        # One chart window per position, reused across predictions: the bars are
+        # updated in place instead of opening a new window and figure every time
+        entry = self.charts.get(position)
+        if entry is None or not entry['window'].winfo_exists():
+            entry = self.open_chart_window(position)
+
+        entry['window'].title(title)
+        entry['chart'].update(data, title)
+        entry['canvas'].draw_idle()
+        entry['window'].deiconify()
+        entry['window'].lift()
+
+    def open_chart_window(self, position):
+        # Position the new graph relative to the main window
+        self.root.update_idletasks()
+        root_x = self.root.winfo_x()
+        root_y = self.root.winfo_y()
+        root_w = self.root.winfo_width()
+        win_w = 600
+        win_h = 400
+
+        if position == 'left':
+            x = root_x + 50
+            y = root_y + 50
+        elif position == 'right':
+            x = root_x + 50 + win_w + 50
+            y = root_y + 50
+        else:
+            x = root_x + max(0, (root_w - win_w) // 2)
+            y = root_y + 50
+
+        window = tk.Toplevel(self.root)
+        window.geometry(f"{win_w}x{win_h}+{x}+{y}")
+        window.protocol('WM_DELETE_WINDOW', lambda: self.close_chart_window(position))
+
+        chart = BarChart(figsize=(6, 4))
+        canvas = FigureCanvasTkAgg(chart.figure, master=window)
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.charts[position] = {'window': window, 'chart': chart, 'canvas': canvas}
+        return self.charts[position]
+
+    def close_chart_window(self, position):
+        # Release the figure together with its window
+        entry = self.charts.pop(position, None)
+        if entry is None:
+            return
+        entry['canvas'].get_tk_widget().destroy()
+        entry['chart'].release()
+        entry['window'].destroy()
+
+    def display_bot_message(self, message):
+        self.chat_display.insert(tk.END, f"🤖 Bot: {message}\n", 'bot')
+        self.chat_display.see(tk.END)
+
+    def display_user_message(self, message):
+        self.chat_display.insert(tk.END, f"👤 You: {message}\n", 'user')
+        self.chat_display.see(tk.END)
+
+    def send_message(self):
+        message = self.input_field.get().strip()
+        if message:
+            self.input_field.delete(0, tk.END)
+            self.display_user_message(message)
+            if message.lower() == 'quit':
+                self.display_bot_message("Goodbye! 👋")
+                self.root.after(1000, self.root.destroy)
+                return
+            self.bot.process_input(message)
+
+    # ---------- Background inference ----------
+    def submit_inference(self, compute, deliver):
+        self.worker.submit(compute, deliver)
+        self.update_progress()
+
+    def poll_inference(self):
+        try:
+            self.worker.poll()
+        except Exception as e:
+            self.display_bot_message(f"❌ Error: {e}")
+        self.update_progress()
+        self.root.after(POLL_MS, self.poll_inference)
+
+    def update_progress(self):
+        pending = self.worker.pending()
+        if pending and not self.progress_frame.winfo_ismapped():
+            self.progress_frame.pack(fill=tk.X, pady=(0, 10), after=self.progress_anchor)
+            self.progress_bar.start(15)
+        elif not pending and self.progress_frame.winfo_ismapped():
+            self.progress_bar.stop()
+            self.progress_frame.pack_forget()
+        if pending:
+            queued = f" ({pending - 1} queued)" if pending > 1 else ""
+            self.progress_label.configure(text=f"⏳ Computing prediction...{queued}")
+
+    def cancel_inference(self):
+        if self.worker.cancel_pending():
+            self.display_bot_message("Prediction cancelled.")
+        self.update_progress()
+
+    def close(self):
+        self.worker.shutdown(timeout=0)
+        for position in list(self.charts):
+            self.close_chart_window(position)
+        self.root.destroy()
+
+    def quick_option(self, option):
+        self.input_field.delete(0, tk.END)
+        self.input_field.insert(0, option)
+        self.send_message()
+
+    def run(self):
+        self.root.mainloop()
+
+    # ---------- Inline quick-select helpers (GUI methods) ----------
+    def show_quick_options(self, key):
+        # Clear existing
+        for child in self.quick_select_frame.winfo_children():
+            child.destroy()
+
+        options = []
+        label_text = key
+        if key == 'Soil_Type':
+            options = list(agro_core.fertilizer_label_encoders()['Soil_Type'].classes_)
+            label_text = 'Soil Types:'
+        elif key == 'Crop':
+            options = list(agro_core.fertilizer_label_encoders()['Crop'].classes_)
+            label_text = 'Crops:'
+
+        # Title label
+        lbl = tk.Label(self.quick_select_frame, text=label_text, bg='#1a1a1a', fg='white')
+        lbl.pack(anchor='w', padx=5)
+
+        btn_frame = ttk.Frame(self.quick_select_frame, style='Dark.TFrame')
+        btn_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        # Create buttons for options
+        for opt in options:
+            b = tk.Button(btn_frame, text=opt, bg='#333333', fg='white', activebackground='#555555',
+                          relief=tk.RAISED, bd=1, command=lambda o=opt: self.select_quick_option(o))
+            b.pack(side=tk.LEFT, padx=4, pady=2)
+
+        # Also print options in the chat for visibility (in case buttons aren't visible)
+        if options:
+            try:
+                self.display_bot_message('Options: ' + ', '.join(options))
+            except Exception:
+                pass
+
+        self.quick_options_visible = True
+
+    def hide_quick_options(self):
+        for child in self.quick_select_frame.winfo_children():
+            child.destroy()
+        self.quick_options_visible = False
+
+    def select_quick_option(self, option):
+        # Insert into input and submit
+        self.input_field.delete(0, tk.END)
+        self.input_field.insert(0, option)
+        # Auto-send selection
+        self.send_message()
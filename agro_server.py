@@ -0,0 +1,437 @@
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import agro_core
+import stage_metrics
+from agro_core import CROP_FEATURES, FERTILIZER_FEATURES
+
+# Local HTTP/JSON inference service for the crop and fertilizer models.
+#
+#   POST /predict/crop        {"Nitrogen": 50, ...}  or  [{...}, {...}]  or  {"rows": [...]}
+#   POST /predict/fertilizer  same shapes, with Soil_Type and Crop as names
+#   POST /predict/<model>?explain=1  also each feature's attribution to the predicted class
+#   POST /predict/<model>?top_k=3    also the 3 best classes per output (and crop plans)
+#   POST /chart/<model>?format=png|svg  probability chart of the first row, drawn off-screen
+#   GET  /health, GET /stats, GET /metrics (Prometheus text: stage timings)
+#
+# Requests that arrive within max_wait_ms of each other are merged by a MicroBatcher
+# into one vectorised predict_proba call (up to max_batch_size rows), so under
+# concurrent load the number of model calls grows with batches, not with requests.
+
+DEFAULT_PORT = 8080
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 5.0
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MAX_TOP_K = 10
+
+
+# ================= MICRO-BATCHING =================
+
+class MicroBatcher:
+    def __init__(self, process, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, executor=None, name='model'):
+        # process: callable(list of rows) -> list of per-row results, run off the event loop
+        self.process = process
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = executor
+        self.queue = None
+        self._task = None
+        self.batches = 0
+        self.rows = 0
+        self.requests = 0
+        self.busy_seconds = 0.0
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, rows):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, future))
+        return await future
+
+    async def _collect(self):
+        # Block for the first request, then keep taking requests until the batch is
+        # full or the oldest request has waited max_wait
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        size = len(batch[0][0])
+        deadline = loop.time() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            rows = [row for request_rows, _ in batch for row in request_rows]
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.executor, self.process, rows)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                elapsed = time.perf_counter() - start
+                self.busy_seconds += elapsed
+                stage_metrics.METRICS.observe('server_' + self.name, 'batch', elapsed)
+            self.batches += 1
+            self.requests += len(batch)
+            self.rows += len(rows)
+
+            offset = 0
+            for request_rows, future in batch:
+                if not future.done():
+                    future.set_result(results[offset:offset + len(request_rows)])
+                offset += len(request_rows)
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'rows': self.rows,
+            'batches': self.batches,
+            'mean_batch_rows': self.rows / self.batches if self.batches else 0.0,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+        }
+
+
+# ================= SCORING =================
+
+def _format_rows(results, valid, error, explanations=None, top_k=0):
+    # Per-row payload with the same labels and percentages the chatbot shows; with
+    # explanations, every feature's attribution to the predicted class as well, and
+    # with top_k the k best classes as [label, percent] pairs, best first
+    decoded = {}
+    for target, (class_names, proba) in results.items():
+        labels, top = agro_core.top_labels(class_names, proba)
+        decoded[target] = (class_names, proba, labels, top)
+    ranked = agro_core.rank(results, top_k) if top_k and results else {}
+
+    out = []
+    j = 0
+    for ok in valid:
+        if not ok:
+            out.append({'valid': False, 'error': error})
+            continue
+        row = {'valid': True}
+        for target, (class_names, proba, labels, top) in decoded.items():
+            row[target] = {
+                'label': str(labels[j]),
+                'confidence': round(float(top[j]) * 100, 2),
+                'percentages': {str(name): round(float(p) * 100, 2)
+                                for name, p in zip(class_names, proba[j])},
+            }
+            if explanations:
+                row[target]['attributions'] = _attributions(explanations[target], j, proba[j].argmax())
+            if target in ranked:
+                row[target]['top_k'] = _ranked(*ranked[target], j)
+        out.append(row)
+        j += 1
+    return out
+
+
+def _attributions(explanation, j, c):
+    # Percentage points: base + sum(features) + non_tree_members = confidence
+    return {
+        'base': round(float(explanation['bias'][c]) * 100, 2),
+        'features': {name: round(float(v) * 100, 2)
+                     for name, v in zip(explanation['features'], explanation['contributions'][j, :, c])},
+        'non_tree_members': round(float(explanation['residual'][j, c]) * 100, 2),
+    }
+
+
+def _ranked(labels, top, j):
+    return [[str(label), round(float(p) * 100, 2)] for label, p in zip(labels[j], top[j])]
+
+
+def _score(X, valid, predict, explain_predict, explain, top_k, error):
+    if not valid.any():
+        return _format_rows({}, valid, error), {}
+    if not explain:
+        results = predict(X[valid])
+        return _format_rows(results, valid, error, top_k=top_k), results
+    explained = explain_predict(X[valid])
+    results = {target: (names, proba) for target, (names, proba, _) in explained.items()}
+    explanations = {target: e for target, (_, _, e) in explained.items()}
+    return _format_rows(results, valid, error, explanations, top_k), results
+
+
+def score_crop_rows(rows, explain=False, top_k=0):
+    import pandas as pd
+
+    X, valid = agro_core.encode_crop_frame(pd.DataFrame(rows, columns=CROP_FEATURES))
+    out, results = _score(X, valid, agro_core.predict_crop, agro_core.explain_crop, explain, top_k,
+                          "missing, non-numeric or out-of-range feature value")
+    if top_k and results:
+        # Joint ranking of whole (Crop, Soil_Type, Variety) plans
+        plans, top = agro_core.rank_crop_plans(results, top_k)
+        for j, row in enumerate(r for r in out if r['valid']):
+            row['plans'] = [[list(plan), round(float(p) * 100, 2)] for plan, p in zip(plans[j], top[j])]
+    return out
+
+
+def score_fertilizer_rows(rows, explain=False, top_k=0):
+    import pandas as pd
+
+    X, valid = agro_core.encode_fertilizer_frame(pd.DataFrame(rows, columns=FERTILIZER_FEATURES))
+    out, _ = _score(X, valid, agro_core.predict_fertilizer, agro_core.explain_fertilizer, explain, top_k,
+                    "unknown Soil_Type/Crop or missing, non-numeric or out-of-range feature value")
+    return out
+
+
+# ================= HTTP =================
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+CHART_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+def _parse_rows(body):
+    try:
+        payload = json.loads(body or b'null')
+    except ValueError:
+        raise HTTPError(400, "body is not valid JSON")
+    if isinstance(payload, dict) and isinstance(payload.get('rows'), list):
+        payload = payload['rows']
+    elif isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list) or not payload or not all(isinstance(r, dict) for r in payload):
+        raise HTTPError(400, "expected a JSON object, a list of objects or {\"rows\": [...]}")
+    return payload
+
+
+class AgroServer:
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, workers=1):
+        self.host = host
+        self.port = port
+        # Model calls run in a small thread pool so the event loop keeps accepting requests
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='agro-infer')
+        self.batchers = {
+            'crop': MicroBatcher(score_crop_rows, max_batch_size, max_wait_ms, self.executor, 'crop'),
+            'fertilizer': MicroBatcher(score_fertilizer_rows, max_batch_size, max_wait_ms, self.executor,
+                                       'fertilizer'),
+        }
+        # Requests with ?explain / ?top_k are batched with others asking for the same
+        # options; those batchers are created on first use
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.option_batchers = {}
+        self.server = None
+        # A figure is not safe to draw from two threads, so every executor thread keeps its own
+        self._charts = threading.local()
+
+    def _render_chart(self, kind, row, fmt):
+        # Runs on the inference executor; one reusable figure per (thread, model, format)
+        from chart_renderer import BarChart, PROBABILITY_CHARTS
+
+        target, title = PROBABILITY_CHARTS[kind]
+        charts = getattr(self._charts, 'by_key', None)
+        if charts is None:
+            charts = self._charts.by_key = {}
+        chart = charts.get((kind, fmt))
+        if chart is None:
+            chart = charts[(kind, fmt)] = BarChart()
+        return chart.update(row[target]['percentages'], title).render(fmt)
+
+    def _batcher(self, kind, explain, top_k):
+        if not explain and not top_k:
+            return self.batchers[kind]
+        key = (kind, explain, top_k)
+        batcher = self.option_batchers.get(key)
+        if batcher is None:
+            score = score_crop_rows if kind == 'crop' else score_fertilizer_rows
+            name = kind + ('_explain' if explain else '') + (f'_top{top_k}' if top_k else '')
+            batcher = MicroBatcher(partial(score, explain=explain, top_k=top_k), self.max_batch_size,
+                                   self.max_wait_ms, self.executor, name)
+            batcher.start()
+            self.option_batchers[key] = batcher
+        return batcher
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        # Load every model up front so the first request does not pay for it
+        for name in agro_core.active_models():
+            await loop.run_in_executor(self.executor, agro_core.load, name)
+        for batcher in self.batchers.values():
+            batcher.start()
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        for batcher in list(self.batchers.values()) + list(self.option_batchers.values()):
+            await batcher.stop()
+        self.executor.shutdown(wait=False)
+
+    async def route(self, method, path, body):
+        path, _, query = path.partition('?')
+        path = path.rstrip('/')
+        if path == '/health':
+            return {'status': 'ok'}
+        if path == '/metrics':
+            return stage_metrics.prometheus_text()
+        if path == '/stats':
+            return ({b.name: b.stats() for b in list(self.batchers.values()) + list(self.option_batchers.values())} |
+                    {'cache': agro_core.cache_stats(), 'cascade': agro_core.cascade_stats()})
+        if path.startswith('/predict/'):
+            kind = path[len('/predict/'):]
+            if kind not in self.batchers:
+                raise HTTPError(404, f"unknown model {kind!r}")
+            if method != 'POST':
+                raise HTTPError(405, "use POST")
+            rows = _parse_rows(body)
+            params = dict(p.partition('=')[::2] for p in query.split('&') if p)
+            explain = params.get('explain', '0') not in ('', '0', 'false')
+            try:
+                top_k = min(int(params.get('top_k', 0)), MAX_TOP_K)
+            except ValueError:
+                raise HTTPError(400, "top_k must be an integer")
+            return {'predictions': await self._batcher(kind, explain, max(top_k, 0)).submit(rows)}
+        if path.startswith('/chart/'):
+            kind = path[len('/chart/'):]
+            if kind not in self.batchers:
+                raise HTTPError(404, f"unknown model {kind!r}")
+            if method != 'POST':
+                raise HTTPError(405, "use POST")
+            params = dict(p.partition('=')[::2] for p in query.split('&') if p)
+            fmt = params.get('format', 'png')
+            if fmt not in CHART_TYPES:
+                raise HTTPError(400, f"format must be one of {sorted(CHART_TYPES)}")
+            row = (await self.batchers[kind].submit(_parse_rows(body)[:1]))[0]
+            if not row['valid']:
+                raise HTTPError(400, row['error'])
+            loop = asyncio.get_running_loop()
+            image = await loop.run_in_executor(self.executor, self._render_chart, kind, row, fmt)
+            return CHART_TYPES[fmt], image
+        raise HTTPError(404, f"no route for {path}")
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                request = request_line.decode('latin-1').split()
+                headers = {}
+                if len(request) == 3:
+                    method, path, version = request
+                    while True:
+                        line = await reader.readline()
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+                        key, _, value = line.decode('latin-1').partition(':')
+                        headers[key.strip().lower()] = value.strip()
+                else:
+                    # Answered with a 400 right away, without reading headers that may never end
+                    method = path = version = None
+                # Where the next request starts is unknown after a framing error, so close
+                framing_error = True
+                try:
+                    if method is None:
+                        raise HTTPError(400, "malformed request line")
+                    try:
+                        length = int(headers.get('content-length', 0))
+                    except ValueError:
+                        raise HTTPError(400, "Content-Length must be an integer")
+                    if length < 0:
+                        raise HTTPError(400, "Content-Length must not be negative")
+                    framing_error = False
+                    if length > MAX_BODY_BYTES:
+                        raise HTTPError(413, "request body too large")
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = 200, await self.route(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+
+                if isinstance(payload, tuple):
+                    content_type, data = payload
+                elif isinstance(payload, str):
+                    content_type, data = 'text/plain; version=0.0.4', payload.encode()
+                else:
+                    content_type, data = 'application/json', json.dumps(payload).encode()
+                keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                              and status != 413 and not framing_error)
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(args):
+    server = AgroServer(args.host, args.port, args.max_batch_size, args.max_wait_ms, args.workers)
+    await server.start()
+    print(f"✅ Agro Aid inference service listening on http://{server.host}:{server.port}")
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Agro Aid models over HTTP/JSON.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help="most rows merged into one model call")
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help="longest a request waits for others to join its batch")
+    parser.add_argument('--workers', type=int, default=1, help="inference threads")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\nInterrupted by user. Exiting.")
+
+
+if __name__ == '__main__':
+    main()
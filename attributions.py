@@ -0,0 +1,178 @@
+import numpy as np
+
+from forest_engine import COMPACT_EVERY, ForestEngine
+
+# Exact per-prediction feature attributions for the tree models.
+#
+# Path decomposition (Saabas): every node of a fitted tree holds the class
+# distribution of the training rows that reached it. Walking a row from the root to
+# its leaf, each split moves the distribution from value[parent] to value[child], and
+# that change is credited to the parent's split feature. Summed along the path the
+# changes telescope, so for every row and class
+#
+#     predict_proba = bias + sum over features of contributions
+#
+# exactly, with bias = the root distribution (the training class mix). A forest
+# averages its trees' decompositions. No sampling or background data is involved: it
+# is the same walk as inference, plus one bincount per depth step, so a whole batch
+# is explained at a small multiple of the cost of predicting it.
+#
+# Soft-voting ensembles weight their members' decompositions. Members without trees
+# (the crop SVC) cannot be decomposed this way; their weighted probabilities are
+# returned as `residual`, keeping proba = bias + contributions.sum(features) + residual.
+#
+# Explainers are built from the same ForestEngine arrays inference uses, which hold
+# every node's distribution. Compact exports (compact_model.py) keep leaf values only,
+# so they cannot be explained; load the pickle or the model_artifacts export instead.
+
+EXPLAIN_BLOCK_ROWS = 1024
+
+
+# ================= TREES =================
+
+class TreeExplainer:
+    def __init__(self, engine):
+        if len(engine.value) != len(engine.feature):
+            raise ValueError("This forest keeps leaf values only (compact export); attributions need "
+                             "the pickled model or its model_artifacts export")
+        self.engine = engine
+        self.classes_ = engine.classes_
+        self.feature_names = engine.feature_names_in_
+        self.bias = np.asarray(engine.value[engine.roots]).mean(axis=0)
+
+    def _explain_block(self, X):
+        e = self.engine
+        n, n_features = X.shape
+        n_classes = e.value.shape[1]
+        flat = X.ravel()
+        cur = np.tile(e.roots, n)
+        cell = np.repeat(np.arange(n, dtype=np.intp) * n_features, e.n_trees)
+        offsets = np.arange(n_classes)
+        out = np.zeros(n * n_features * n_classes)
+        for step in range(e.max_depth):
+            f = e.feature[cur]
+            go_right = ~(flat[cell + f] <= e.threshold[cur])
+            child = e._flat_children[2 * cur + go_right]
+            # Leaves are self-loops, so pairs already at a leaf add a zero change
+            delta = e.value[child] - e.value[cur]
+            slots = ((cell + f) * n_classes)[:, None] + offsets
+            out += np.bincount(slots.ravel(), weights=delta.ravel(), minlength=out.size)
+            cur = child
+            if step % COMPACT_EVERY == COMPACT_EVERY - 1:
+                keep = e._flat_children[2 * cur] != cur
+                cur, cell = cur[keep], cell[keep]
+                if not cur.size:
+                    break
+        return out.reshape(n, n_features, n_classes) / e.n_trees
+
+    def explain(self, X):
+        # (proba, bias, contributions, residual) with shapes (n, C), (C,), (n, F, C), (n, C)
+        if self.feature_names is None and hasattr(X, 'columns'):
+            self.feature_names = [str(c) for c in X.columns]
+        X = self.engine._matrix(X)
+        contributions = np.concatenate([self._explain_block(X[lo:lo + EXPLAIN_BLOCK_ROWS])
+                                        for lo in range(0, len(X), EXPLAIN_BLOCK_ROWS)] or
+                                       [np.zeros((0, X.shape[1], len(self.bias)))])
+        proba = self.bias + contributions.sum(axis=1)
+        return proba, self.bias, contributions, np.zeros_like(proba)
+
+
+# ================= ENSEMBLES =================
+
+class VotingExplainer:
+    def __init__(self, members, weights, classes):
+        # members: (explainer or None, estimator); None members go to the residual
+        self.members = members
+        weights = np.ones(len(members)) if weights is None else np.asarray(weights, dtype=float)
+        self.weights = weights / weights.sum()
+        self.classes_ = np.asarray(classes)
+        trees = [explainer for explainer, _ in members if explainer is not None]
+        if not trees:
+            raise ValueError("None of the ensemble members is a tree model")
+        self.feature_names = trees[0].feature_names
+
+    def explain(self, X):
+        proba = bias = contributions = residual = 0.0
+        for (explainer, estimator), weight in zip(self.members, self.weights):
+            if explainer is None:
+                member_proba = estimator.predict_proba(X)
+                residual = residual + weight * member_proba
+            else:
+                member_proba, member_bias, member_contributions, _ = explainer.explain(X)
+                bias = bias + weight * member_bias
+                contributions = contributions + weight * member_contributions
+                if self.feature_names is None:
+                    self.feature_names = explainer.feature_names
+            proba = proba + weight * member_proba
+        residual = residual + np.zeros_like(proba)
+        return proba, bias, contributions, residual
+
+
+def build_explainer(estimator):
+    # Explainer for a fitted model as agro_core loads it: sklearn forests and trees,
+    # ForestEngine, soft VotingClassifier / PackedVoting, and MultiOutputClassifier /
+    # PackedMultiOutput / CascadeMultiOutput / StudentModel (a list with one explainer per output)
+    from sklearn.ensemble import RandomForestClassifier, VotingClassifier
+    from sklearn.multioutput import MultiOutputClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    from cascade import CascadeMultiOutput
+    from distill import StudentModel
+    from model_artifacts import PackedMultiOutput, PackedVoting
+
+    if isinstance(estimator, CascadeMultiOutput):
+        # Attributions always decompose the full vote
+        return build_explainer(estimator.model)
+    if isinstance(estimator, (MultiOutputClassifier, PackedMultiOutput, StudentModel)):
+        return [build_explainer(e) for e in estimator.estimators_]
+    if isinstance(estimator, ForestEngine):
+        return TreeExplainer(estimator)
+    if isinstance(estimator, (RandomForestClassifier, DecisionTreeClassifier)):
+        return TreeExplainer(ForestEngine.from_sklearn(estimator, keep_estimator=False))
+    if isinstance(estimator, VotingClassifier) and estimator.voting == 'soft':
+        weights = getattr(estimator, '_weights_not_none', None)
+        return VotingExplainer([(_member_explainer(m), m) for m in estimator.estimators_],
+                               weights, estimator.classes_)
+    if isinstance(estimator, PackedVoting):
+        return VotingExplainer([(_member_explainer(m), m) for m in estimator.estimators_],
+                               estimator.weights, estimator.classes_)
+    raise ValueError(f"Cannot explain a {type(estimator).__name__}")
+
+
+def _member_explainer(member):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    if isinstance(member, (ForestEngine, RandomForestClassifier, DecisionTreeClassifier)):
+        return build_explainer(member)
+    return None
+
+
+# ================= REPORTING =================
+# These take the explanation dicts of agro_core.explain_crop / explain_fertilizer:
+# {'features', 'bias', 'contributions', 'residual'}.
+
+def top_factors(explanation, class_index, k=3):
+    # The k largest attributions (by size) towards class_index[i] for every row i:
+    # one [(feature, contribution), ...] list per row
+    contributions = explanation['contributions']
+    per_class = contributions[np.arange(len(contributions)), :, class_index]
+    k = min(k, per_class.shape[1])
+    order = np.argsort(-np.abs(per_class), axis=1, kind='stable')[:, :k]
+    names = np.asarray(explanation['features'], dtype=object)
+    return [list(zip(names[o].tolist(), per_class[i, o].tolist())) for i, o in enumerate(order)]
+
+
+def describe(explanation, class_index, k=3):
+    # "Nitrogen +12.3 pts, Moisture -4.1 pts (base 14.3%)" per row, in probability
+    # percentage points; the share of members without trees is added when there is one
+    class_index = np.asarray(class_index)
+    rows = np.arange(len(class_index))
+    base = explanation['bias'][class_index]
+    residual = explanation['residual'][rows, class_index]
+    texts = []
+    for factors, b, r in zip(top_factors(explanation, class_index, k), base, residual):
+        text = ', '.join(f"{name} {value * 100:+.1f} pts" for name, value in factors)
+        other = f", non-tree members {r:.1%}" if r else ""
+        texts.append(f"{text} (base {b:.1%}{other})")
+    return texts
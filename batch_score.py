@@ -0,0 +1,227 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import agro_core
+from agro_core import CROP_TARGETS, FERTILIZER_TARGET
+from input_schema import describe_errors
+
+DEFAULT_CHUNKSIZE = 50000
+
+# What happens to rows that break the input schema:
+#   flag   keep them with Valid=False and the offending columns in Errors
+#   drop   leave them out of the output
+#   clamp  pull values outside the physical limits to the nearest limit, flag the rest
+# Valid rows outside the training data are scored and name those columns in Warnings.
+INVALID_ACTIONS = ('flag', 'drop', 'clamp')
+
+
+# ================= CHUNK SCORING =================
+
+def _empty_output(chunk, targets, explain=0, top_k=0):
+    out = pd.DataFrame(index=chunk.index)
+    for target in targets:
+        out['Predicted_' + target] = None
+        out['Predicted_' + target + '_Probability'] = np.nan
+        if explain:
+            out['Why_' + target] = None
+        _add_ranked_columns(out, target, top_k)
+    return out
+
+
+def _add_ranked_columns(out, name, top_k):
+    for i in range(1, top_k + 1):
+        out[f'Top{i}_{name}'] = None
+        out[f'Top{i}_{name}_Probability'] = np.nan
+
+
+def _fill_ranked(out, valid, name, labels, top):
+    for i in range(labels.shape[1]):
+        out.loc[valid, f'Top{i + 1}_{name}'] = labels[:, i]
+        out.loc[valid, f'Top{i + 1}_{name}_Probability'] = top[:, i]
+
+
+def _fill_predictions(out, valid, results, top_k=0):
+    for target, (class_names, proba) in results.items():
+        labels, top = agro_core.top_labels(class_names, proba)
+        out.loc[valid, 'Predicted_' + target] = labels
+        out.loc[valid, 'Predicted_' + target + '_Probability'] = top
+    if top_k:
+        for target, (labels, top) in agro_core.rank(results, top_k).items():
+            _fill_ranked(out, valid, target, labels, top)
+
+
+def _score_valid(out, X, valid, predict, explain_predict, explain, top_k, on_results):
+    if not valid.any():
+        return None
+    if explain:
+        # The explained pass returns the probabilities too, so the trees are walked once
+        from attributions import describe
+        explained = explain_predict(X[valid])
+        results = {target: (names, proba) for target, (names, proba, _) in explained.items()}
+        for target, (_, proba, explanation) in explained.items():
+            out.loc[valid, 'Why_' + target] = describe(explanation, proba.argmax(axis=1), explain)
+    else:
+        results = predict(X[valid])
+    _fill_predictions(out, valid, results, top_k)
+    if on_results:
+        on_results(valid, results)
+    return results
+
+
+def score_crop_chunk(chunk, on_results=None, corrections=None, policy='reject', explain=0, top_k=0):
+    # on_results(valid, results) sees the full class probabilities of the valid rows;
+    # explain=k adds the k largest feature attributions of each prediction and top_k=k
+    # the k best classes of every output plus the k best (Crop, Soil_Type, Variety) plans
+    X, valid = agro_core.encode_crop_frame(chunk, policy)
+
+    out = _empty_output(chunk, CROP_TARGETS, explain, top_k)
+    _add_ranked_columns(out, 'Plan', top_k)
+    results = _score_valid(out, X, valid, agro_core.predict_crop, agro_core.explain_crop, explain,
+                           top_k, on_results)
+    if top_k and results:
+        plans, top = agro_core.rank_crop_plans(results, top_k)
+        _fill_ranked(out, valid, 'Plan', np.array([[' / '.join(p) for p in row] for row in plans]), top)
+    out['Valid'] = valid
+    out['Errors'] = describe_errors(X.isna())
+    out['Warnings'] = describe_errors(agro_core.training_range_flags('crop', X))
+    return out
+
+
+def score_fertilizer_chunk(chunk, on_results=None, corrections=None, policy='reject', explain=0, top_k=0):
+    # corrections collects the Soil_Type/Crop values the codec rewrote
+    X, valid = agro_core.encode_fertilizer_frame(chunk, corrections, policy)
+
+    out = _empty_output(chunk, [FERTILIZER_TARGET], explain, top_k)
+    _score_valid(out, X, valid, agro_core.predict_fertilizer, agro_core.explain_fertilizer, explain,
+                 top_k, on_results)
+    out['Valid'] = valid
+    out['Errors'] = describe_errors(X.isna())
+    out['Warnings'] = describe_errors(agro_core.training_range_flags('fertilizer', X))
+    return out
+
+
+# ================= CHARTS =================
+
+def chart_writer(kind, out_dir, fmt='png'):
+    # on_results callback that renders each valid row's probability chart off-screen.
+    # One figure is reused for every row, so memory stays flat however many are drawn.
+    from chart_renderer import BarChart, PROBABILITY_CHARTS, percentages
+
+    os.makedirs(out_dir, exist_ok=True)
+    target, title = PROBABILITY_CHARTS[kind]
+    chart = BarChart()
+    state = {'row': 0}
+
+    def write(valid, results):
+        class_names, proba = results[target]
+        rows = np.flatnonzero(valid) + state['row']
+        for row, proba_row in zip(rows, proba):
+            path = os.path.join(out_dir, f"{kind}_{row:08d}.{fmt}")
+            with open(path, 'wb') as f:
+                f.write(chart.update(percentages(class_names, proba_row), title).render(fmt))
+        state['row'] += len(valid)
+    return write
+
+
+# ================= STREAMING =================
+
+def print_corrections(corrections):
+    for col, fixed in corrections.items():
+        for value, (name, confidence) in fixed.items():
+            print(f"🔧 {col} '{value}' read as '{name}' ({confidence:.0%} match)", file=sys.stderr)
+
+
+def score_stream(kind, reader, writer, chunksize=DEFAULT_CHUNKSIZE, keep_inputs=True, progress=None,
+                 on_results=None, corrections=None, invalid='flag', explain=0, top_k=0):
+    score_chunk = score_crop_chunk if kind == 'crop' else score_fertilizer_chunk
+    policy = 'clamp' if invalid == 'clamp' else 'reject'
+
+    rows = 0
+    # Only one chunk is alive at a time, so memory stays flat regardless of input size
+    for i, chunk in enumerate(pd.read_csv(reader, chunksize=chunksize)):
+        scored = score_chunk(chunk, on_results, corrections, policy, explain, top_k)
+        if keep_inputs:
+            scored = pd.concat([chunk, scored], axis=1)
+        if invalid == 'drop':
+            scored = scored[scored['Valid']]
+        scored.to_csv(writer, header=(i == 0), index=False)
+        rows += len(chunk)
+        if progress:
+            progress(rows)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV file with the Agro Aid models in chunks.")
+    parser.add_argument('kind', choices=['crop', 'fertilizer'])
+    parser.add_argument('input', help="input CSV path, or '-' for stdin")
+    parser.add_argument('output', help="output CSV path, or '-' for stdout")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--predictions-only', action='store_true',
+                        help="write only the prediction columns, not the input columns")
+    parser.add_argument('--charts', metavar='DIR',
+                        help="also render each row's probability chart into DIR (row-numbered files)")
+    parser.add_argument('--chart-format', choices=['png', 'svg'], default='png')
+    parser.add_argument('--invalid', choices=INVALID_ACTIONS, default='flag',
+                        help="what to do with rows that are missing values or out of the valid ranges")
+    parser.add_argument('--explain', type=int, default=0, metavar='K',
+                        help="add a Why_<target> column with the K largest feature attributions of each prediction")
+    parser.add_argument('--top-k', type=int, default=0, metavar='K',
+                        help="add the K best classes of each output (and, for crop, the K best "
+                             "Crop / Soil_Type / Variety plans) with their probabilities")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="score byte-range shards on this many processes (resumable; files only)")
+    parser.add_argument('--shard-mb', type=float, default=64,
+                        help="approximate shard size in MB for --workers; the shards depend on this "
+                             "and the input only, so a rerun with other --workers still resumes")
+    parser.add_argument('--keep-shards', action='store_true',
+                        help="keep the per-shard outputs next to the output file after merging")
+    args = parser.parse_args(argv)
+
+    if args.workers:
+        if '-' in (args.input, args.output):
+            parser.error("--workers needs a real input and output file")
+        if args.charts:
+            parser.error("--charts is not supported with --workers")
+        from sharded_score import score_file, progress_printer
+
+        start = time.perf_counter()
+        corrections = {}
+        rows = score_file(args.kind, args.input, args.output, args.workers,
+                          int(args.shard_mb * 1024 * 1024), args.chunksize,
+                          not args.predictions_only, args.keep_shards, progress_printer(start),
+                          args.invalid, args.explain, args.top_k, corrections)
+        print_corrections(corrections)
+        print(f"✅ Scored {rows} rows in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+        return
+
+    reader = sys.stdin if args.input == '-' else args.input
+    start = time.perf_counter()
+
+    def progress(rows):
+        elapsed = time.perf_counter() - start
+        print(f"⏳ {rows} rows scored ({rows / elapsed:.0f} rows/s)", file=sys.stderr)
+
+    on_results = chart_writer(args.kind, args.charts, args.chart_format) if args.charts else None
+    corrections = {}
+    if args.output == '-':
+        rows = score_stream(args.kind, reader, sys.stdout, args.chunksize,
+                            not args.predictions_only, progress, on_results, corrections,
+                            args.invalid, args.explain, args.top_k)
+    else:
+        with open(args.output, 'w', newline='') as writer:
+            rows = score_stream(args.kind, reader, writer, args.chunksize,
+                                not args.predictions_only, progress, on_results, corrections,
+                                args.invalid, args.explain, args.top_k)
+
+    print_corrections(corrections)
+    print(f"✅ Scored {rows} rows in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
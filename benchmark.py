@@ -0,0 +1,288 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Performance benchmark suite for Agro Aid.
+#
+# Every measurement runs in a fresh child process (python benchmark.py --child ...) so
+# import time, model load time and peak RSS are not skewed by what ran before. Results
+# are written as flat "section.name" metrics to a JSON file and can be diffed against a
+# stored baseline; throughput metrics (*_rows_per_s) are higher-is-better, everything
+# else lower-is-better.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASETS = ['sensor_Crop_Dataset.csv', 'data_core.csv']
+TRAINING_SCRIPTS = {'crop': 'Crop_training_model.py', 'fertilizer': 'Fertilizer_training_model.py'}
+DEFAULT_BATCH_SIZES = [1, 16, 256, 1024]
+DEFAULT_OUTPUT = 'benchmark_results.json'
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+DEFAULT_TOLERANCE = 0.15
+
+
+def _peak_rss_mb(who=None):
+    import resource
+
+    who = resource.RUSAGE_SELF if who is None else who
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(who).ru_maxrss / scale
+
+
+# ================= CHILD MEASUREMENTS =================
+
+def _child_import():
+    start = time.perf_counter()
+    # Imported only to time the app's startup import in a fresh process
+    import Agro  # noqa: F401
+    return {'import_s': time.perf_counter() - start}
+
+
+def _child_load():
+    import agro_core
+
+    out = {}
+    for name in agro_core.active_models():
+        start = time.perf_counter()
+        agro_core.load(name)
+        out[name + '_s'] = time.perf_counter() - start
+    out['peak_rss_mb'] = _peak_rss_mb()
+    return out
+
+
+def _inference_data():
+    import pandas as pd
+    import agro_core
+
+    crop = agro_core.crop_frame(pd.read_csv('sensor_Crop_Dataset.csv', nrows=max(DEFAULT_BATCH_SIZES)))
+    fert, _ = agro_core.encode_fertilizer_frame(pd.read_csv('data_core.csv', nrows=max(DEFAULT_BATCH_SIZES)))
+    return {'crop': (agro_core.predict_crop, crop), 'fertilizer': (agro_core.predict_fertilizer, fert)}
+
+
+def _child_latency(runs):
+    out = {}
+    for kind, (predict, X) in _inference_data().items():
+        predict(X.iloc[:1])  # warm-up: model load and first-call overhead
+        samples = []
+        for i in range(runs):
+            row = X.iloc[[i % len(X)]]
+            start = time.perf_counter()
+            predict(row)
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        out[kind + '.p50_ms'] = samples[len(samples) // 2]
+        out[kind + '.p99_ms'] = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        out[kind + '.mean_ms'] = statistics.fmean(samples)
+    out['peak_rss_mb'] = _peak_rss_mb()
+    return out
+
+
+def _child_throughput(batch_sizes, min_seconds):
+    out = {}
+    for kind, (predict, X) in _inference_data().items():
+        predict(X.iloc[:1])
+        for size in batch_sizes:
+            batch = X.iloc[:size]
+            rows = 0
+            start = time.perf_counter()
+            # Repeat until the measurement is long enough to be stable
+            while True:
+                predict(batch)
+                rows += len(batch)
+                elapsed = time.perf_counter() - start
+                if elapsed >= min_seconds and rows >= 3 * len(batch):
+                    break
+            out[f'{kind}.batch_{size}_rows_per_s'] = rows / elapsed
+    out['peak_rss_mb'] = _peak_rss_mb()
+    return out
+
+
+def _child_train(script, script_args):
+    import contextlib
+    import runpy
+
+    # Keep the training script's own output off stdout, which carries the result
+    sys.path.insert(0, REPO_DIR)
+    sys.argv = [script] + script_args
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        runpy.run_path(os.path.join(REPO_DIR, script), run_name='__main__')
+    return {'wall_s': time.perf_counter() - start, 'peak_rss_mb': _peak_rss_mb()}
+
+
+def run_child(section, *args, cwd=REPO_DIR, env=None):
+    cmd = [sys.executable, os.path.join(REPO_DIR, 'benchmark.py'), '--child', section, *args]
+    proc = subprocess.run(cmd, cwd=cwd, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"benchmark child '{section}' failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# ================= SUITE =================
+
+def measure_startup(repeats=5):
+    metrics = {}
+    samples = [run_child('import')['import_s'] for _ in range(repeats)]
+    metrics['startup.import_agro_s'] = statistics.median(samples)
+
+    # Cold load from the pickles, and from the memory-mapped artifacts when they exist
+    env = dict(os.environ, AGRO_ARTIFACT_DIR='')
+    for name, seconds in run_child('load', env=env).items():
+        metrics[f'startup.load_pickle.{name}'] = seconds
+    import agro_core
+    import model_artifacts
+
+    if agro_core.ARTIFACT_DIR and all(
+            model_artifacts.is_fresh(model_artifacts.artifact_path(name, agro_core.ARTIFACT_DIR),
+                                     agro_core.model_path(name))
+            for name in agro_core.ARTIFACT_MODELS):
+        for name, seconds in run_child('load').items():
+            metrics[f'startup.load_artifacts.{name}'] = seconds
+    return metrics
+
+
+def measure_inference(latency_runs, batch_sizes, min_seconds):
+    metrics = {}
+    for name, value in run_child('latency', str(latency_runs)).items():
+        metrics['latency.' + name] = value
+    sizes = ','.join(str(s) for s in batch_sizes)
+    for name, value in run_child('throughput', sizes, str(min_seconds)).items():
+        metrics['throughput.' + name] = value
+    return metrics
+
+
+def measure_training(crop_profile):
+    # Train in a scratch directory so the benchmark never overwrites the shipped models
+    metrics = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for dataset in DATASETS:
+            os.symlink(os.path.join(REPO_DIR, dataset), os.path.join(tmp, dataset))
+        for kind, script in TRAINING_SCRIPTS.items():
+            script_args = ['--profile', crop_profile] if kind == 'crop' else []
+            result = run_child('train', script, *script_args, cwd=tmp)
+            metrics[f'training.{kind}.wall_s'] = result['wall_s']
+            metrics[f'training.{kind}.peak_rss_mb'] = result['peak_rss_mb']
+    return metrics
+
+
+def run_suite(latency_runs=100, batch_sizes=DEFAULT_BATCH_SIZES, min_seconds=1.0,
+              training=True, crop_profile='full', progress=print):
+    metrics = {}
+    progress("⏳ Measuring import and model load time...")
+    metrics.update(measure_startup())
+    progress("⏳ Measuring single-row latency and batch throughput...")
+    metrics.update(measure_inference(latency_runs, batch_sizes, min_seconds))
+    if training:
+        progress(f"⏳ Measuring training time ({crop_profile} crop profile)...")
+        metrics.update(measure_training(crop_profile))
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'latency_runs': latency_runs,
+            'crop_profile': crop_profile if training else None,
+        },
+        'metrics': {name: round(value, 6) for name, value in sorted(metrics.items())},
+    }
+
+
+# ================= BASELINE COMPARISON =================
+
+def higher_is_better(metric):
+    return metric.endswith('_rows_per_s')
+
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    # Returns rows of (metric, baseline, current, relative change, regressed)
+    rows = []
+    for metric in sorted(set(current) | set(baseline)):
+        old, new = baseline.get(metric), current.get(metric)
+        if old is None or new is None or old == 0:
+            rows.append((metric, old, new, None, False))
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better(metric) else change
+        rows.append((metric, old, new, change, worse > tolerance))
+    return rows
+
+
+def _fmt(value):
+    return f"{value:>12.4f}" if value is not None else f"{'-':>12}"
+
+
+def print_comparison(rows):
+    print(f"\n📊 {'metric':<48} {'baseline':>12} {'current':>12} {'change':>8}")
+    for metric, old, new, change, regressed in rows:
+        delta = f"{change * 100:>+7.1f}%" if change is not None else f"{'new' if old is None else '-':>8}"
+        flag = "  ⚠️ regression" if regressed else ""
+        print(f"   {metric:<48} {_fmt(old)} {_fmt(new)} {delta}{flag}")
+
+
+def _run_child_section(section, rest):
+    if section == 'import':
+        return _child_import()
+    if section == 'load':
+        return _child_load()
+    if section == 'latency':
+        return _child_latency(int(rest[0]))
+    if section == 'throughput':
+        return _child_throughput([int(s) for s in rest[0].split(',')], float(rest[1]))
+    return _child_train(rest[0], rest[1:])
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # Internal entry point used by run_child; arguments are passed through untouched
+    if argv and argv[0] == '--child':
+        print(json.dumps(_run_child_section(argv[1], argv[2:])))
+        return 0
+
+    parser = argparse.ArgumentParser(description="Benchmark Agro Aid inference, training and startup.")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="where to write the results JSON")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="results JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="also store the results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="relative slowdown reported as a regression (default 0.15)")
+    parser.add_argument('--fail-on-regression', action='store_true', help="exit with status 1 on regressions")
+    parser.add_argument('--latency-runs', type=int, default=100)
+    parser.add_argument('--batch-sizes', default=','.join(str(s) for s in DEFAULT_BATCH_SIZES))
+    parser.add_argument('--min-seconds', type=float, default=1.0, help="minimum timing window per batch size")
+    parser.add_argument('--skip-training', action='store_true', help="skip the (slow) training benchmarks")
+    parser.add_argument('--crop-profile', choices=['full', 'fast'], default='full')
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.latency_runs, [int(s) for s in args.batch_sizes.split(',')],
+                        args.min_seconds, not args.skip_training, args.crop_profile)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {args.output}")
+
+    status = 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(results['metrics'], baseline['metrics'], args.tolerance)
+        print_comparison(rows)
+        regressions = [row[0] for row in rows if row[4]]
+        if regressions:
+            print(f"\n⚠️ {len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            status = 1 if args.fail_on_regression else 0
+    else:
+        print(f"⚠️ No baseline at {args.baseline}; run with --save-baseline to store one")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Baseline stored in {args.baseline}")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import argparse
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+
+import agro_core
+from training_utils import resolve_n_jobs
+
+# First-run model bootstrap.
+#
+# The training scripts that create the missing model files run side by side as
+# subprocesses, each with --checkpoint-dir pointing at its own directory under
+# CHECKPOINT_DIR. They run in agro_core.MODEL_DIR, where they save the models and where
+# agro_core looks for them, with the scripts and their datasets found next to this
+# file. The worker budget is split between them by WORKER_WEIGHTS, and the crop trainer
+# spreads its share over its (output, member) fits. Their output is streamed line by line; "[done/total]" lines (see
+# training_utils.print_progress) drive the progress fraction. Every fitted crop
+# member and every batch of fertilizer trees is checkpointed as it finishes, so a
+# bootstrap that fails or is interrupted resumes where it stopped on the next run.
+# The scripts save the models through a temp file + os.replace, so a half-written
+# pickle is never picked up by agro_core.
+#
+# agro_gui.ensure_models drives a Bootstrap from the Tk loop with poll();
+# `python bootstrap.py` does the same headless.
+
+CHECKPOINT_DIR = os.environ.get('AGRO_CHECKPOINT_DIR', os.path.join(agro_core.MODEL_DIR, '.training_checkpoints'))
+PROGRESS = re.compile(r'\[(\d+)/(\d+)\]')
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATASETS = {'Crop_training_model.py': 'sensor_Crop_Dataset.csv', 'Fertilizer_training_model.py': 'data_core.csv'}
+# The crop ensemble (three outputs with a kernel SVC each) is by far the slowest to train
+WORKER_WEIGHTS = {'Crop_training_model.py': 3}
+
+
+def split_budget(scripts, n_jobs=-1):
+    # {script: --n-jobs}, in proportion to WORKER_WEIGHTS (1 for unlisted scripts)
+    budget = resolve_n_jobs(n_jobs)
+    weights = [WORKER_WEIGHTS.get(os.path.basename(s), 1) for s in scripts]
+    return {s: max(1, budget * w // sum(weights)) for s, w in zip(scripts, weights)}
+
+
+class Bootstrap:
+    def __init__(self, scripts=None, checkpoint_dir=CHECKPOINT_DIR, n_jobs=-1):
+        # scripts default to those that create the currently missing model files
+        if scripts is None:
+            scripts = sorted({agro_core.TRAINING_SCRIPTS[f] for f in agro_core.missing_model_files()})
+        self.scripts = list(scripts)
+        self.checkpoint_dir = checkpoint_dir
+        self.n_jobs = split_budget(self.scripts, n_jobs)
+        self.progress = dict.fromkeys(self.scripts, 0.0)
+        self.returncodes = {}
+        self.processes = {}
+        self._events = queue.Queue()
+
+    def command(self, script):
+        name = os.path.basename(script)
+        checkpoints = os.path.join(os.path.abspath(self.checkpoint_dir), os.path.splitext(name)[0])
+        command = [sys.executable, '-u', os.path.join(HERE, script), '--checkpoint-dir', checkpoints,
+                   '--n-jobs', str(self.n_jobs[script])]
+        if name in DATASETS:
+            command += ['--data', os.path.join(HERE, DATASETS[name])]
+        return command
+
+    def start(self):
+        os.makedirs(agro_core.MODEL_DIR, exist_ok=True)
+        for script in self.scripts:
+            proc = subprocess.Popen(self.command(script), cwd=agro_core.MODEL_DIR,
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+            self.processes[script] = proc
+            threading.Thread(target=self._read, args=(script, proc), daemon=True).start()
+        return self
+
+    def _read(self, script, proc):
+        for line in proc.stdout:
+            self._events.put((script, line.rstrip('\n')))
+        # An int marks the end of the script's output
+        self._events.put((script, proc.wait()))
+
+    def _handle(self, script, item, lines):
+        if isinstance(item, int):
+            self.returncodes[script] = item
+            if item == 0:
+                self.progress[script] = 1.0
+            return
+        match = PROGRESS.search(item)
+        if match and int(match[2]):
+            self.progress[script] = int(match[1]) / int(match[2])
+        lines.append((script, item))
+
+    def poll(self):
+        # Output lines that arrived since the last call, as (script, line)
+        lines = []
+        while True:
+            try:
+                script, item = self._events.get_nowait()
+            except queue.Empty:
+                return lines
+            self._handle(script, item, lines)
+
+    def wait(self, on_line=None):
+        # Block until every script has exited, passing each output line to on_line
+        while not self.done:
+            lines = []
+            self._handle(*self._events.get(), lines)
+            for script, line in lines:
+                if on_line is not None:
+                    on_line(script, line)
+        return self.failed
+
+    def cancel(self):
+        # Checkpoints already written stay for the next run
+        for proc in self.processes.values():
+            if proc.poll() is None:
+                proc.terminate()
+
+    @property
+    def done(self):
+        return len(self.returncodes) == len(self.scripts)
+
+    @property
+    def failed(self):
+        return [script for script, code in self.returncodes.items() if code != 0]
+
+    def fraction(self):
+        return sum(self.progress.values()) / len(self.scripts) if self.scripts else 1.0
+
+
+# ================= CLI =================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train every missing Agro Aid model, in parallel, resumably.")
+    parser.add_argument('--checkpoint-dir', default=CHECKPOINT_DIR)
+    parser.add_argument('--n-jobs', type=int, default=-1,
+                        help="worker budget split between the training scripts (-1 = all cores)")
+    args = parser.parse_args(argv)
+
+    bootstrap = Bootstrap(checkpoint_dir=args.checkpoint_dir, n_jobs=args.n_jobs)
+    if not bootstrap.scripts:
+        print("✅ All model files are present")
+        return
+    budget = ', '.join(f"{script} on {n} workers" for script, n in bootstrap.n_jobs.items())
+    print(f"🚀 Training {budget} (checkpoints in {args.checkpoint_dir})")
+    bootstrap.start()
+    try:
+        failed = bootstrap.wait(lambda script, line: print(f"[{script}] {line}", flush=True))
+    except KeyboardInterrupt:
+        bootstrap.cancel()
+        raise SystemExit("⚠️ Interrupted; run again to resume from the checkpoints")
+    if failed:
+        raise SystemExit(f"❌ Failed: {', '.join(failed)}; run again to resume from the checkpoints")
+    print("🎉 All models trained")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# Confidence-gated cascade for the soft-voting crop ensemble.
+#
+# Each crop output votes a random forest, a decision tree and a kernel SVC, and the
+# SVC costs far more than both trees together. The cascade runs the tree members
+# first and only asks the other members about rows whose tree-only vote is unsure:
+# when the margin between the best and second-best tree-only probability reaches the
+# output's threshold, the row is answered from the trees alone (their probabilities
+# renormalized over the tree weights).
+#
+# With tree weight W_t and other weight W_o, the other members can move a class by at
+# most W_o / (W_t + W_o) of the full vote, so a tree margin of W_o / W_t or more can
+# never be overturned (0.5 for rf + dt + svc). Thresholds are calibrated on held-out
+# rows (the second half is kept for the report) to the smallest value at which the
+# cascade agrees with full voting on all but TOLERANCE of the rows, capped at that bound.
+#
+# `python cascade.py calibrate` writes crop_cascade.json next to the model; with
+# AGRO_CROP_CASCADE=1, agro_core wraps the crop model in the cascade while that file
+# matches the model pickle.
+
+CASCADE_FILE = 'crop_cascade.json'
+TOLERANCE = 0.002
+
+
+def _is_tree(member):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    from forest_engine import ForestEngine
+    return isinstance(member, (ForestEngine, RandomForestClassifier, DecisionTreeClassifier))
+
+
+def _rows(X, mask):
+    return X.iloc[mask] if hasattr(X, 'iloc') else X[mask]
+
+
+def margin(proba):
+    # Best minus second-best probability of every row
+    if proba.shape[1] < 2:
+        return np.ones(len(proba))
+    top = np.partition(proba, proba.shape[1] - 2, axis=1)
+    return top[:, -1] - top[:, -2]
+
+
+# ================= CASCADE =================
+
+class CascadeVoting:
+    # Soft VotingClassifier / PackedVoting answered from its tree members when they are sure
+    def __init__(self, voting, threshold):
+        weights = np.ones(len(voting.estimators_)) if voting.weights is None else np.asarray(voting.weights, float)
+        self.voting = voting
+        self.classes_ = voting.classes_
+        self.threshold = threshold
+        trees = np.array([_is_tree(m) for m in voting.estimators_])
+        if not trees.any():
+            raise ValueError("None of the ensemble members is a tree model")
+        self.trees = [(m, w) for m, w, t in zip(voting.estimators_, weights, trees) if t]
+        self.others = [(m, w) for m, w, t in zip(voting.estimators_, weights, trees) if not t]
+        self.tree_weight = weights[trees].sum()
+        self.total_weight = weights.sum()
+        self.bound = (self.total_weight - self.tree_weight) / self.tree_weight
+        self.rows = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def tree_proba(self, X):
+        return sum(w * m.predict_proba(X) for m, w in self.trees) / self.tree_weight
+
+    def other_proba(self, X):
+        # Weighted sum (not mean) of the non-tree members
+        return sum(w * m.predict_proba(X) for m, w in self.others)
+
+    def predict_proba(self, X):
+        proba = self.tree_proba(X)
+        unsure = margin(proba) < self.threshold
+        if self.others and unsure.any():
+            proba[unsure] = (self.tree_weight * proba[unsure] +
+                             self.other_proba(_rows(X, unsure))) / self.total_weight
+        asked = int(unsure.sum()) if self.others else 0
+        with self._lock:
+            self.rows += len(proba)
+            self.skipped += len(proba) - asked
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def stats(self):
+        with self._lock:
+            return {'threshold': self.threshold, 'rows': self.rows, 'skipped': self.skipped,
+                    'skip_rate': self.skipped / self.rows if self.rows else 0.0}
+
+
+class CascadeMultiOutput:
+    # MultiOutputClassifier / PackedMultiOutput of voting ensembles, one threshold per output
+    def __init__(self, model, thresholds):
+        self.model = model
+        self.estimators_ = [CascadeVoting(v, t) for v, t in zip(model.estimators_, thresholds)]
+
+    def predict_proba(self, X):
+        return [e.predict_proba(X) for e in self.estimators_]
+
+    def predict(self, X):
+        return np.asarray([e.predict(X) for e in self.estimators_]).T
+
+    def stats(self):
+        return [e.stats() for e in self.estimators_]
+
+
+# ================= CALIBRATION =================
+
+def calibrate_threshold(tree_proba, full_proba, bound, tolerance=TOLERANCE):
+    # Smallest margin threshold at which at most `tolerance` of the rows are answered
+    # by the trees with a different class than full voting, capped at the safe bound
+    m = margin(tree_proba)
+    flips = tree_proba.argmax(axis=1) != full_proba.argmax(axis=1)
+    order = np.argsort(-m, kind='stable')
+    m, flips = m[order], flips[order]
+    allowed = int(tolerance * len(m))
+    # Rows at or above a candidate threshold are skipped; ties go together, so only
+    # the last row of every run of equal margins is a valid cut
+    cut = np.flatnonzero(np.append(m[1:] != m[:-1], True))
+    ok = cut[np.cumsum(flips)[cut] <= allowed]
+    if not len(ok):
+        return float(bound)
+    return float(min(m[ok[-1]], bound))
+
+
+def _member_probas(voting, X):
+    cascade = CascadeVoting(voting, 0.0)
+    tree = cascade.tree_proba(X)
+    full = (cascade.tree_weight * tree + cascade.other_proba(X)) / cascade.total_weight
+    return cascade, tree, full
+
+
+def calibrate(model, X, tolerance=TOLERANCE):
+    thresholds = []
+    for voting in model.estimators_:
+        cascade, tree, full = _member_probas(voting, X)
+        thresholds.append(calibrate_threshold(tree, full, cascade.bound, tolerance))
+    return thresholds
+
+
+def evaluate(model, thresholds, X, y, targets):
+    # Per output: SVC skip rate, accuracy of full voting and of the cascade, and timings
+    report = {}
+    for voting, threshold, target in zip(model.estimators_, thresholds, targets):
+        labels = np.asarray(y[target])
+        start = time.perf_counter()
+        full = voting.predict_proba(X)
+        full_s = time.perf_counter() - start
+        cascade = CascadeVoting(voting, threshold)
+        start = time.perf_counter()
+        fast = cascade.predict_proba(X)
+        cascade_s = time.perf_counter() - start
+        classes = np.asarray(voting.classes_)
+        report[target] = {
+            'threshold': threshold,
+            'skip_rate': cascade.stats()['skip_rate'],
+            'agreement': float((fast.argmax(axis=1) == full.argmax(axis=1)).mean()),
+            'accuracy_full': float((classes[full.argmax(axis=1)] == labels).mean()),
+            'accuracy_cascade': float((classes[fast.argmax(axis=1)] == labels).mean()),
+            'full_ms': full_s * 1000,
+            'cascade_ms': cascade_s * 1000,
+        }
+    return report
+
+
+# ================= FILE =================
+
+def cascade_path(model_dir='.'):
+    return os.path.join(model_dir, CASCADE_FILE)
+
+
+def write_cascade(path, thresholds, targets, source, tolerance, report=None):
+    from model_artifacts import source_signature
+    data = {'source': source_signature(source), 'tolerance': tolerance,
+            'thresholds': dict(zip(targets, thresholds)), 'report': report}
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+    os.replace(path + '.tmp', path)
+
+
+def read_thresholds(path, source, targets):
+    # Thresholds in target order, or None when the file is missing or was calibrated
+    # against another version of the model
+    from model_artifacts import source_signature
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(source) or data.get('source') != source_signature(source):
+        return None
+    try:
+        return [float(data['thresholds'][t]) for t in targets]
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+# ================= CLI =================
+
+def print_report(report):
+    print(f"{'output':<10} {'threshold':>9} {'SVC skipped':>11} {'agree':>7} {'acc full':>9} "
+          f"{'acc cascade':>11} {'Δacc':>7} {'full ms':>8} {'cascade ms':>10}")
+    for target, r in report.items():
+        print(f"{target:<10} {r['threshold']:>9.3f} {r['skip_rate']:>11.1%} {r['agreement']:>7.2%} "
+              f"{r['accuracy_full']:>9.4f} {r['accuracy_cascade']:>11.4f} "
+              f"{r['accuracy_cascade'] - r['accuracy_full']:>+7.4f} {r['full_ms']:>8.0f} {r['cascade_ms']:>10.0f}")
+
+
+def main(argv=None):
+    import joblib
+
+    import agro_core
+    from Crop_training_model import load_data
+
+    parser = argparse.ArgumentParser(description="Calibrate or evaluate the crop ensemble cascade.")
+    parser.add_argument('command', choices=['calibrate', 'evaluate'])
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="share of rows allowed to differ from full voting")
+    parser.add_argument('--out', default=cascade_path(agro_core.MODEL_DIR))
+    args = parser.parse_args(argv)
+
+    source = agro_core.model_path('crop_model')
+    model = joblib.load(source)
+    _, X_test, _, y_test, _ = load_data()
+    half = len(X_test) // 2
+    X_cal, X_eval, y_eval = X_test.iloc[:half], X_test.iloc[half:], y_test.iloc[half:]
+
+    if args.command == 'calibrate':
+        thresholds = calibrate(model, X_cal, args.tolerance)
+    else:
+        thresholds = read_thresholds(args.out, source, agro_core.CROP_TARGETS)
+        if thresholds is None:
+            raise SystemExit(f"❌ {args.out} is missing or older than {source}; run calibrate first")
+
+    report = evaluate(model, thresholds, X_eval, y_eval, agro_core.CROP_TARGETS)
+    print_report(report)
+    if args.command == 'calibrate':
+        write_cascade(args.out, thresholds, agro_core.CROP_TARGETS, source, args.tolerance, report)
+        print(f"✅ Thresholds written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
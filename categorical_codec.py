@@ -0,0 +1,170 @@
+import argparse
+import difflib
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Vectorized categorical codec for the label-encoded columns (Soil_Type, Crop, Variety...).
+#
+# `value in encoder.classes_` and LabelEncoder.transform handle one exact string at a
+# time, and difflib.get_close_matches compares every bad value with every class. A
+# codec encodes a whole column instead:
+#   - the column is factorized first, so each distinct raw value is resolved once no
+#     matter how many rows repeat it
+#   - distinct values are looked up with Index.get_indexer, first as written, then
+#     normalized (trimmed, lower case, whitespace runs collapsed: "loamy " -> Loamy),
+#     then loose (letters and digits only: "Sugar cane" -> Sugarcane)
+#   - whatever is left goes through a character n-gram index built once per codec.
+#     Only the SHORTLIST classes sharing the most n-grams with a value are scored
+#     with difflib's ratio, and that ratio is the confidence. A unique best match at
+#     or above min_confidence is auto-corrected; weaker ones stay unknown (code -1)
+#     and are kept as suggestions for error messages
+#
+# encode() reports every value it did not take verbatim, so callers can tell users
+# which inputs were rewritten.
+
+MIN_CONFIDENCE = 0.8
+SUGGEST_CONFIDENCE = 0.6   # the cutoff the chatbot used with get_close_matches
+NGRAM = 2
+SHORTLIST = 5
+
+
+# ================= KEYS =================
+
+def normalize(values):
+    text = pd.Series(np.asarray(values, dtype=object), dtype=object).astype(str)
+    text = text.str.strip().str.lower().str.replace(r'\s+', ' ', regex=True)
+    return text.to_numpy(dtype=object)
+
+
+def loose(values):
+    text = pd.Series(normalize(values), dtype=object).str.replace(r'[^0-9a-z]', '', regex=True)
+    return text.to_numpy(dtype=object)
+
+
+def ngrams(key, n=NGRAM):
+    padded = f'^{key}$'
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+
+class _Lookup:
+    # Key -> class code through one get_indexer call; keys shared by several classes
+    # are ambiguous and dropped, so they never resolve to either class
+    def __init__(self, keys):
+        keys = pd.Series(np.asarray(keys, dtype=object), dtype=object)
+        unique = ~keys.duplicated(keep=False).to_numpy()
+        self.index = pd.Index(keys[unique].to_numpy(dtype=object))
+        # get_indexer answers -1 for a miss, which picks the trailing -1
+        self.codes = np.append(np.flatnonzero(unique), -1)
+
+    def __call__(self, keys):
+        return self.codes[self.index.get_indexer(np.asarray(keys, dtype=object))]
+
+
+# ================= CODEC =================
+
+class CategoricalCodec:
+    def __init__(self, classes, min_confidence=MIN_CONFIDENCE, suggest_confidence=SUGGEST_CONFIDENCE,
+                 ngram=NGRAM):
+        self.classes = np.asarray(classes, dtype=object)
+        self.min_confidence = min_confidence
+        self.suggest_confidence = suggest_confidence
+        self.ngram = ngram
+        self.loose_keys = loose(self.classes)
+        self.lookups = [_Lookup(self.classes), _Lookup(normalize(self.classes)), _Lookup(self.loose_keys)]
+
+        # n-gram -> codes of the classes containing it
+        postings = {}
+        for code, key in enumerate(self.loose_keys):
+            for gram in ngrams(key, ngram):
+                postings.setdefault(gram, []).append(code)
+        self.postings = {gram: np.array(codes) for gram, codes in postings.items()}
+
+    def match(self, value):
+        # (code, confidence, ambiguous) of the closest class, code -1 when no class shares an n-gram
+        key = loose([value])[0]
+        hits = [self.postings[gram] for gram in ngrams(key, self.ngram) if gram in self.postings]
+        if not hits:
+            return -1, 0.0, False
+        counts = np.bincount(np.concatenate(hits), minlength=len(self.classes))
+        shortlist = np.argsort(-counts, kind='stable')[:SHORTLIST]
+        shortlist = shortlist[counts[shortlist] > 0]
+        scores = np.array([difflib.SequenceMatcher(None, key, self.loose_keys[c]).ratio() for c in shortlist])
+        order = np.argsort(-scores, kind='stable')
+        best = order[0]
+        ambiguous = len(order) > 1 and scores[order[1]] == scores[best]
+        return int(shortlist[best]), float(scores[best]), ambiguous
+
+    def encode(self, values):
+        # codes (-1 = unknown or missing), {raw: (class, confidence)} for every corrected
+        # value and {raw: (suggestion or None, confidence)} for every unknown one
+        inverse, uniques = pd.factorize(pd.Series(np.asarray(values, dtype=object), dtype=object))
+        uniques = np.asarray(uniques, dtype=object)
+        codes = self.lookups[0](uniques)
+
+        corrections, unknown = {}, {}
+        for lookup, keys in zip(self.lookups[1:], (normalize, loose)):
+            pending = np.flatnonzero(codes < 0)
+            if not len(pending):
+                break
+            found = lookup(keys(uniques[pending]))
+            for i, code in zip(pending[found >= 0], found[found >= 0]):
+                codes[i] = code
+                corrections[uniques[i]] = (self.classes[code], 1.0)
+
+        for i in np.flatnonzero(codes < 0):
+            code, confidence, ambiguous = self.match(uniques[i])
+            if code >= 0 and confidence >= self.min_confidence and not ambiguous:
+                codes[i] = code
+                corrections[uniques[i]] = (self.classes[code], confidence)
+            else:
+                suggestion = self.classes[code] if code >= 0 and confidence >= self.suggest_confidence else None
+                unknown[uniques[i]] = (suggestion, confidence)
+
+        codes = np.where(inverse < 0, -1, codes[inverse]).astype(np.int64)
+        return codes, corrections, unknown
+
+    def decode(self, codes):
+        return self.classes[np.asarray(codes)]
+
+
+def codecs_from_encoders(encoders, **options):
+    # {column: CategoricalCodec} over the classes of fertilizer_/crop_label_encoders
+    return {col: CategoricalCodec(encoder.classes_, **options) for col, encoder in encoders.items()}
+
+
+# ================= CLI =================
+
+def main(argv=None):
+    import agro_core
+
+    parser = argparse.ArgumentParser(
+        description="Report which categorical values of a CSV would be auto-corrected or rejected.")
+    parser.add_argument('kind', choices=['crop', 'fertilizer'])
+    parser.add_argument('input', help="CSV with Soil_Type/Crop (fertilizer) or Crop/Soil_Type/Variety (crop)")
+    parser.add_argument('--min-confidence', type=float, default=MIN_CONFIDENCE)
+    args = parser.parse_args(argv)
+
+    codecs = agro_core.categorical_codecs(args.kind)
+    columns = agro_core.FERTILIZER_CATEGORICALS if args.kind == 'fertilizer' else agro_core.CROP_TARGETS
+    frame = pd.read_csv(args.input, usecols=lambda c: c in columns, dtype=str)
+    rejected = 0
+    for col in frame.columns:
+        codec = codecs[col]
+        codec.min_confidence = args.min_confidence
+        codes, corrections, unknown = codec.encode(frame[col])
+        raw = frame[col].to_numpy(dtype=object)
+        for value, (fixed, confidence) in corrections.items():
+            print(f"🔧 {col}: '{value}' -> '{fixed}' ({confidence:.0%}, {(raw == value).sum()} rows)")
+        for value, (suggestion, confidence) in unknown.items():
+            hint = f", closest '{suggestion}' ({confidence:.0%})" if suggestion else ""
+            print(f"❌ {col}: unknown '{value}' ({(raw == value).sum()} rows{hint})")
+        rejected += int(((codes < 0) & frame[col].notna().to_numpy()).sum())
+    print(f"✅ {len(frame)} rows checked, {rejected} values rejected")
+    if rejected:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+import io
+
+from matplotlib.figure import Figure
+
+# Bar charts for the prediction results, without pyplot.
+#
+# A BarChart owns one Figure and keeps its bars and value labels between updates:
+# when the categories are unchanged only the heights, label texts and titles change,
+# otherwise the bars are swapped while the axes stay. Figures never enter pyplot's
+# global registry, so they are freed as soon as the owner drops them (release() also
+# clears the artists eagerly). The same chart can be shown in a Tk canvas or rendered
+# off-screen to PNG/SVG for the batch and server paths.
+
+BAR_COLOR = '#008cff'
+BACKGROUND = '#1a1a1a'
+FORMATS = ('png', 'svg')
+
+# Friendly parameter names with units when known
+PARAM_LABELS = {
+    'Temperature': 'Temperature (°C)',
+    'Humidity': 'Humidity (%)',
+    'Moisture': 'Moisture (%)',
+    'Nitrogen': 'Nitrogen Level',
+    'Phosphorus': 'Phosphorus Level',
+    'Potassium': 'Potassium Level',
+    'pH_Value': 'pH Value',
+    'Rainfall': 'Rainfall (mm)'
+}
+
+# Probability chart per model: (target whose probabilities are drawn, chart title)
+PROBABILITY_CHARTS = {
+    'crop': ('Crop', "Crop Prediction Probabilities (%)"),
+    'fertilizer': ('FertilizerName', "Fertilizer Prediction Probabilities (%)"),
+}
+
+
+def chart_style(title, labels):
+    # Axis labels per chart, as the chatbot has always drawn them
+    if 'Prediction Probabilities' in title or '%' in title or 'Probabilities' in title:
+        # Probabilities charts: X = class names, Y = percent
+        if 'Crop' in title:
+            xlabel = 'Crop Types'
+        elif 'Fertilizer' in title:
+            xlabel = 'Fertilizer Types'
+        else:
+            xlabel = 'Classes'
+        return xlabel, 'Prediction Probability (%)', list(labels)
+    if title == 'Crop Input Analysis':
+        xlabel, ylabel = 'Soil & Environmental Parameters', 'Parameter Value (Units)'
+    elif title == 'Fertilizer Decision Factors':
+        xlabel, ylabel = 'Nutrient & Soil Factors', 'Nutrient Value (kg/ha or %)'
+    else:
+        xlabel, ylabel = 'Parameters', 'Measured Value'
+    return xlabel, ylabel, [PARAM_LABELS.get(lbl, lbl) for lbl in labels]
+
+
+def format_value(val, percent=False):
+    # Integer if close to int, else 2 decimal places; percent sign for percentage charts
+    try:
+        fval = float(val)
+        if abs(fval - round(fval)) < 1e-6:
+            text = f"{int(round(fval))}"
+        else:
+            text = f"{fval:.2f}"
+    except Exception:
+        text = str(val)
+    return f"{text}%" if percent else text
+
+
+def percentages(class_names, proba_row):
+    return {str(name): round(float(p) * 100, 2) for name, p in zip(class_names, proba_row)}
+
+
+class BarChart:
+    def __init__(self, figsize=(6, 4), dpi=100):
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.figure.patch.set_facecolor(BACKGROUND)
+        self.ax = self.figure.add_subplot()
+        self.ax.set_facecolor(BACKGROUND)
+        self.ax.tick_params(colors='white')
+        self.labels = None
+        self.display_labels = None
+        self.bars = []
+        self.texts = []
+
+    def _rebuild(self, labels, display_labels):
+        for artist in self.bars + self.texts:
+            artist.remove()
+        positions = range(len(labels))
+        self.bars = list(self.ax.bar(positions, [0] * len(labels), color=BAR_COLOR))
+        self.texts = [self.ax.text(i, 0, '', ha='center', color='white', fontsize=10, weight='bold')
+                      for i in positions]
+        # Ensure tick positions match labels to avoid matplotlib warnings
+        self.ax.set_xticks(positions)
+        self.ax.set_xticklabels(display_labels, rotation=30, ha='right', color='white')
+        self.labels = labels
+        self.display_labels = display_labels
+
+    def update(self, data, title):
+        labels = list(data.keys())
+        values = list(data.values())
+        xlabel, ylabel, display_labels = chart_style(title, labels)
+
+        rebuilt = labels != self.labels
+        if rebuilt:
+            self._rebuild(labels, display_labels)
+        elif display_labels != self.display_labels:
+            self.ax.set_xticklabels(display_labels, rotation=30, ha='right', color='white')
+            self.display_labels = display_labels
+
+        # Annotate bars with their exact values for clarity
+        try:
+            max_val = max(values) if len(values) else 0
+        except Exception:
+            max_val = 0
+        y_offset = max_val * 0.02 if max_val else 0.5
+        percent = '%' in title or 'Percent' in title
+        for bar, text, val in zip(self.bars, self.texts, values):
+            bar.set_height(val)
+            text.set_position((bar.get_x() + bar.get_width() / 2, bar.get_height() + y_offset))
+            text.set_text(format_value(val, percent))
+
+        self.ax.set_title(title, color='white')
+        self.ax.set_xlabel(xlabel, color='white', labelpad=25)
+        self.ax.set_ylabel(ylabel, color='white')
+        self.ax.relim()
+        self.ax.autoscale_view()
+        if rebuilt:
+            # Use tight_layout to avoid x-label clipping where possible
+            try:
+                self.figure.tight_layout()
+            except Exception:
+                pass
+        return self
+
+    def render(self, fmt='png'):
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {FORMATS}")
+        buf = io.BytesIO()
+        self.figure.savefig(buf, format=fmt, facecolor=self.figure.get_facecolor())
+        return buf.getvalue()
+
+    def release(self):
+        self.bars, self.texts, self.labels, self.display_labels = [], [], None, None
+        self.figure.clear()
+
+
+def render_chart(data, title, fmt='png', chart=None):
+    # One-off off-screen render; pass a chart to reuse its figure across calls
+    chart = chart or BarChart()
+    return chart.update(data, title).render(fmt)
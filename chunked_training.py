@@ -0,0 +1,319 @@
+import argparse
+import math
+import os
+import resource
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, VotingClassifier
+from sklearn.linear_model import SGDClassifier
+from sklearn.multioutput import MultiOutputClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.utils import Bunch
+
+from dataset_cache import cache_path, is_valid, label_encoders, _read_manifest, CACHE_DIR
+from incremental_update import SPECS, pad_tree
+from training_utils import timed, print_stage_times, resolve_n_jobs, reset_n_jobs, dump_atomic
+
+# Out-of-core training for datasets larger than memory.
+#
+# The dataset is read in chunks, from its columnar cache when a valid one exists
+# (memory-mapped, so only the rows of the current chunk are paged in) or straight from
+# the CSV otherwise. Every row is assigned to the test set by hashing its content, so the
+# split is deterministic and needs no index of the whole file.
+#
+# Models are built from bounded state only:
+#   - forests are bagged: each bag keeps a uniform reservoir sample of the training
+#     stream (at most --bag-rows rows), trains a few trees on it, and the trees of all
+#     bags are merged into one RandomForestClassifier
+#   - the crop ensemble's decision tree is trained on the first bag's sample, and its
+#     kernel SVM (which needs every row in memory) is replaced by a scaled linear model
+#     fitted with partial_fit over --epochs passes
+# Accuracy is then computed in one more streaming pass over the test rows. Peak memory
+# is one chunk plus bags x bag-rows rows, independent of the dataset size.
+
+DEFAULT_CHUNKSIZE = 100_000
+DEFAULT_BAGS = 8
+DEFAULT_BAG_ROWS = 50_000
+DEFAULT_TREES = 100
+DEFAULT_EPOCHS = 3
+DEFAULT_TEST_FRACTION = 0.2
+HASH_BUCKETS = 10_000
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+# ================= STREAMING SOURCE =================
+
+def scan_categories(path, categoricals, chunksize=DEFAULT_CHUNKSIZE):
+    # Sorted distinct labels per column, the classes LabelEncoder would assign
+    seen = {col: set() for col in categoricals}
+    for chunk in pd.read_csv(path, usecols=list(categoricals), chunksize=chunksize, dtype=str):
+        for col in categoricals:
+            seen[col].update(chunk[col].dropna().unique())
+    return {col: sorted(values) for col, values in seen.items()}
+
+
+def holdout_mask(columns, test_fraction):
+    # columns: list of arrays (labels as object, numbers as float32) of one chunk
+    h = np.zeros(len(columns[0]), dtype=np.uint64)
+    for values in columns:
+        h = h * HASH_MULTIPLIER + pd.util.hash_array(values)
+    return (h % np.uint64(HASH_BUCKETS)) < np.uint64(round(test_fraction * HASH_BUCKETS))
+
+
+class ChunkSource:
+    # Yields (encoded chunk, test mask); categoricals become codes into self.categories
+    def __init__(self, path, columns, categoricals, chunksize=DEFAULT_CHUNKSIZE,
+                 test_fraction=DEFAULT_TEST_FRACTION, use_cache=True):
+        self.path = path
+        self.columns = list(columns)
+        self.categoricals = [c for c in self.columns if c in categoricals]
+        self.chunksize = chunksize
+        self.test_fraction = test_fraction
+        self.cache_dir = None
+        manifest = _read_manifest(cache_path(path)) if use_cache and CACHE_DIR else None
+        if manifest and is_valid(manifest, path, categoricals)[0]:
+            self.cache_dir = cache_path(path)
+            self.manifest = manifest
+            self.categories = {c['name']: c['categories'] for c in manifest['columns']
+                               if c['kind'] == 'categorical'}
+        else:
+            self.categories = scan_categories(path, self.categoricals, chunksize)
+
+    def __iter__(self):
+        return self._cached_chunks() if self.cache_dir else self._csv_chunks()
+
+    def _csv_chunks(self):
+        for raw in pd.read_csv(self.path, usecols=self.columns, chunksize=self.chunksize):
+            labels = {col: raw[col].to_numpy(dtype=object).astype(str).astype(object)
+                      for col in self.categoricals}
+            yield self._encode(raw, labels)
+
+    def _cached_chunks(self):
+        files = {c['name']: c['file'] for c in self.manifest['columns']}
+        arrays = {col: np.load(os.path.join(self.cache_dir, files[col]), mmap_mode='r')
+                  for col in self.columns}
+        names = {col: np.asarray(self.categories[col], dtype=object) for col in self.categoricals}
+        for start in range(0, self.manifest['rows'], self.chunksize):
+            raw = pd.DataFrame({col: np.asarray(arrays[col][start:start + self.chunksize])
+                                for col in self.columns})
+            labels = {col: names[col][raw[col].to_numpy()] for col in self.categoricals}
+            yield self._encode(raw, labels)
+
+    def _encode(self, raw, labels):
+        frame = pd.DataFrame(index=range(len(raw)))
+        hashed = []
+        for col in self.columns:
+            if col in labels:
+                codes = pd.Categorical(labels[col], categories=self.categories[col]).codes
+                frame[col] = codes.astype(np.int64)
+                hashed.append(labels[col])
+            else:
+                values = pd.to_numeric(raw[col], errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)
+                frame[col] = values
+                hashed.append(values)
+        return frame, holdout_mask(hashed, self.test_fraction)
+
+
+# ================= STREAM SAMPLES =================
+
+class Reservoir:
+    # Uniform sample of at most `capacity` rows from a stream (Algorithm R, per chunk)
+    def __init__(self, capacity, n_columns, seed):
+        self.capacity = capacity
+        self.data = np.empty((capacity, n_columns), dtype=np.float32)
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+
+    def add(self, rows):
+        n = len(rows)
+        fill = min(max(self.capacity - self.seen, 0), n)
+        if fill:
+            self.data[self.seen:self.seen + fill] = rows[:fill]
+        rest = rows[fill:]
+        if len(rest):
+            # Row i of the stream replaces a random slot with probability capacity / (i + 1);
+            # later rows overwrite earlier ones when they pick the same slot, as in sequence
+            positions = self.seen + fill + np.arange(len(rest))
+            slots = (self.rng.random(len(rest)) * (positions + 1)).astype(np.int64)
+            keep = slots < self.capacity
+            self.data[slots[keep]] = rest[keep]
+        self.seen += n
+
+    def rows(self):
+        return self.data[:min(self.seen, self.capacity)]
+
+
+def merge_forests(forests, n_classes):
+    # One forest holding every bag's trees, each padded to the full class list
+    merged = forests[0]
+    trees = []
+    for forest in forests:
+        column_map = np.asarray(forest.classes_, dtype=int)
+        for tree in forest.estimators_:
+            trees.append(pad_tree(tree, column_map, n_classes))
+    merged.estimators_ = trees
+    merged.n_estimators = len(trees)
+    merged.classes_ = np.arange(n_classes)
+    merged.n_classes_ = n_classes
+    return merged
+
+
+def fit_bagged_forest(bags, features, target_index, n_classes, trees_per_bag, n_jobs, seed):
+    forests = []
+    for i, bag in enumerate(bags):
+        rows = bag.rows()
+        forest = RandomForestClassifier(n_estimators=trees_per_bag, random_state=seed + i,
+                                        n_jobs=resolve_n_jobs(n_jobs))
+        forest.fit(pd.DataFrame(rows[:, :len(features)], columns=features),
+                   rows[:, target_index].astype(np.int64))
+        forests.append(forest)
+    return merge_forests(forests, n_classes)
+
+
+# ================= MODELS =================
+
+def _voting(members, n_classes):
+    # A fitted soft-voting classifier around members trained on class indices
+    voting = VotingClassifier(list(members.items()), voting='soft')
+    voting.estimators_ = list(members.values())
+    voting.named_estimators_ = Bunch(**members)
+    voting.le_ = LabelEncoder().fit(np.arange(n_classes))
+    voting.classes_ = voting.le_.classes_
+    return voting
+
+
+def train_chunked(kind, path=None, chunksize=DEFAULT_CHUNKSIZE, bags=DEFAULT_BAGS,
+                  bag_rows=DEFAULT_BAG_ROWS, n_trees=DEFAULT_TREES, epochs=DEFAULT_EPOCHS,
+                  test_fraction=DEFAULT_TEST_FRACTION, n_jobs=None, use_cache=True,
+                  model_path=None, encoders_path=None, seed=42, times=None):
+    spec = SPECS[kind]
+    path = path or spec['data']
+    features, targets = spec['features'], spec['targets']
+    times = {} if times is None else times
+    trees_per_bag = max(1, math.ceil(n_trees / bags))
+
+    with timed('scan', times):
+        source = ChunkSource(path, features + targets, spec['categoricals'], chunksize,
+                             test_fraction, use_cache)
+    n_classes = {t: len(source.categories[t]) for t in targets}
+    print(f"✅ Streaming {path} in chunks of {chunksize} rows "
+          f"({'columnar cache' if source.cache_dir else 'CSV'})")
+
+    # Pass 1: fill the bag reservoirs and the feature scaler from the training rows
+    columns = features + targets
+    reservoirs = [Reservoir(bag_rows, len(columns), seed + i) for i in range(bags)]
+    scaler = StandardScaler() if kind == 'crop' else None
+    train_rows = test_rows = 0
+    with timed('sample', times):
+        for frame, test in source:
+            rows = frame[columns].to_numpy(dtype=np.float32)[~test]
+            for reservoir in reservoirs:
+                reservoir.add(rows)
+            if scaler is not None and len(rows):
+                scaler.partial_fit(pd.DataFrame(rows[:, :len(features)], columns=features))
+            train_rows += len(rows)
+            test_rows += int(test.sum())
+    print(f"✅ {train_rows} training rows, {test_rows} test rows "
+          f"({bags} bags of up to {bag_rows} rows)")
+
+    with timed('fit trees', times):
+        forests = {t: fit_bagged_forest(reservoirs, features, len(features) + i, n_classes[t],
+                                        trees_per_bag, n_jobs, seed)
+                   for i, t in enumerate(targets)}
+        if kind == 'crop':
+            sample = reservoirs[0].rows()
+            trees = {}
+            for i, t in enumerate(targets):
+                tree = DecisionTreeClassifier(random_state=seed).fit(
+                    pd.DataFrame(sample[:, :len(features)], columns=features),
+                    sample[:, len(features) + i].astype(np.int64))
+                if tree.n_classes_ < n_classes[t]:
+                    pad_tree(tree, np.asarray(tree.classes_, dtype=int), n_classes[t])
+                trees[t] = tree
+    del reservoirs
+
+    if kind == 'crop':
+        # Further passes: the linear member learns from every training row, chunk by chunk
+        linear = {t: SGDClassifier(loss='log_loss', random_state=seed) for t in targets}
+        rng = np.random.default_rng(seed)
+        with timed('fit linear', times):
+            for epoch in range(epochs):
+                for frame, test in source:
+                    train = frame[~test]
+                    if not len(train):
+                        continue
+                    order = rng.permutation(len(train))
+                    X = scaler.transform(train[features].iloc[order])
+                    for t in targets:
+                        linear[t].partial_fit(X, train[t].to_numpy()[order], classes=np.arange(n_classes[t]))
+        votings = [_voting({'rf': forests[t], 'dt': trees[t],
+                            'sgd': make_pipeline(scaler, linear[t])}, n_classes[t])
+                   for t in targets]
+        model = MultiOutputClassifier(votings[0])
+        model.estimators_ = votings
+    else:
+        model = forests[targets[0]]
+    reset_n_jobs(model)
+
+    with timed('evaluate', times):
+        scores = evaluate_stream(model, source, features, targets)
+
+    encoders = label_encoders(source.categories)
+    with timed('save', times):
+        dump_atomic(model, model_path or spec['model'])
+        dump_atomic(encoders, encoders_path or spec['encoders'])
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\n🎉 Model saved successfully (chunked, {model_path or spec['model']})")
+    for name, value in scores.items():
+        print(f"📊 {name} accuracy: {value:.4f}")
+    print(f"💾 Peak memory: {peak_mb:.0f} MB")
+    return model, encoders, scores
+
+
+def evaluate_stream(model, source, features, targets):
+    # Accuracy per target (and exact-match subset for several targets) over the test rows
+    correct = dict.fromkeys(targets + ['subset'], 0)
+    total = 0
+    for frame, test in source:
+        rows = frame[test]
+        if not len(rows):
+            continue
+        pred = model.predict(rows[features]).reshape(len(rows), -1)
+        truth = rows[targets].to_numpy()
+        hits = pred == truth
+        for i, t in enumerate(targets):
+            correct[t] += int(hits[:, i].sum())
+        correct['subset'] += int(hits.all(axis=1).sum())
+        total += len(rows)
+    if len(targets) == 1:
+        del correct['subset']
+    return {name: count / total if total else float('nan') for name, count in correct.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train a model from a dataset streamed in chunks.")
+    parser.add_argument('kind', choices=list(SPECS))
+    parser.add_argument('--data', help="dataset CSV (its columnar cache is used when valid)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="rows per chunk")
+    parser.add_argument('--bags', type=int, default=DEFAULT_BAGS, help="stream samples the forest is built from")
+    parser.add_argument('--bag-rows', type=int, default=DEFAULT_BAG_ROWS, help="rows kept per bag")
+    parser.add_argument('--trees', type=int, default=DEFAULT_TREES, help="total trees per forest")
+    parser.add_argument('--epochs', type=int, default=DEFAULT_EPOCHS, help="passes for the linear crop member")
+    parser.add_argument('--test-fraction', type=float, default=DEFAULT_TEST_FRACTION,
+                        help="share of rows hashed into the test set")
+    parser.add_argument('--n-jobs', type=int, default=None, help="workers for the forest of each bag")
+    parser.add_argument('--no-dataset-cache', action='store_true', help="always stream the CSV")
+    args = parser.parse_args(argv)
+
+    times = {}
+    train_chunked(args.kind, args.data, args.chunksize, args.bags, args.bag_rows, args.trees,
+                  args.epochs, args.test_fraction, args.n_jobs, not args.no_dataset_cache, times=times)
+    print_stage_times(times)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,479 @@
+import argparse
+import json
+import lzma
+import os
+import pickle
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from forest_engine import ForestEngine
+from model_artifacts import (ARTIFACT_DIR, PackedMultiOutput, PackedSVC, PackedVoting,
+                             _feature_names, _probas, _sample_inputs, _svc_prob_params,
+                             source_signature)
+
+# Compact single-file model export for deploys.
+#
+# Where model_artifacts.py keeps every array at full width so it can be memory-mapped,
+# this format trades a little precision and a decode step at load for size:
+#   - forests keep only what ForestEngine reads: split feature, threshold and children
+#     of internal nodes and the class probabilities of leaves (no impurity, sample
+#     counts or internal-node values)
+#   - thresholds are stored as float32, rounded down; trees compare float32 inputs, and
+#     x <= t holds for a float32 x exactly when x <= float32_floor(t), so every split
+#     decision is unchanged. They are further indexed into a table of distinct values
+#   - leaf probabilities are quantized to --leaf-bits (8, 16, or 32 = float32)
+#   - identical leaves and identical subtrees are stored once: each forest becomes a
+#     DAG, renumbered in preorder so most left children sit right after their parent
+#     and the delta-coded child pointers compress to almost nothing
+#   - SVC support vectors are float32 rows in one table shared by all SVCs of the
+#     model (the three crop outputs are trained on the same rows); dual coefficients
+#     are float32
+#   - every array is its own section, compressed separately (lzma, zlib or none)
+#
+# File layout: MAGIC, manifest length (uint64 LE), manifest JSON, section bytes.
+#
+# Tolerance: a forest's probabilities are means of leaf values, so they move by at
+# most half a quantization step, 0.5 / (2**leaf_bits - 1); float32 SVC coefficients
+# add up to SVC_TOLERANCE. tolerance() gives the bound the verify command checks.
+
+MAGIC = b'AGROCMP1'
+FORMAT_VERSION = 1
+SUFFIX = '.agc'
+DEFAULT_CODEC = 'lzma'
+DEFAULT_LEAF_BITS = 16
+LEAF_BITS = (8, 16, 32)
+SVC_TOLERANCE = 1e-4
+
+CODECS = {
+    'lzma': (lambda b: lzma.compress(b, preset=6), lzma.decompress),
+    'zlib': (lambda b: zlib.compress(b, 9), zlib.decompress),
+    'none': (bytes, bytes),
+}
+
+TREE_LEAF = -1
+
+
+def tolerance(leaf_bits, has_svc=True):
+    # Bound on max |Δproba| between the source model and its compact export
+    leaf = 0.5 / (2 ** leaf_bits - 1) if leaf_bits < 32 else 1e-7
+    return leaf + (SVC_TOLERANCE if has_svc else 0.0)
+
+
+def compact_path(name, base_dir=ARTIFACT_DIR):
+    return os.path.join(base_dir, name + SUFFIX)
+
+
+def _index_dtype(n):
+    return np.uint8 if n <= 2 ** 8 else np.uint16 if n <= 2 ** 16 else np.uint32
+
+
+def floor_float32(values):
+    # Largest float32 <= each value: the same split decisions for float32 inputs
+    out = np.asarray(values, dtype=np.float64).astype(np.float32)
+    above = out.astype(np.float64) > values
+    out[above] = np.nextafter(out[above], np.float32(-np.inf))
+    return out
+
+
+# ================= FOREST COMPILER =================
+
+def _concat_trees(trees, n_classes):
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        t = tree.tree_
+        leaf = t.children_left == TREE_LEAF
+        roots.append(offset)
+        feature.append(t.feature)
+        threshold.append(t.threshold)
+        left.append(np.where(leaf, TREE_LEAF, t.children_left + offset))
+        right.append(np.where(leaf, TREE_LEAF, t.children_right + offset))
+        v = t.value[:, 0, :n_classes]
+        norm = v.sum(axis=1, keepdims=True)
+        norm[norm == 0.0] = 1.0
+        value.append(v / norm)
+        offset += t.node_count
+    return (np.concatenate(feature), np.concatenate(threshold), np.concatenate(left),
+            np.concatenate(right), np.concatenate(value), np.asarray(roots))
+
+
+def quantize_leaves(values, leaf_bits):
+    if leaf_bits == 32:
+        return values.astype(np.float32)
+    scale = 2 ** leaf_bits - 1
+    return np.round(values * scale).astype(np.uint8 if leaf_bits == 8 else np.uint16)
+
+
+def dequantize_leaves(stored, leaf_bits):
+    if leaf_bits == 32:
+        return stored.astype(np.float64)
+    return stored.astype(np.float64) / (2 ** leaf_bits - 1)
+
+
+def _unique_splits(feature, thr_bits, left, right):
+    # Distinct (feature, threshold, left, right) rows: (position of each distinct row's first
+    # occurrence, distinct-row id of every input row). Two packed int64 keys sort much
+    # faster than np.unique(axis=0) on the four columns.
+    split = (feature << 32) | thr_bits
+    children = (left << 31) | right
+    order = np.lexsort((children, split))
+    new = np.ones(len(order), dtype=bool)
+    new[1:] = (np.diff(split[order]) != 0) | (np.diff(children[order]) != 0)
+    group = np.cumsum(new) - 1
+    inverse = np.empty(len(order), dtype=np.int64)
+    inverse[order] = group
+    return order[new], inverse
+
+
+def compile_forest(trees, n_classes, leaf_bits=DEFAULT_LEAF_BITS):
+    # Returns the arrays of the deduplicated DAG; node ids: leaves 0..L-1, then
+    # internal nodes L.. in preorder of first visit
+    feature, threshold, left, right, value, roots = _concat_trees(trees, n_classes)
+    leaf = left == TREE_LEAF
+    internal = ~leaf
+
+    # Identical (quantized) leaves share one id
+    leaf_table, leaf_ids = np.unique(quantize_leaves(value[leaf], leaf_bits), axis=0, return_inverse=True)
+    canon = np.full(len(left), -1, dtype=np.int64)
+    canon[leaf] = leaf_ids.ravel()
+    n_canon = len(leaf_table)
+
+    # Height above the deepest leaf; nodes of equal height only have children below them
+    height = np.zeros(len(left), dtype=np.int64)
+    safe_left, safe_right = np.maximum(left, 0), np.maximum(right, 0)
+    while True:
+        new = np.where(internal, 1 + np.maximum(height[safe_left], height[safe_right]), 0)
+        if np.array_equal(new, height):
+            break
+        height = new
+
+    # Identical subtrees share one id: same split and (already canonical) children
+    thr32 = floor_float32(threshold)
+    thr_bits = thr32.view(np.uint32).astype(np.int64)
+    canon_feature, canon_threshold, canon_left, canon_right = [], [], [], []
+    for level in range(1, int(height.max()) + 1 if len(height) else 1):
+        nodes = np.nonzero(height == level)[0]
+        first, inverse = _unique_splits(feature[nodes], thr_bits[nodes], canon[left[nodes]], canon[right[nodes]])
+        canon[nodes] = n_canon + inverse
+        n_canon += len(first)
+        unique = nodes[first]
+        canon_feature.append(feature[unique])
+        canon_threshold.append(thr_bits[unique])
+        canon_left.append(canon[left[unique]])
+        canon_right.append(canon[right[unique]])
+
+    n_leaves = len(leaf_table)
+    if canon_feature:
+        c_feature = np.concatenate(canon_feature)
+        c_threshold = np.concatenate(canon_threshold).astype(np.uint32).view(np.float32)
+        c_left = np.concatenate(canon_left).tolist()
+        c_right = np.concatenate(canon_right).tolist()
+    else:
+        c_feature = np.empty(0, dtype=np.int64)
+        c_threshold = np.empty(0, dtype=np.float32)
+        c_left, c_right = [], []
+
+    # Preorder renumbering: a left child visited for the first time gets parent id + 1
+    order = [-1] * len(c_feature)
+    visited = 0
+    for root in canon[roots].tolist():
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node < n_leaves or order[node - n_leaves] >= 0:
+                continue
+            order[node - n_leaves] = visited
+            visited += 1
+            stack.append(c_right[node - n_leaves])
+            stack.append(c_left[node - n_leaves])
+
+    order = np.asarray(order, dtype=np.int64)
+    new_id = np.concatenate([np.arange(n_leaves), n_leaves + order])
+    by_position = np.argsort(order)
+    node_ids = n_leaves + np.arange(len(order))
+    thresholds, threshold_index = np.unique(c_threshold[by_position], return_inverse=True)
+    return {
+        'leaf_values': leaf_table,
+        'feature': c_feature[by_position].astype(_index_dtype(int(c_feature.max()) + 1 if len(c_feature) else 1)),
+        'thresholds': thresholds,
+        'threshold_index': threshold_index.ravel().astype(_index_dtype(len(thresholds))),
+        'left': (new_id[np.asarray(c_left, dtype=np.int64)[by_position]] - node_ids).astype(np.int32),
+        'right': (new_id[np.asarray(c_right, dtype=np.int64)[by_position]] - node_ids).astype(np.int32),
+        'roots': new_id[canon[roots]].astype(np.int32),
+        'max_depth': int(max(t.tree_.max_depth for t in trees)),
+        'nodes_in': int(len(left)),
+    }
+
+
+def expand_forest(arrays, leaf_bits):
+    # Compiled DAG -> ForestEngine arrays (leaves are self-loops with threshold +inf)
+    value = dequantize_leaves(arrays['leaf_values'], leaf_bits)
+    n_leaves, n_internal = len(value), len(arrays['left'])
+    n_nodes = n_leaves + n_internal
+    ids = np.arange(n_leaves, n_nodes)
+    feature = np.zeros(n_nodes, dtype=np.int32)
+    feature[n_leaves:] = arrays['feature']
+    threshold = np.full(n_nodes, np.inf, dtype=np.float32)
+    threshold[n_leaves:] = arrays['thresholds'][arrays['threshold_index']]
+    children = np.empty((n_nodes, 2), dtype=np.int32)
+    children[:n_leaves] = np.arange(n_leaves)[:, None]
+    children[n_leaves:, 0] = ids + arrays['left']
+    children[n_leaves:, 1] = ids + arrays['right']
+    return feature, threshold, children, value, arrays['roots'].astype(np.intp)
+
+
+# ================= FILE FORMAT =================
+
+class _SectionWriter:
+    def __init__(self, codec, leaf_bits):
+        self.compress = CODECS[codec][0]
+        self.leaf_bits = leaf_bits
+        self.sections = {}
+        self.blobs = []
+        self.offset = 0
+        self.raw_bytes = 0
+        self.sv_rows = {}   # float32 row bytes -> index in the shared support-vector table
+
+    def _add(self, name, raw, meta):
+        blob = self.compress(raw)
+        meta.update(offset=self.offset, size=len(blob))
+        self.sections[name] = meta
+        self.blobs.append(blob)
+        self.offset += len(blob)
+        self.raw_bytes += len(raw)
+        return name
+
+    def array(self, name, arr):
+        arr = np.ascontiguousarray(arr)
+        return self._add(name, arr.tobytes(), {'dtype': arr.dtype.str, 'shape': list(arr.shape)})
+
+    def blob(self, name, raw):
+        return self._add(name, raw, {'dtype': None})
+
+    def support_vector_index(self, rows):
+        rows = np.ascontiguousarray(rows, dtype=np.float32)
+        index = np.empty(len(rows), dtype=np.int64)
+        for i, row in enumerate(rows):
+            index[i] = self.sv_rows.setdefault(row.tobytes(), len(self.sv_rows))
+        return index
+
+
+class _SectionReader:
+    def __init__(self, data, sections, codec):
+        self.data = data
+        self.sections = sections
+        self.decompress = CODECS[codec][1]
+
+    def raw(self, name):
+        meta = self.sections[name]
+        return self.decompress(self.data[meta['offset']:meta['offset'] + meta['size']])
+
+    def array(self, name):
+        meta = self.sections[name]
+        return np.frombuffer(self.raw(name), dtype=np.dtype(meta['dtype'])).reshape(meta['shape'])
+
+
+# ================= EXPORT =================
+
+def _export(writer, prefix, est, stats):
+    from sklearn.ensemble import RandomForestClassifier, VotingClassifier
+    from sklearn.multioutput import MultiOutputClassifier
+    from sklearn.svm import SVC
+    from sklearn.tree import DecisionTreeClassifier
+
+    if isinstance(est, MultiOutputClassifier):
+        return {'type': 'multioutput',
+                'estimators': [_export(writer, f"{prefix}.{i}", e, stats) for i, e in enumerate(est.estimators_)]}
+
+    if isinstance(est, VotingClassifier) and est.voting == 'soft':
+        return {'type': 'voting',
+                'classes': est.classes_.tolist(),
+                'weights': None if est.weights is None else list(est.weights),
+                'members': [_export(writer, f"{prefix}.{name}", member, stats)
+                            for (name, _), member in zip(est.estimators, est.estimators_)]}
+
+    if isinstance(est, ForestEngine) and est.estimator is not None:
+        est = est.estimator
+
+    if isinstance(est, (RandomForestClassifier, DecisionTreeClassifier)) and est.n_outputs_ == 1:
+        trees = est.estimators_ if isinstance(est, RandomForestClassifier) else [est]
+        compiled = compile_forest(trees, est.n_classes_, writer.leaf_bits)
+        stats['nodes_in'] += compiled.pop('nodes_in')
+        stats['nodes_out'] += len(compiled['leaf_values']) + len(compiled['left'])
+        node = {'type': 'forest', 'classes': est.classes_.tolist(),
+                'feature_names': _feature_names(est), 'max_depth': compiled.pop('max_depth')}
+        node.update({field: writer.array(f"{prefix}.{field}", arr) for field, arr in compiled.items()})
+        return node
+
+    if (isinstance(est, SVC) and est.probability and est.kernel in ('rbf', 'linear')
+            and len(est.classes_) > 1):
+        stats['svc'] += 1
+        prob_a, prob_b = _svc_prob_params(est)
+        index = writer.support_vector_index(est.support_vectors_)
+        return {'type': 'svc',
+                'classes': est.classes_.tolist(),
+                'feature_names': _feature_names(est),
+                'kernel': est.kernel,
+                'gamma': float(est._gamma),
+                'support_index': writer.array(f"{prefix}.support_index", index.astype(_index_dtype(int(index.max()) + 1))),
+                'dual_coef': writer.array(f"{prefix}.dual_coef", est._dual_coef_.astype(np.float32)),
+                'intercept': writer.array(f"{prefix}.intercept", est._intercept_),
+                'n_support': writer.array(f"{prefix}.n_support", est.n_support_.astype(np.int32)),
+                'prob_a': writer.array(f"{prefix}.prob_a", prob_a),
+                'prob_b': writer.array(f"{prefix}.prob_b", prob_b)}
+
+    # Anything we do not know how to compile is kept as a (compressed) pickle
+    return {'type': 'pickle', 'section': writer.blob(f"{prefix}.pkl", pickle.dumps(est, pickle.HIGHEST_PROTOCOL))}
+
+
+def export_compact(model, path, leaf_bits=DEFAULT_LEAF_BITS, codec=DEFAULT_CODEC, source=None):
+    if leaf_bits not in LEAF_BITS:
+        raise ValueError(f"leaf_bits must be one of {LEAF_BITS}")
+    writer = _SectionWriter(codec, leaf_bits)
+    stats = {'nodes_in': 0, 'nodes_out': 0, 'svc': 0}
+    root = _export(writer, 'model', model, stats)
+    if writer.sv_rows:
+        table = np.frombuffer(b''.join(writer.sv_rows), dtype=np.float32).reshape(len(writer.sv_rows), -1)
+        writer.array('support_vectors', table)
+    manifest = {'format_version': FORMAT_VERSION,
+                'codec': codec,
+                'leaf_bits': leaf_bits,
+                'tolerance': tolerance(leaf_bits, stats['svc'] > 0),
+                'source': None if source is None else source_signature(source),
+                'stats': dict(stats, raw_bytes=writer.raw_bytes),
+                'sections': writer.sections,
+                'model': root}
+    header = json.dumps(manifest).encode('utf-8')
+
+    # Write next to the target and swap it in, so readers never see half a file
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for blob in writer.blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return manifest
+
+
+# ================= LOAD =================
+
+def read_manifest(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a compact model file")
+        (length,) = struct.unpack('<Q', f.read(8))
+        return json.loads(f.read(length))
+
+
+def _load(reader, node, leaf_bits, support_vectors):
+    kind = node['type']
+    if kind == 'multioutput':
+        return PackedMultiOutput([_load(reader, e, leaf_bits, support_vectors) for e in node['estimators']])
+    if kind == 'voting':
+        return PackedVoting([_load(reader, m, leaf_bits, support_vectors) for m in node['members']],
+                            node['weights'], np.asarray(node['classes']))
+    if kind == 'forest':
+        arrays = {field: reader.array(node[field]) for field in
+                  ('leaf_values', 'feature', 'thresholds', 'threshold_index', 'left', 'right', 'roots')}
+        feature, threshold, children, value, roots = expand_forest(arrays, leaf_bits)
+        return ForestEngine(feature, threshold, children, value, roots, node['max_depth'],
+                            node['classes'], node['feature_names'])
+    if kind == 'svc':
+        index = reader.array(node['support_index'])
+        return PackedSVC(support_vectors()[index].astype(np.float64),
+                         reader.array(node['dual_coef']).astype(np.float64),
+                         reader.array(node['intercept']), reader.array(node['n_support']).astype(np.int64),
+                         reader.array(node['prob_a']), reader.array(node['prob_b']),
+                         node['kernel'], node['gamma'], np.asarray(node['classes']), node['feature_names'])
+    if kind == 'pickle':
+        return pickle.loads(reader.raw(node['section']))
+    raise ValueError(f"Unknown compact node type {kind!r}")
+
+
+def load_compact(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a compact model file")
+    (length,) = struct.unpack('<Q', data[len(MAGIC):len(MAGIC) + 8])
+    start = len(MAGIC) + 8
+    manifest = json.loads(data[start:start + length])
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported compact format in {path}: {manifest.get('format_version')}")
+    reader = _SectionReader(memoryview(data)[start + length:], manifest['sections'], manifest['codec'])
+    table = []
+
+    def support_vectors():
+        if not table:
+            table.append(reader.array('support_vectors'))
+        return table[0]
+
+    return _load(reader, manifest['model'], manifest['leaf_bits'], support_vectors)
+
+
+def is_fresh(path, source):
+    # True when path holds a compact export of the current version of the source pickle
+    try:
+        manifest = read_manifest(path)
+    except (OSError, ValueError):
+        return False
+    return (manifest.get('format_version') == FORMAT_VERSION and
+            os.path.exists(source) and manifest.get('source') == source_signature(source))
+
+
+# ================= CLI =================
+
+def main(argv=None):
+    import joblib
+    import agro_core
+
+    parser = argparse.ArgumentParser(description="Export or check compact quantized model files.")
+    parser.add_argument('command', choices=['export', 'verify'])
+    parser.add_argument('--out', default=ARTIFACT_DIR, help="directory of the .agc files")
+    parser.add_argument('--leaf-bits', type=int, choices=LEAF_BITS, default=DEFAULT_LEAF_BITS,
+                        help="bits per quantized leaf probability (32 = float32)")
+    parser.add_argument('--codec', choices=list(CODECS), default=DEFAULT_CODEC)
+    parser.add_argument('--rows', type=int, default=500, help="rows used by verify")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name in ('crop_model', 'fertilizer_model'):
+        path = compact_path(name, args.out)
+        source = agro_core.model_path(name)
+        if args.command == 'export':
+            start = time.perf_counter()
+            manifest = export_compact(joblib.load(source), path, args.leaf_bits, args.codec, source)
+            stats = manifest['stats']
+            print(f"✅ Exported {name} to {path} in {time.perf_counter() - start:.1f}s: "
+                  f"{os.path.getsize(source) / 1e6:.1f} MB -> {os.path.getsize(path) / 1e6:.2f} MB "
+                  f"({stats['nodes_in']} tree nodes -> {stats['nodes_out']} after deduplication)")
+            continue
+
+        start = time.perf_counter()
+        compact = load_compact(path)
+        load_s = time.perf_counter() - start
+        if not is_fresh(path, source):
+            print(f"⚠️ {path} is older than {source}; run export again")
+        original = joblib.load(source)
+        X = _sample_inputs(name, args.rows)
+        expected, got = _probas(original, X), _probas(compact, X)
+        diff = max(float(np.abs(a - b).max()) for a, b in zip(expected, got))
+        agree = np.mean([np.mean(a.argmax(axis=1) == b.argmax(axis=1)) for a, b in zip(expected, got)])
+        bound = read_manifest(path)['tolerance']
+        ok = diff <= bound
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {name}: load {load_s:.2f}s, max |Δproba| on {len(X)} rows = {diff:.2e} "
+              f"(tolerance {bound:.2e}), same top class {agree:.2%}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
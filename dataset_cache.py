@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+# Columnar binary cache for the training CSVs.
+#
+# The first load of a CSV parses it once and writes one .npy file per column next to
+# it, under .dataset_cache/<csv name>/: numerics as numeric_dtype and categoricals as
+# integer codes into their sorted category list (the same codes LabelEncoder assigns),
+# plus a manifest.json with the CSV's sha256. Later loads memory-map the .npy files and
+# wrap them in a DataFrame, one block per column, so nothing is copied (test_dataset_cache
+# checks every column is still backed by its map) and training no longer pays for CSV
+# parsing.
+#
+# The content hash decides validity. The file size and mtime recorded next to it are
+# only a shortcut: when both still match the hash is not recomputed.
+#
+# numeric_dtype defaults to float32, which is what sklearn trees convert their input
+# to, so a forest learns the same splits either way. Models with other members (the
+# crop ensemble's SVC works in float64) must load float64 to train on the CSV's values.
+# Every dtype has its own cache directory (<csv name>.float64 next to <csv name>), so
+# readers of the same CSV with different dtypes never rebuild each other's cache.
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+CACHE_DIR = os.environ.get('AGRO_DATASET_CACHE', '.dataset_cache')  # '' disables the cache
+HASH_CHUNK = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(path, cache_dir=None, numeric_dtype=np.float32):
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    base = os.path.join(os.path.dirname(os.path.abspath(path)), cache_dir)
+    name = np.dtype(numeric_dtype).name
+    return os.path.join(base, os.path.basename(path) + ('' if name == 'float32' else '.' + name))
+
+
+def _code_dtype(n_categories):
+    return np.int8 if n_categories < 2 ** 7 else np.int16 if n_categories < 2 ** 15 else np.int32
+
+
+# ================= BUILD =================
+
+def build_cache(path, categoricals, out_dir, sha256=None, numeric_dtype=np.float32):
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    columns = []
+    tmp_dir = out_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for i, col in enumerate(df.columns):
+        file = f'col_{i:03d}.npy'
+        if col in categoricals:
+            # Sorted categories give exactly the codes LabelEncoder.fit_transform produces
+            categories = sorted(df[col].astype(str).unique())
+            codes = pd.Categorical(df[col].astype(str), categories=categories).codes
+            np.save(os.path.join(tmp_dir, file), codes.astype(_code_dtype(len(categories))))
+            columns.append({'name': col, 'file': file, 'kind': 'categorical', 'categories': categories})
+        else:
+            values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=numeric_dtype, na_value=np.nan)
+            np.save(os.path.join(tmp_dir, file), values)
+            columns.append({'name': col, 'file': file, 'kind': 'numeric'})
+
+    st = os.stat(path)
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'sha256': sha256 or file_sha256(path),
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'rows': len(df),
+        'categoricals': sorted(categoricals),
+        'numeric_dtype': np.dtype(numeric_dtype).name,
+        'columns': columns,
+    }
+    _write_manifest(tmp_dir, manifest)
+
+    # Swap the finished directory in, so a crash never leaves a half-written cache
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return manifest
+
+
+def _write_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def _read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_valid(manifest, path, categoricals, numeric_dtype=None):
+    # Returns (valid, sha256 if it had to be computed); numeric_dtype=None accepts any
+    if not manifest or manifest.get('format_version') != FORMAT_VERSION:
+        return False, None
+    if manifest['categoricals'] != sorted(categoricals):
+        return False, None
+    if numeric_dtype is not None and manifest.get('numeric_dtype', 'float32') != np.dtype(numeric_dtype).name:
+        return False, None
+    st = os.stat(path)
+    if st.st_size == manifest['size'] and st.st_mtime_ns == manifest['mtime_ns']:
+        return True, None
+    sha256 = file_sha256(path)
+    return sha256 == manifest['sha256'], sha256
+
+
+# ================= LOAD =================
+
+def load_dataset(path, categoricals=(), cache_dir=None, mmap_mode='r', numeric_dtype=np.float32):
+    # Returns (DataFrame, {column: categories}); categorical columns hold integer codes
+    import pandas as pd
+
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    if not cache_dir:
+        return _parse_csv(path, categoricals, numeric_dtype)
+
+    out_dir = cache_path(path, cache_dir, numeric_dtype)
+    manifest = _read_manifest(out_dir)
+    valid, sha256 = is_valid(manifest, path, categoricals, numeric_dtype)
+    if not valid:
+        manifest = build_cache(path, categoricals, out_dir, sha256, numeric_dtype)
+    elif sha256 is not None:
+        # Same content under a new mtime (e.g. a fresh checkout): remember the new stat
+        st = os.stat(path)
+        manifest.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+        _write_manifest(out_dir, manifest)
+
+    data = {c['name']: np.load(os.path.join(out_dir, c['file']), mmap_mode=mmap_mode)
+            for c in manifest['columns']}
+    categories = {c['name']: c['categories'] for c in manifest['columns'] if c['kind'] == 'categorical'}
+    return pd.DataFrame(data, copy=False), categories
+
+
+def _parse_csv(path, categoricals, numeric_dtype=np.float32):
+    # Uncached path with the same output types as the cache
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    categories = {}
+    for col in df.columns:
+        if col in categoricals:
+            categories[col] = sorted(df[col].astype(str).unique())
+            codes = pd.Categorical(df[col].astype(str), categories=categories[col]).codes
+            df[col] = codes.astype(_code_dtype(len(categories[col])))
+        else:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(numeric_dtype)
+    return df, categories
+
+
+def label_encoders(categories):
+    # Fitted LabelEncoders equivalent to fit_transform on the original string columns
+    from sklearn.preprocessing import LabelEncoder
+
+    encoders = {}
+    for col, classes in categories.items():
+        le = LabelEncoder()
+        le.classes_ = np.array(classes, dtype=object)
+        encoders[col] = le
+    return encoders
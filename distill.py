@@ -0,0 +1,179 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from forest_engine import ForestEngine, pack_trees
+
+# Distil the crop ensemble into one compact student forest.
+#
+# The teacher is a MultiOutputClassifier of three soft-voting ensembles (forest +
+# tree + kernel SVC per output). The student is a single multi-output
+# RandomForestRegressor fitted on the teacher's soft labels: the three probability
+# vectors side by side, one regression output per class. Every node of such a tree
+# holds the mean soft label of its training rows, so each output's slice of a node
+# value is itself a probability distribution, and averaging trees keeps it one.
+#
+# Training rows are the crop training split plus SYNTHETIC_RATIO as many synthetic
+# rows drawn uniformly within the observed range of every feature, so the student
+# also follows the teacher between and around the recorded samples.
+#
+# The fitted forest is compiled into one ForestEngine: a prediction is a single walk
+# of the student's trees for all three outputs. estimators_ exposes one engine per
+# output over the same node arrays, which gives agro_core its classes_ and lets
+# attributions.py explain the student like any other forest.
+#
+# `python distill.py` writes crop_student.pkl and reports agreement with the teacher
+# and the latency and size gains; AGRO_CROP_STUDENT=1 makes agro_core (and so
+# Agro.py, batch scoring and the service) load it in place of the ensemble.
+
+STUDENT_FILE = 'crop_student.pkl'
+SYNTHETIC_RATIO = 3.0
+STUDENT_PARAMS = {'n_estimators': 40, 'max_depth': 14, 'min_samples_leaf': 4, 'max_features': 0.6}
+
+
+# ================= STUDENT =================
+
+class StudentModel:
+    def __init__(self, engine, classes):
+        # engine: ForestEngine whose value columns are every output's classes side by side
+        self.engine = engine
+        self.classes = [np.asarray(c) for c in classes]
+        bounds = np.cumsum([0] + [len(c) for c in self.classes])
+        self.slices = [slice(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:])]
+        self._views()
+
+    def _views(self):
+        e = self.engine
+        self.estimators_ = [
+            ForestEngine(e.feature, e.threshold, e.children, np.ascontiguousarray(e.value[:, s]),
+                         e.roots, e.max_depth, c, e.feature_names_in_)
+            for s, c in zip(self.slices, self.classes)
+        ]
+
+    # The per-output views copy value columns; rebuild them on load instead of pickling them
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if k != 'estimators_'}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._views()
+
+    def predict_proba(self, X):
+        proba = self.engine.predict_proba(X)
+        out = []
+        for s in self.slices:
+            p = np.clip(proba[:, s], 0.0, None)
+            out.append(p / np.maximum(p.sum(axis=1, keepdims=True), 1e-12))
+        return out
+
+    def predict(self, X):
+        return np.column_stack([c[p.argmax(axis=1)] for c, p in zip(self.classes, self.predict_proba(X))])
+
+
+def compile_student(forest, classes):
+    trees = forest.estimators_
+    packed = pack_trees(trees, 1)
+    # Regression trees hold one value per output (class) in tree_.value[:, :, 0]
+    packed['value'] = np.concatenate([t.tree_.value[:, :, 0] for t in trees]).astype(np.float32)
+    names = getattr(forest, 'feature_names_in_', None)
+    engine = ForestEngine(classes=np.arange(packed['value'].shape[1]),
+                          feature_names=None if names is None else [str(n) for n in names], **packed)
+    return StudentModel(engine, classes)
+
+
+# ================= DISTILLATION =================
+
+def synthetic_rows(X, n, seed=0):
+    # Uniform samples within every feature's observed [min, max]
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    low, high = X.min().to_numpy(float), X.max().to_numpy(float)
+    return pd.DataFrame(rng.uniform(low, high, size=(n, X.shape[1])), columns=X.columns)
+
+
+def soft_labels(teacher, X):
+    return np.hstack(teacher.predict_proba(X))
+
+
+def distill(teacher, X, synthetic_ratio=SYNTHETIC_RATIO, params=None, seed=0):
+    import pandas as pd
+    from sklearn.ensemble import RandomForestRegressor
+
+    X_all = pd.concat([X, synthetic_rows(X, int(len(X) * synthetic_ratio), seed)], ignore_index=True)
+    targets = soft_labels(teacher, X_all)
+    forest = RandomForestRegressor(random_state=seed, n_jobs=-1, **(params or STUDENT_PARAMS))
+    forest.fit(X_all, targets)
+    return compile_student(forest, [e.classes_ for e in teacher.estimators_])
+
+
+def compare(teacher, student, X, y, targets):
+    # Per output: argmax agreement with the teacher, accuracy of both, mean |Δproba|
+    report = {}
+    for target, t, s, classes in zip(targets, teacher.predict_proba(X), student.predict_proba(X),
+                                     student.classes):
+        labels = np.asarray(y[target])
+        report[target] = {
+            'agreement': float((t.argmax(axis=1) == s.argmax(axis=1)).mean()),
+            'accuracy_teacher': float((classes[t.argmax(axis=1)] == labels).mean()),
+            'accuracy_student': float((classes[s.argmax(axis=1)] == labels).mean()),
+            'mean_abs_diff': float(np.abs(t - s).mean()),
+        }
+    return report
+
+
+def latency_ms(model, X, repeat=20):
+    # Median milliseconds of one predict_proba call on X
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict_proba(X)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+# ================= CLI =================
+
+def main(argv=None):
+    import joblib
+
+    import agro_core
+    from Crop_training_model import load_data
+    from training_utils import dump_atomic
+
+    parser = argparse.ArgumentParser(description="Distil the crop ensemble into a compact student forest.")
+    parser.add_argument('--out', default=os.path.join(agro_core.MODEL_DIR, STUDENT_FILE))
+    parser.add_argument('--synthetic-ratio', type=float, default=SYNTHETIC_RATIO,
+                        help="synthetic rows per training row, drawn within the observed feature ranges")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    source = agro_core.model_path('crop_model')
+    teacher = joblib.load(source)
+    X_train, X_test, _, y_test, _ = load_data()
+
+    print("🧠 Labelling training and synthetic rows with the teacher...")
+    start = time.perf_counter()
+    student = distill(teacher, X_train, args.synthetic_ratio, seed=args.seed)
+    print(f"✅ Student trained in {time.perf_counter() - start:.1f}s")
+    dump_atomic(student, args.out)
+
+    report = compare(teacher, student, X_test, y_test, agro_core.CROP_TARGETS)
+    print(f"\n{'output':<10} {'agreement':>9} {'acc teacher':>11} {'acc student':>11} {'mean |Δp|':>9}")
+    for target, r in report.items():
+        print(f"{target:<10} {r['agreement']:>9.2%} {r['accuracy_teacher']:>11.4f} "
+              f"{r['accuracy_student']:>11.4f} {r['mean_abs_diff']:>9.4f}")
+
+    one = X_test.iloc[:1]
+    t_one, s_one = latency_ms(teacher, one), latency_ms(student, one)
+    t_all, s_all = latency_ms(teacher, X_test, 1), latency_ms(student, X_test, 3)
+    t_mb, s_mb = os.path.getsize(source) / 2 ** 20, os.path.getsize(args.out) / 2 ** 20
+    print(f"\n⏱️ 1 row: teacher {t_one:.1f} ms, student {s_one:.2f} ms ({t_one / s_one:.0f}x)")
+    print(f"⏱️ {len(X_test)} rows: teacher {t_all:.0f} ms, student {s_all:.0f} ms ({t_all / s_all:.0f}x)")
+    print(f"💾 Size: teacher {t_mb:.1f} MB, student {s_mb:.1f} MB ({t_mb / s_mb:.0f}x smaller)")
+    print(f"✅ Student saved to {args.out}; run with AGRO_CROP_STUDENT=1 to use it")
+
+
+if __name__ == '__main__':
+    main()
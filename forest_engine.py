@@ -0,0 +1,139 @@
+import numpy as np
+
+# Flat-array inference engine for fitted sklearn tree ensembles.
+#
+# A forest is compiled into one set of node arrays shared by all trees. Leaves are
+# rewritten as self-loops (threshold +inf, both children pointing back at the leaf),
+# so a batch walks every (row, tree) pair at once with no per-pair branching: each
+# step is a handful of vectorised gathers, and pairs that reached a leaf are dropped
+# every few steps. Results match predict / predict_proba of the source estimator.
+#
+# The walk removes sklearn's per-call dispatch and validation overhead, which is what
+# dominates single-row latency. For large batches sklearn's compiled loop is faster,
+# so when the source estimator is kept around big batches are handed back to it.
+
+TREE_LEAF = -1
+BLOCK_ROWS = 4096
+COMPACT_EVERY = 4
+ENGINE_MAX_ROWS = 256
+
+
+def pack_trees(trees, n_classes):
+    # trees: fitted DecisionTreeClassifier objects with one output.
+    # Returns the compiled arrays consumed by ForestEngine.
+    feature, threshold, children, value, roots = [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for tree in trees:
+        t = tree.tree_
+        ids = np.arange(t.node_count) + offset
+        leaf = t.children_left == TREE_LEAF
+        roots.append(offset)
+        feature.append(np.where(leaf, 0, t.feature).astype(np.int32))
+        threshold.append(np.where(leaf, np.inf, t.threshold))
+        # children[i] = (left, right), interleaved so one gather picks the branch taken
+        children.append(np.column_stack([np.where(leaf, ids, t.children_left + offset),
+                                         np.where(leaf, ids, t.children_right + offset)]).astype(np.int32))
+        # Normalise every node (not only leaves) the way DecisionTreeClassifier.predict_proba does
+        v = t.value[:, 0, :n_classes]
+        norm = v.sum(axis=1, keepdims=True)
+        norm[norm == 0.0] = 1.0
+        value.append(v / norm)
+        max_depth = max(max_depth, t.max_depth)
+        offset += t.node_count
+    return {
+        'feature': np.concatenate(feature),
+        'threshold': np.concatenate(threshold),
+        'children': np.concatenate(children),
+        'value': np.concatenate(value),
+        'roots': np.asarray(roots, dtype=np.int64),
+        'max_depth': int(max_depth),
+    }
+
+
+class ForestEngine:
+    def __init__(self, feature, threshold, children, value, roots, max_depth, classes,
+                 feature_names=None, estimator=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self._flat_children = children.reshape(-1)
+        self.value = value
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        self.classes_ = np.asarray(classes)
+        self.feature_names_in_ = feature_names
+        self.n_features_in_ = None if feature_names is None else len(feature_names)
+        self.estimator = estimator
+
+    @classmethod
+    def from_sklearn(cls, estimator, keep_estimator=True):
+        # Accepts a fitted single-output RandomForestClassifier or DecisionTreeClassifier.
+        # With keep_estimator, batches above ENGINE_MAX_ROWS are scored by the estimator itself.
+        if getattr(estimator, 'n_outputs_', 1) != 1:
+            raise ValueError("ForestEngine supports single-output classifiers only")
+        trees = getattr(estimator, 'estimators_', None) or [estimator]
+        names = getattr(estimator, 'feature_names_in_', None)
+        packed = pack_trees(trees, estimator.n_classes_)
+        return cls(classes=estimator.classes_,
+                   feature_names=None if names is None else [str(n) for n in names],
+                   estimator=estimator if keep_estimator else None,
+                   **packed)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def _matrix(self, X):
+        # Column selection on a DataFrame is slow relative to a single-row walk; skip it
+        # when the columns are already in training order
+        if (self.feature_names_in_ is not None and hasattr(X, 'columns') and
+                list(X.columns) != self.feature_names_in_):
+            X = X[self.feature_names_in_]
+        # sklearn trees compare float32 inputs against float64 thresholds
+        return np.ascontiguousarray(X, dtype=np.float32)
+
+    def _apply_block(self, X):
+        n, n_features = X.shape
+        flat = X.ravel()
+        # One entry per (row, tree) pair still walking; pos remembers where it belongs
+        cur = np.tile(self.roots, n)
+        base = np.repeat(np.arange(n, dtype=np.intp) * n_features, self.n_trees)
+        pos = np.arange(cur.size)
+        leaves = np.empty(cur.size, dtype=np.intp)
+        for step in range(self.max_depth):
+            # NaN compares False and goes right, as in sklearn
+            go_right = ~(flat[base + self.feature[cur]] <= self.threshold[cur])
+            cur = self._flat_children[2 * cur + go_right]
+            # Every few steps drop pairs that already sit on a leaf, so shallow paths stop
+            # costing anything while the deepest trees finish
+            if step % COMPACT_EVERY == COMPACT_EVERY - 1:
+                done = self._flat_children[2 * cur] == cur
+                leaves[pos[done]] = cur[done]
+                keep = ~done
+                cur, base, pos = cur[keep], base[keep], pos[keep]
+                if not cur.size:
+                    break
+        leaves[pos] = cur
+        return leaves.reshape(n, self.n_trees)
+
+    def apply(self, X):
+        # Leaf node id reached in every tree: shape (n_rows, n_trees)
+        X = self._matrix(X)
+        return np.concatenate([self._apply_block(X[lo:lo + BLOCK_ROWS])
+                               for lo in range(0, len(X), BLOCK_ROWS)] or
+                              [np.empty((0, self.n_trees), dtype=np.intp)])
+
+    def predict_proba(self, X):
+        if self.estimator is not None and len(X) > ENGINE_MAX_ROWS:
+            return self.estimator.predict_proba(X)
+        X = self._matrix(X)
+        out = np.empty((len(X), self.value.shape[1]))
+        for lo in range(0, len(X), BLOCK_ROWS):
+            leaves = self._apply_block(X[lo:lo + BLOCK_ROWS])
+            # Summing over the tree axis accumulates tree by tree, in the same order as sklearn
+            out[lo:lo + len(leaves)] = self.value[leaves].sum(axis=1) / self.n_trees
+        return out
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
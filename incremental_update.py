@@ -0,0 +1,383 @@
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from sklearn.model_selection import train_test_split
+from sklearn.svm import SVC
+from sklearn.tree._tree import Tree
+
+import Crop_training_model as crop_training
+import Fertilizer_training_model as fertilizer_training
+from training_utils import timed, print_stage_times, reset_n_jobs, dump_atomic
+
+# Incremental updates from newly collected labeled rows.
+#
+# Instead of retraining from scratch, an update
+#   - extends the saved label encoders with classes never seen before (appended, so
+#     every existing code keeps its meaning),
+#   - grows each random forest with extra trees trained on the most recent rows (old
+#     and new trees are padded to the extended class list before being merged),
+#   - refits the cheap decision-tree members on all training rows,
+#   - keeps the expensive SVM member; when new classes appear it is wrapped so its
+#     probabilities get zero columns for them (only a full rebuild teaches it those),
+#   - appends the new rows to the dataset CSV.
+# A share of the new rows is held out and, together with the training scripts' usual
+# test split, used to score the model before the update, after it, and (with
+# --compare) after a full retrain, so the report shows when a rebuild is worth it.
+
+DEFAULT_EXTRA_TREES = 10
+DEFAULT_RECENT_ROWS = 2000
+DEFAULT_HOLDOUT = 0.2
+DEFAULT_REBUILD_GAP = 0.01
+
+SPECS = {
+    'crop': {
+        'module': crop_training,
+        'features': crop_training.FEATURES,
+        'targets': crop_training.TARGETS,
+        'categoricals': crop_training.TARGETS,
+        'data': 'sensor_Crop_Dataset.csv',
+        'model': 'ensemble_crop_model.pkl',
+        'encoders': 'crop_label_encoders.pkl',
+    },
+    'fertilizer': {
+        'module': fertilizer_training,
+        'features': fertilizer_training.FEATURES,
+        'targets': [fertilizer_training.TARGET],
+        'categoricals': fertilizer_training.CATEGORICALS,
+        'data': 'data_core.csv',
+        'model': 'fertilizer_model.pkl',
+        'encoders': 'fertilizer_label_encoders.pkl',
+    },
+}
+
+
+# ================= CLASS EXTENSION =================
+
+def extend_encoder(encoder, values):
+    # Append unseen labels; LabelEncoder maps object labels through a dict, so classes_
+    # does not need to stay sorted and existing codes are unchanged
+    known = set(encoder.classes_)
+    added = sorted({str(v) for v in values} - known)
+    if added:
+        encoder.classes_ = np.concatenate([encoder.classes_, np.array(added, dtype=object)])
+    return added
+
+
+def pad_tree(tree, column_map, n_classes):
+    # Rebuild a fitted tree's value array so column j moves to column_map[j] of n_classes
+    state = tree.tree_.__getstate__()
+    values = state['values']
+    padded = np.zeros(values.shape[:2] + (n_classes,), dtype=values.dtype)
+    padded[:, :, column_map] = values
+    state['values'] = padded
+    new_tree = Tree(tree.n_features_in_, np.array([n_classes], dtype=np.intp), tree.n_outputs_)
+    new_tree.__setstate__(state)
+    tree.tree_ = new_tree
+    tree.n_classes_ = np.int64(n_classes)
+    tree.classes_ = np.arange(n_classes, dtype=np.float64)
+    return tree
+
+
+class ClassPadder(ClassifierMixin, BaseEstimator):
+    # Keeps a member that has not seen some classes usable next to members that have
+    def __init__(self, estimator=None, n_classes=None):
+        self.estimator = estimator
+        self.n_classes = n_classes
+
+    @property
+    def classes_(self):
+        return np.arange(self.n_classes)
+
+    def predict_proba(self, X):
+        inner = self.estimator.predict_proba(X)
+        proba = np.zeros((inner.shape[0], self.n_classes))
+        proba[:, np.asarray(self.estimator.classes_, dtype=int)] = inner
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def _check_index_classes(estimator):
+    classes = np.asarray(estimator.classes_)
+    if not np.array_equal(classes, np.arange(len(classes))):
+        raise ValueError(f"{type(estimator).__name__} classes are not 0..n-1; cannot merge trees")
+
+
+def grow_forest(forest, X_recent, y_recent, n_classes, n_trees, seed):
+    # Train n_trees extra trees on recent rows (y as class indices) and merge them in
+    _check_index_classes(forest)
+    extra = clone(forest).set_params(n_estimators=n_trees, warm_start=False, random_state=seed)
+    extra.fit(X_recent, y_recent)
+    column_map = np.asarray(extra.classes_, dtype=int)
+    for tree in extra.estimators_:
+        pad_tree(tree, column_map, n_classes)
+    if forest.n_classes_ < n_classes:
+        for tree in forest.estimators_:
+            pad_tree(tree, np.arange(forest.n_classes_), n_classes)
+    forest.estimators_ = list(forest.estimators_) + list(extra.estimators_)
+    forest.n_estimators = len(forest.estimators_)
+    forest.classes_ = np.arange(n_classes, dtype=np.asarray(forest.classes_).dtype)
+    forest.n_classes_ = n_classes
+    return forest
+
+
+def _refit_tree(tree, X, y, n_classes):
+    tree = clone(tree).fit(X, y)
+    if tree.n_classes_ < n_classes:
+        pad_tree(tree, np.asarray(tree.classes_, dtype=int), n_classes)
+    return tree
+
+
+def _pad_member(member, n_classes):
+    if isinstance(member, ClassPadder):
+        member.n_classes = n_classes
+        return member
+    if len(member.classes_) < n_classes:
+        return ClassPadder(member, n_classes)
+    return member
+
+
+# ================= MODEL UPDATES =================
+
+def update_fertilizer(model, train, recent, n_trees, seed):
+    features, target = fertilizer_training.FEATURES, fertilizer_training.TARGET
+    n_classes = int(max(train[target].max(), recent[target].max(), len(model.classes_) - 1)) + 1
+    grow_forest(model, recent[features], recent[target].to_numpy(), n_classes, n_trees, seed)
+    return model
+
+
+def _new_codes(voting, target, train, recent):
+    # Codes the voting classifier's le_ has not seen. le_ holds numeric codes, which
+    # LabelEncoder looks up with searchsorted, so they can only be appended when they sort
+    # after every known one; a code between them (e.g. a rare class that was missing from
+    # the training split) would shift the class index of every member
+    codes = np.union1d(train[target].unique(), recent[target].unique())
+    new_codes = np.setdiff1d(codes, voting.le_.classes_)
+    if len(new_codes) and new_codes.min() < voting.le_.classes_.max():
+        labels = ', '.join(str(c) for c in new_codes[new_codes < voting.le_.classes_.max()])
+        raise ValueError(f"{target} codes {labels} were not in the model's training split and cannot be "
+                         f"appended; run a full rebuild with the training script instead")
+    return new_codes
+
+
+def update_crop(model, train, recent, n_trees, seed):
+    X_all, X_recent = train[crop_training.FEATURES], recent[crop_training.FEATURES]
+    # Check every output before changing any of them
+    added = [_new_codes(voting, target, train, recent)
+             for voting, target in zip(model.estimators_, crop_training.TARGETS)]
+    for voting, target, new_codes in zip(model.estimators_, crop_training.TARGETS, added):
+        # The voting classifier indexes its members' classes through le_
+        if len(new_codes):
+            voting.le_.classes_ = np.concatenate([voting.le_.classes_, new_codes])
+            voting.classes_ = voting.le_.classes_
+        n_classes = len(voting.classes_)
+
+        members = dict(voting.named_estimators_)
+        grow_forest(members['rf'], X_recent, voting.le_.transform(recent[target]), n_classes, n_trees, seed)
+        members['dt'] = _refit_tree(members['dt'], X_all, voting.le_.transform(train[target]), n_classes)
+        for name in members:
+            if name not in ('rf', 'dt'):
+                members[name] = _pad_member(members[name], n_classes)
+
+        names = [name for name, _ in voting.estimators]
+        voting.estimators_ = [members[name] for name in names]
+        for name in names:
+            voting.named_estimators_[name] = members[name]
+    return model
+
+
+def full_retrain(kind, model, train, n_jobs=None):
+    spec = SPECS[kind]
+    if kind == 'crop':
+        svc = model.estimators_[0].named_estimators_.get('svc')
+        inner = svc.estimator if isinstance(svc, ClassPadder) else svc
+        profile = 'full' if isinstance(inner, SVC) else 'fast'
+        fresh = crop_training.build_model(profile, n_jobs)
+        crop_training.fit_members(fresh, train[spec['features']], train[spec['targets']],
+                                  crop_training.worker_plan(profile, n_jobs)['fits'])
+    else:
+        fresh = fertilizer_training.build_model(n_jobs)
+        fresh.fit(train[spec['features']], train[spec['targets'][0]])
+    return reset_n_jobs(fresh)
+
+
+# ================= DATA =================
+
+def _recode(frame, columns, src_encoders, dst_encoders):
+    # Codes from the CSV's own (sorted) encoders -> codes of the model's encoders
+    frame = frame.copy()
+    for col in columns:
+        labels = src_encoders[col].inverse_transform(frame[col].astype(int))
+        frame[col] = dst_encoders[col].transform(labels.astype(str))
+    return frame
+
+
+def prepare_data(kind, data_path, new_path, encoders, holdout=DEFAULT_HOLDOUT, seed=42):
+    # Returns (old_train, old_test, new_train, new_test, new_raw, added classes), all
+    # frames holding features and targets coded with the (extended) model encoders
+    spec = SPECS[kind]
+    X_train, X_test, y_train, y_test, csv_encoders = spec['module'].load_data(data_path)
+    old_train = _recode(pd.concat([X_train, y_train], axis=1), spec['categoricals'], csv_encoders, encoders)
+    old_test = _recode(pd.concat([X_test, y_test], axis=1), spec['categoricals'], csv_encoders, encoders)
+
+    new_raw = pd.read_csv(new_path)
+    missing = [c for c in spec['features'] + spec['targets'] if c not in new_raw.columns]
+    if missing:
+        raise ValueError(f"new rows are missing columns: {', '.join(missing)}")
+    added = {col: extend_encoder(encoders[col], new_raw[col]) for col in spec['categoricals']}
+
+    new = new_raw[spec['features'] + spec['targets']].copy()
+    for col in new.columns:
+        if col in spec['categoricals']:
+            new[col] = encoders[col].transform(new[col].astype(str))
+        else:
+            new[col] = pd.to_numeric(new[col], errors='coerce').astype(np.float32)
+    if new.isna().any().any():
+        raise ValueError("new rows contain missing or non-numeric values")
+
+    if holdout and len(new) >= 5:
+        new_train, new_test = train_test_split(new, test_size=holdout, random_state=seed)
+    else:
+        new_train, new_test = new, new.iloc[:0]
+    return old_train, old_test, new_train, new_test, new_raw, added
+
+
+def recent_rows(old_train, new_train, n_recent):
+    # The most recent old rows (the CSV is in collection order) plus every new row
+    tail = old_train.sort_index().tail(n_recent) if n_recent else old_train.iloc[:0]
+    return pd.concat([tail, new_train], ignore_index=True)
+
+
+def append_rows(data_path, new_raw):
+    columns = pd.read_csv(data_path, nrows=0).columns
+    with open(data_path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+    new_raw[list(columns)].to_csv(data_path, mode='a', header=False, index=False)
+
+
+# ================= EVALUATION =================
+
+def score(kind, model, frame):
+    spec = SPECS[kind]
+    X, y = frame[spec['features']], frame[spec['targets']]
+    pred = model.predict(X)
+    pred = pred.reshape(len(X), -1)
+    scores = {col: float((pred[:, i] == y[col].to_numpy()).mean()) for i, col in enumerate(spec['targets'])}
+    if len(spec['targets']) > 1:
+        scores['subset'] = float((pred == y.to_numpy()).all(axis=1).mean())
+    return scores
+
+
+def print_report(kind, results, rebuild_gap):
+    columns = list(next(iter(results.values()))[1])
+    print(f"\n📊 Incremental update report ({kind})")
+    print(f"{'model':<16} {'train (s)':>10}" + ''.join(f" {c:>15}" for c in columns))
+    for name, (seconds, scores) in results.items():
+        train = f"{seconds:>10.1f}" if seconds is not None else f"{'-':>10}"
+        print(f"{name:<16} {train}" + ''.join(f" {scores[c]:>15.4f}" for c in columns))
+
+    if 'full retrain' not in results:
+        return None
+    key = 'subset' if 'subset' in columns else columns[0]
+    gap = results['full retrain'][1][key] - results['incremental'][1][key]
+    if gap > rebuild_gap:
+        print(f"⚠️ Full retrain is {gap:.4f} more accurate ({key}); a full rebuild is recommended")
+    else:
+        print(f"✅ Incremental update is within {rebuild_gap:.4f} of a full retrain ({key} gap {gap:+.4f})")
+    return gap
+
+
+def run_update(kind, new_path, data_path=None, model_path=None, encoders_path=None,
+               n_trees=DEFAULT_EXTRA_TREES, n_recent=DEFAULT_RECENT_ROWS, holdout=DEFAULT_HOLDOUT,
+               compare=False, n_jobs=None, save=True, append=True, rebuild_gap=DEFAULT_REBUILD_GAP,
+               seed=None, times=None):
+    spec = SPECS[kind]
+    data_path = data_path or spec['data']
+    model_path = model_path or spec['model']
+    encoders_path = encoders_path or spec['encoders']
+    times = {} if times is None else times
+    seed = int(time.time()) if seed is None else seed
+
+    with timed('load', times):
+        model = joblib.load(model_path)
+        encoders = joblib.load(encoders_path)
+        old_train, old_test, new_train, new_test, new_raw, added = prepare_data(
+            kind, data_path, new_path, encoders, holdout)
+    for col, classes in added.items():
+        if classes:
+            print(f"🆕 New {col} classes: {', '.join(classes)}")
+
+    train = pd.concat([old_train, new_train], ignore_index=True)
+    evaluation = pd.concat([old_test, new_test], ignore_index=True)
+    results = {}
+    with timed('score', times):
+        results['before update'] = (None, score(kind, model, evaluation))
+
+    update = update_crop if kind == 'crop' else update_fertilizer
+    start = time.perf_counter()
+    with timed('update', times):
+        update(model, train, recent_rows(old_train, new_train, n_recent), n_trees, seed)
+    reset_n_jobs(model)
+    update_s = time.perf_counter() - start
+    with timed('score', times):
+        results['incremental'] = (update_s, score(kind, model, evaluation))
+
+    if compare:
+        start = time.perf_counter()
+        with timed('full retrain', times):
+            fresh = full_retrain(kind, model, train, n_jobs)
+        results['full retrain'] = (time.perf_counter() - start, score(kind, fresh, evaluation))
+
+    gap = print_report(kind, results, rebuild_gap)
+
+    if save:
+        with timed('save', times):
+            dump_atomic(model, model_path)
+            dump_atomic(encoders, encoders_path)
+            if append:
+                append_rows(data_path, new_raw)
+        print(f"\n🎉 Updated {model_path} ({len(new_raw)} new rows, +{n_trees} trees per forest)")
+    return model, encoders, results, gap
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update a trained model with newly collected rows.")
+    parser.add_argument('kind', choices=list(SPECS))
+    parser.add_argument('new_rows', help="CSV of new labeled rows, same columns as the dataset")
+    parser.add_argument('--data', help="dataset CSV the model was trained on (new rows are appended)")
+    parser.add_argument('--model', help="model pickle to update in place")
+    parser.add_argument('--encoders', help="label encoder pickle to extend in place")
+    parser.add_argument('--trees', type=int, default=DEFAULT_EXTRA_TREES,
+                        help="extra trees per forest, trained on recent rows")
+    parser.add_argument('--recent', type=int, default=DEFAULT_RECENT_ROWS,
+                        help="latest existing rows trained on together with the new ones")
+    parser.add_argument('--holdout', type=float, default=DEFAULT_HOLDOUT,
+                        help="share of new rows held out for the accuracy report")
+    parser.add_argument('--compare', action='store_true', help="also run a full retrain and compare")
+    parser.add_argument('--rebuild-gap', type=float, default=DEFAULT_REBUILD_GAP,
+                        help="accuracy gap to a full retrain above which a rebuild is recommended")
+    parser.add_argument('--n-jobs', type=int, default=None, help="worker budget for the full retrain")
+    parser.add_argument('--dry-run', action='store_true', help="report only; save nothing")
+    parser.add_argument('--no-append', action='store_true', help="do not append the rows to the dataset CSV")
+    parser.add_argument('--seed', type=int, default=None, help="random seed of the extra trees")
+    args = parser.parse_args(argv)
+
+    times = {}
+    run_update(args.kind, args.new_rows, args.data, args.model, args.encoders, args.trees, args.recent,
+               args.holdout, args.compare, args.n_jobs, not args.dry_run, not args.no_append,
+               args.rebuild_gap, args.seed, times)
+    print_stage_times(times)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import itertools
+import queue
+import threading
+
+# Background inference for the GUI.
+#
+# Jobs run one at a time on a daemon thread, in submission order; their results go to
+# a queue that the Tk thread drains with poll() from a root.after loop, so no widget is
+# ever touched off the main thread. numpy, libsvm and the sklearn tree code release the
+# GIL for their heavy loops, and the interpreter switches threads every few ms
+# otherwise, so the window keeps redrawing and accepting input while a model computes.
+#
+# policy='queue' delivers every job; policy='cancel' makes each new submission cancel
+# whatever is still queued or running (a running model call cannot be interrupted, its
+# result is simply dropped). cancel_pending() does the same on demand.
+
+POLICIES = ('queue', 'cancel')
+
+
+class InferenceWorker:
+    def __init__(self, policy='queue'):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}")
+        self.policy = policy
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._ids = itertools.count(1)
+        self._cancelled_before = 0   # jobs with a lower id are dropped
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name='agro-inference', daemon=True)
+        self._thread.start()
+
+    def submit(self, compute, deliver):
+        # compute() runs on the worker thread; deliver(result) runs inside poll()
+        with self._lock:
+            job_id = next(self._ids)
+            if self.policy == 'cancel':
+                self._cancel_locked(job_id)
+            self._pending.add(job_id)
+        self._jobs.put((job_id, compute, deliver))
+        return job_id
+
+    def cancel_pending(self):
+        with self._lock:
+            return self._cancel_locked(next(self._ids))
+
+    def _cancel_locked(self, below):
+        cancelled = len(self._pending)
+        self._cancelled_before = below
+        self._pending.clear()
+        return cancelled
+
+    def pending(self):
+        # Jobs submitted but not yet delivered (queued, running or awaiting poll)
+        with self._lock:
+            return len(self._pending)
+
+    def _loop(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            job_id, compute, deliver = job
+            if job_id < self._cancelled_before:
+                continue
+            try:
+                result, error = compute(), None
+            except Exception as e:
+                result, error = None, e
+            self._results.put((job_id, deliver, result, error))
+
+    def poll(self):
+        # Deliver finished results on the calling (Tk) thread; returns how many were delivered
+        delivered = 0
+        while True:
+            try:
+                job_id, deliver, result, error = self._results.get_nowait()
+            except queue.Empty:
+                return delivered
+            with self._lock:
+                if job_id < self._cancelled_before:
+                    continue
+                self._pending.discard(job_id)
+            if error is not None:
+                raise error
+            deliver(result)
+            delivered += 1
+
+    def shutdown(self, timeout=None):
+        self.cancel_pending()
+        self._jobs.put(None)
+        self._thread.join(timeout)
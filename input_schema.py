@@ -0,0 +1,196 @@
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+# Declarative schema for the numeric model inputs.
+#
+# Each feature gets a dtype, a valid [min, max] range and its training range. The
+# valid range is the physical LIMITS of the quantity (Rainfall can never go negative,
+# Humidity never past 100 %, pH never past 14; None = unbounded): only values outside
+# it are impossible and rejected. [train_min, train_max] is what the training CSV
+# covers; readings outside it but within the limits are plausible and scored, with
+# a warning that the models are extrapolating (see outside_training).
+#
+# The schema lives in input_schema.json next to this file (regenerate it with
+# `python input_schema.py build` after retraining on new data) and is derived from
+# the CSVs on the fly when the file is missing.
+#
+# validate() checks whole columns at once. Non-numeric or missing cells are always
+# errors; cells outside the limits are errors under the 'reject' policy and pulled to
+# the nearest limit under 'clamp'. Soil_Type/Crop are not in the schema: the categorical
+# codec validates those.
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'input_schema.json')
+POLICIES = ('reject', 'clamp')
+
+SOURCES = {
+    'crop': ('sensor_Crop_Dataset.csv', ['Nitrogen', 'Phosphorus', 'Potassium', 'Temperature',
+                                         'Humidity', 'pH_Value', 'Rainfall']),
+    'fertilizer': ('data_core.csv', ['Temperature', 'Humidity', 'Moisture',
+                                     'Nitrogen', 'Potassium', 'Phosphorus']),
+}
+
+# Bounds no reading can leave, whatever the training data says (None = unbounded)
+LIMITS = {
+    'Nitrogen': (0, None),
+    'Phosphorus': (0, None),
+    'Potassium': (0, None),
+    'Temperature': (-50, 60),
+    'Humidity': (0, 100),
+    'Moisture': (0, 100),
+    'pH_Value': (0, 14),
+    'Rainfall': (0, None),
+}
+
+
+# ================= DERIVE =================
+
+def derive_schema(kind, path=None):
+    path, columns = path or SOURCES[kind][0], SOURCES[kind][1]
+    data = pd.read_csv(path, usecols=columns)
+    schema = {}
+    for col in columns:
+        values = data[col]
+        is_int = pd.api.types.is_integer_dtype(values)
+        # Round outwards: whole numbers for int columns, two decimals otherwise
+        scale = 1 if is_int else 100
+        low, high = LIMITS.get(col, (None, None))
+        schema[col] = {
+            'dtype': 'int' if is_int else 'float',
+            'min': low,
+            'max': high,
+            'train_min': math.floor(float(values.min()) * scale) / scale,
+            'train_max': math.ceil(float(values.max()) * scale) / scale,
+        }
+        if is_int:
+            schema[col]['train_min'] = int(schema[col]['train_min'])
+            schema[col]['train_max'] = int(schema[col]['train_max'])
+    return schema
+
+
+def build_schemas(path=SCHEMA_FILE):
+    schemas = {kind: derive_schema(kind) for kind in SOURCES}
+    with open(path + '.tmp', 'w') as f:
+        json.dump(schemas, f, indent=2)
+        f.write('\n')
+    os.replace(path + '.tmp', path)
+    return schemas
+
+
+def load_schema(kind, path=SCHEMA_FILE):
+    if not os.path.exists(path):
+        return derive_schema(kind)
+    with open(path) as f:
+        return json.load(f)[kind]
+
+
+# ================= VALIDATE =================
+
+def validate(frame, schema, policy='reject'):
+    # (X, errors): X holds the coerced schema columns with every bad cell set to NaN,
+    # errors is a boolean frame of the same shape; errors.any(axis=1) is the row mask
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy!r}; expected one of {', '.join(POLICIES)}")
+    X = pd.DataFrame(index=frame.index)
+    errors = pd.DataFrame(index=frame.index)
+    for col, field in schema.items():
+        if col not in frame.columns:
+            values = np.full(len(frame), np.nan)
+        else:
+            values = pd.to_numeric(frame[col], errors='coerce').astype('float64').to_numpy()
+        bad = ~np.isfinite(values)
+        if field['dtype'] == 'int':
+            values = np.trunc(values)
+        low, high = _bounds(field)
+        if policy == 'clamp':
+            values = np.clip(values, low, high)
+        else:
+            bad |= (values < low) | (values > high)
+        X[col] = np.where(bad, np.nan, values)
+        errors[col] = bad
+    return X, errors
+
+
+def _bounds(field):
+    low, high = field['min'], field['max']
+    return -np.inf if low is None else low, np.inf if high is None else high
+
+
+def outside_training(X, schema):
+    # Boolean frame of the valid cells of X (as returned by validate) that lie outside
+    # the training range: scored, but the models are extrapolating there
+    flags = pd.DataFrame(index=X.index)
+    for col, field in schema.items():
+        values = X[col].to_numpy(dtype='float64')
+        flags[col] = (values < field['train_min']) | (values > field['train_max'])
+    return flags
+
+
+def describe_errors(errors):
+    # One "col, col" string per row naming its bad columns ('' for clean rows)
+    text = pd.Series('', index=errors.index, dtype=object)
+    for col in errors.columns:
+        mask = errors[col].to_numpy()
+        text[mask] = text[mask] + (col + ', ')
+    return text.str[:-2]
+
+
+def _range_text(low, high):
+    if low is None and high is None:
+        return "a number"
+    if high is None:
+        return f"a number of at least {low:g}"
+    if low is None:
+        return f"a number of at most {high:g}"
+    return f"a number between {low:g} and {high:g}"
+
+
+def range_message(schema, col, value):
+    field = schema[col]
+    return f"{col} must be {_range_text(field['min'], field['max'])} (got {value!r})"
+
+
+def training_range_message(schema, col, value):
+    field = schema[col]
+    return (f"{col} {value:g} is outside the training data ({field['train_min']:g} to "
+            f"{field['train_max']:g}); the recommendation may be less reliable")
+
+
+# ================= CLI =================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or check the input schema of the Agro Aid models.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('build', help="derive the schema from the training CSVs and write input_schema.json")
+    check = sub.add_parser('check', help="count the rows of a CSV that break the schema")
+    check.add_argument('kind', choices=list(SOURCES))
+    check.add_argument('input')
+    check.add_argument('--policy', choices=POLICIES, default='reject')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        for kind, schema in build_schemas().items():
+            print(f"✅ {kind}: " + ", ".join(f"{c} [{f['train_min']:g}, {f['train_max']:g}]"
+                                            for c, f in schema.items()))
+        return
+
+    schema = load_schema(args.kind)
+    X, errors = validate(pd.read_csv(args.input), schema, args.policy)
+    outside = outside_training(X, schema)
+    for col in errors.columns:
+        if errors[col].any():
+            print(f"❌ {col}: {int(errors[col].sum())} bad values (must be "
+                  f"{_range_text(schema[col]['min'], schema[col]['max'])})")
+        if outside[col].any():
+            print(f"⚠️ {col}: {int(outside[col].sum())} values outside the training data "
+                  f"({schema[col]['train_min']:g} to {schema[col]['train_max']:g})")
+    print(f"✅ {len(errors)} rows checked, {int(errors.any(axis=1).sum())} rows invalid, "
+          f"{int(outside.any(axis=1).sum())} rows outside the training data")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,375 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import joblib
+import numpy as np
+
+from forest_engine import ForestEngine, pack_trees
+
+# Flat, memory-mappable model artifacts.
+#
+# Every node array of every tree and every SVC support-vector matrix is written as its
+# own .npy file and opened again with np.load(mmap_mode='r'). Worker processes on one
+# host then share the same read-only page-cache pages instead of each holding a private
+# unpickled copy, and loading is just reading a small manifest plus mapping the files.
+#
+# Layout of an artifact directory:
+#   manifest.json              model structure, class labels and array file names
+#   <node>.<field>.npy         flat arrays referenced from the manifest
+
+ARTIFACT_DIR = 'model_artifacts'
+FORMAT_VERSION = 2
+
+SVC_BLOCK_ROWS = 512
+
+
+# ================= PACKED ESTIMATORS =================
+# Minimal inference-only stand-ins with the same predict / predict_proba / classes_
+# surface that agro_core uses on the sklearn objects. Forests and decision trees are
+# served by forest_engine.ForestEngine directly on the mapped arrays.
+
+def _as_matrix(X, feature_names):
+    if feature_names is not None and hasattr(X, 'columns'):
+        X = X[feature_names]
+    return np.asarray(X, dtype=np.float64)
+
+
+def _sigmoid_predict(f, A, B):
+    # libsvm's numerically stable 1 / (1 + exp(f * A + B))
+    fApB = f * A + B
+    out = np.empty_like(fApB)
+    pos = fApB >= 0
+    e = np.exp(-fApB[pos])
+    out[pos] = e / (1.0 + e)
+    out[~pos] = 1.0 / (1.0 + np.exp(fApB[~pos]))
+    return out
+
+
+def _multiclass_probability(r):
+    # Vectorised port of libsvm multiclass_probability (Wu, Lin & Weng, method 2).
+    # r: (n, k, k) pairwise probabilities; returns (n, k) class probabilities.
+    n, k, _ = r.shape
+    Q = -r.transpose(0, 2, 1) * r
+    diag = np.einsum('nji,nji->ni', r, r) - np.einsum('nii,nii->ni', r, r)
+    idx = np.arange(k)
+    Q[:, idx, idx] = diag
+    p = np.full((n, k), 1.0 / k)
+    eps = 0.005 / k
+    active = np.ones(n, dtype=bool)
+    for _ in range(max(100, k)):
+        Qp = np.einsum('nij,nj->ni', Q, p)
+        pQp = np.einsum('ni,ni->n', p, Qp)
+        max_error = np.abs(Qp - pQp[:, None]).max(axis=1)
+        active &= max_error >= eps
+        if not active.any():
+            break
+        a = active
+        for t in range(k):
+            diff = (-Qp[a, t] + pQp[a]) / Q[a, t, t]
+            p[a, t] += diff
+            pQp[a] = (pQp[a] + diff * (diff * Q[a, t, t] + 2 * Qp[a, t])) / (1 + diff) / (1 + diff)
+            Qp[a] = (Qp[a] + diff[:, None] * Q[a, t, :]) / (1 + diff[:, None])
+            p[a] /= (1 + diff[:, None])
+    return p
+
+
+class PackedSVC:
+    # Probability outputs of a fitted SVC(probability=True): one-vs-one decision values,
+    # Platt sigmoids, then libsvm's pairwise coupling.
+    def __init__(self, support_vectors, dual_coef, intercept, n_support, prob_a, prob_b,
+                 kernel, gamma, classes, feature_names=None):
+        self.support_vectors = support_vectors
+        self.dual_coef = dual_coef
+        self.intercept = intercept
+        self.n_support = n_support
+        self.prob_a = prob_a
+        self.prob_b = prob_b
+        self.kernel = kernel
+        self.gamma = gamma
+        self.classes_ = classes
+        self.feature_names_in_ = feature_names
+        self._sv_sq = None
+
+    def _kernel(self, X):
+        if self.kernel == 'linear':
+            return X @ self.support_vectors.T
+        if self._sv_sq is None:
+            self._sv_sq = np.einsum('ij,ij->i', self.support_vectors, self.support_vectors)
+        sq = np.einsum('ij,ij->i', X, X)[:, None] + self._sv_sq[None, :] - 2.0 * (X @ self.support_vectors.T)
+        return np.exp(-self.gamma * np.maximum(sq, 0.0))
+
+    def _decision_values(self, X):
+        K = self._kernel(X)
+        start = np.concatenate([[0], np.cumsum(self.n_support)])
+        k = len(self.n_support)
+        dec = np.empty((len(X), k * (k - 1) // 2))
+        p = 0
+        for i in range(k):
+            for j in range(i + 1, k):
+                si, sj = slice(start[i], start[i + 1]), slice(start[j], start[j + 1])
+                dec[:, p] = (K[:, si] @ self.dual_coef[j - 1, si] +
+                             K[:, sj] @ self.dual_coef[i, sj] + self.intercept[p])
+                p += 1
+        return dec
+
+    def predict_proba(self, X):
+        X = _as_matrix(X, self.feature_names_in_)
+        k = len(self.n_support)
+        min_prob = 1e-7
+        out = np.empty((len(X), k))
+        # Kernel rows are built block by block so a large batch never materialises
+        # an (n_rows x n_support_vectors) matrix in one go
+        for lo in range(0, len(X), SVC_BLOCK_ROWS):
+            block = X[lo:lo + SVC_BLOCK_ROWS]
+            pairwise = _sigmoid_predict(self._decision_values(block), self.prob_a, self.prob_b)
+            pairwise = np.clip(pairwise, min_prob, 1 - min_prob)
+            if k == 2:
+                out[lo:lo + len(block), 0] = pairwise[:, 0]
+                out[lo:lo + len(block), 1] = 1 - pairwise[:, 0]
+                continue
+            r = np.zeros((len(block), k, k))
+            p = 0
+            for i in range(k):
+                for j in range(i + 1, k):
+                    r[:, i, j] = pairwise[:, p]
+                    r[:, j, i] = 1 - pairwise[:, p]
+                    p += 1
+            out[lo:lo + len(block)] = _multiclass_probability(r)
+        return out
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+class PackedVoting:
+    # Soft VotingClassifier: weighted mean of member probabilities
+    def __init__(self, members, weights, classes):
+        self.estimators_ = members
+        self.weights = weights
+        self.classes_ = classes
+
+    def predict_proba(self, X):
+        return np.average([m.predict_proba(X) for m in self.estimators_], axis=0, weights=self.weights)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+class PackedMultiOutput:
+    def __init__(self, estimators):
+        self.estimators_ = estimators
+
+    def predict_proba(self, X):
+        return [e.predict_proba(X) for e in self.estimators_]
+
+    def predict(self, X):
+        return np.asarray([e.predict(X) for e in self.estimators_]).T
+
+
+# ================= EXPORT =================
+
+def _feature_names(estimator):
+    names = getattr(estimator, 'feature_names_in_', None)
+    return None if names is None else [str(n) for n in names]
+
+
+class _Writer:
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+
+    def array(self, prefix, field, arr):
+        name = f"{prefix}.{field}.npy"
+        np.save(os.path.join(self.out_dir, name), np.ascontiguousarray(arr))
+        return name
+
+
+def _svc_prob_params(svc):
+    # probA_/probB_ are deprecated public aliases in recent sklearn; prefer the private fields
+    prob_a = getattr(svc, '_probA', None)
+    prob_b = getattr(svc, '_probB', None)
+    if prob_a is None:
+        prob_a, prob_b = svc.probA_, svc.probB_
+    return prob_a, prob_b
+
+
+def _export_estimator(writer, prefix, est):
+    from sklearn.ensemble import RandomForestClassifier, VotingClassifier
+    from sklearn.multioutput import MultiOutputClassifier
+    from sklearn.svm import SVC
+    from sklearn.tree import DecisionTreeClassifier
+
+    if isinstance(est, MultiOutputClassifier):
+        return {'type': 'multioutput',
+                'estimators': [_export_estimator(writer, f"{prefix}.{i}", e)
+                               for i, e in enumerate(est.estimators_)]}
+
+    if isinstance(est, VotingClassifier) and est.voting == 'soft':
+        return {'type': 'voting',
+                'classes': est.classes_.tolist(),
+                'weights': None if est.weights is None else list(est.weights),
+                'members': [_export_estimator(writer, f"{prefix}.{name}", member)
+                            for (name, _), member in zip(est.estimators, est.estimators_)]}
+
+    if isinstance(est, ForestEngine) and est.estimator is not None:
+        est = est.estimator
+
+    if isinstance(est, (RandomForestClassifier, DecisionTreeClassifier)) and est.n_outputs_ == 1:
+        trees = est.estimators_ if isinstance(est, RandomForestClassifier) else [est]
+        packed = pack_trees(trees, est.n_classes_)
+        node = {'type': 'forest',
+                'classes': est.classes_.tolist(),
+                'feature_names': _feature_names(est),
+                'max_depth': packed.pop('max_depth')}
+        node.update({field: writer.array(prefix, field, arr) for field, arr in packed.items()})
+        return node
+
+    if (isinstance(est, SVC) and est.probability and est.kernel in ('rbf', 'linear')
+            and len(est.classes_) > 1):
+        prob_a, prob_b = _svc_prob_params(est)
+        return {'type': 'svc',
+                'classes': est.classes_.tolist(),
+                'feature_names': _feature_names(est),
+                'kernel': est.kernel,
+                'gamma': float(est._gamma),
+                'support_vectors': writer.array(prefix, 'support_vectors', est.support_vectors_),
+                'dual_coef': writer.array(prefix, 'dual_coef', est._dual_coef_),
+                'intercept': writer.array(prefix, 'intercept', est._intercept_),
+                'n_support': writer.array(prefix, 'n_support', est.n_support_.astype(np.int64)),
+                'prob_a': writer.array(prefix, 'prob_a', prob_a),
+                'prob_b': writer.array(prefix, 'prob_b', prob_b)}
+
+    # Anything we do not know how to flatten is kept as an ordinary pickle
+    name = f"{prefix}.pkl"
+    joblib.dump(est, os.path.join(writer.out_dir, name))
+    return {'type': 'pickle', 'file': name}
+
+
+def source_signature(path):
+    # Size and mtime of the pickle an artifact was exported from, used to spot stale exports
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def export_model(model, out_dir, source=None):
+    # Write into a temporary directory and swap it in, so readers never see half an export
+    tmp_dir = out_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    root = _export_estimator(_Writer(tmp_dir), 'model', model)
+    manifest = {'format_version': FORMAT_VERSION,
+                'source': None if source is None else source_signature(source),
+                'model': root}
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+
+
+# ================= LOAD =================
+
+def _load_estimator(art_dir, node, mmap_mode):
+    def arr(key):
+        return np.load(os.path.join(art_dir, node[key]), mmap_mode=mmap_mode)
+
+    kind = node['type']
+    if kind == 'multioutput':
+        return PackedMultiOutput([_load_estimator(art_dir, e, mmap_mode) for e in node['estimators']])
+    if kind == 'voting':
+        return PackedVoting([_load_estimator(art_dir, m, mmap_mode) for m in node['members']],
+                            node['weights'], np.asarray(node['classes']))
+    if kind == 'forest':
+        return ForestEngine(arr('feature'), arr('threshold'), arr('children'), arr('value'),
+                            np.asarray(arr('roots')), node['max_depth'], node['classes'],
+                            node['feature_names'])
+    if kind == 'svc':
+        return PackedSVC(arr('support_vectors'), arr('dual_coef'), arr('intercept'),
+                         np.asarray(arr('n_support')), arr('prob_a'), arr('prob_b'),
+                         node['kernel'], node['gamma'], np.asarray(node['classes']),
+                         node['feature_names'])
+    if kind == 'pickle':
+        return joblib.load(os.path.join(art_dir, node['file']))
+    raise ValueError(f"Unknown artifact node type {kind!r}")
+
+
+def _read_manifest(art_dir):
+    with open(os.path.join(art_dir, 'manifest.json')) as f:
+        return json.load(f)
+
+
+def is_fresh(art_dir, source):
+    # True when art_dir holds an export of the current version of the source pickle
+    try:
+        manifest = _read_manifest(art_dir)
+    except (OSError, ValueError):
+        return False
+    return (manifest.get('format_version') == FORMAT_VERSION and
+            os.path.exists(source) and manifest.get('source') == source_signature(source))
+
+
+def load_model(art_dir, mmap_mode='r'):
+    manifest = _read_manifest(art_dir)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format in {art_dir}: {manifest.get('format_version')}")
+    return _load_estimator(art_dir, manifest['model'], mmap_mode)
+
+
+def artifact_path(name, base_dir=ARTIFACT_DIR):
+    return os.path.join(base_dir, name)
+
+
+# ================= CLI =================
+
+def _sample_inputs(name, n):
+    import pandas as pd
+    import agro_core
+
+    if name == 'crop_model':
+        return agro_core.crop_frame(pd.read_csv('sensor_Crop_Dataset.csv', nrows=n))
+    X, valid = agro_core.encode_fertilizer_frame(pd.read_csv('data_core.csv', nrows=n))
+    return X[valid].astype('int64')
+
+
+def _probas(model, X):
+    proba = model.predict_proba(X)
+    return proba if isinstance(proba, list) else [proba]
+
+
+def main(argv=None):
+    import agro_core
+
+    parser = argparse.ArgumentParser(description="Export or check memory-mappable model artifacts.")
+    parser.add_argument('command', choices=['export', 'verify'])
+    parser.add_argument('--out', default=ARTIFACT_DIR)
+    parser.add_argument('--rows', type=int, default=500, help="rows used by verify")
+    args = parser.parse_args(argv)
+
+    for name in ('crop_model', 'fertilizer_model'):
+        path = artifact_path(name, args.out)
+        if args.command == 'export':
+            start = time.perf_counter()
+            model = joblib.load(agro_core.model_path(name))
+            export_model(model, path, source=agro_core.model_path(name))
+            print(f"✅ Exported {name} to {path} in {time.perf_counter() - start:.2f}s")
+            continue
+
+        start = time.perf_counter()
+        packed = load_model(path)
+        load_s = time.perf_counter() - start
+        if not is_fresh(path, agro_core.model_path(name)):
+            print(f"⚠️ {path} is older than {agro_core.model_path(name)}; run export again")
+        start = time.perf_counter()
+        original = joblib.load(agro_core.model_path(name))
+        unpickle_s = time.perf_counter() - start
+
+        X = _sample_inputs(name, args.rows)
+        diff = max(float(np.abs(a - b).max())
+                   for a, b in zip(_probas(original, X), _probas(packed, X)))
+        print(f"📊 {name}: mmap load {load_s:.3f}s vs unpickle {unpickle_s:.3f}s, "
+              f"max |Δproba| on {len(X)} rows = {diff:.2e}")
+
+
+if __name__ == '__main__':
+    main()
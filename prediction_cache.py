@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Bounded LRU cache for model outputs, keyed on the normalised, encoded feature vector.
+#
+# Entries expire after `ttl` seconds (None = never) and the least recently used entry is
+# evicted once `maxsize` is reached. The cache watches a set of source files (the model
+# pickles) and drops everything as soon as one of them changes, calling `on_invalidate`
+# so the owner can reload its models too. File checks are rate-limited to one round of
+# os.stat calls per `check_interval` seconds.
+
+
+class PredictionCache:
+    def __init__(self, maxsize=4096, ttl=None, sources=(), on_invalidate=None,
+                 check_interval=1.0, clock=time.monotonic):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sources = list(sources)
+        self.on_invalidate = on_invalidate
+        self.check_interval = check_interval
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._signature = self._source_signature()
+        self._next_check = clock() + check_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _source_signature(self):
+        sig = []
+        for path in self.sources:
+            try:
+                st = os.stat(path)
+                sig.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append((path, None, None))
+        return tuple(sig)
+
+    def check_sources(self, force=False):
+        # Clear the cache if any watched file changed since the last check
+        now = self._clock()
+        if not force and now < self._next_check:
+            return False
+        self._next_check = now + self.check_interval
+        signature = self._source_signature()
+        if signature == self._signature:
+            return False
+        with self._lock:
+            self._signature = signature
+            self._entries.clear()
+            self.invalidations += 1
+        if self.on_invalidate:
+            self.on_invalidate()
+        return True
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if expires is not None and self._clock() >= expires:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        expires = None if self.ttl is None else self._clock() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
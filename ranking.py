@@ -0,0 +1,68 @@
+import numpy as np
+
+# Ranked top-k recommendations from probability matrices.
+#
+# top_k selects each row's k best classes with np.argpartition (linear in the number
+# of classes) and only sorts those k, so ranking a large batch never sorts whole rows.
+#
+# joint_top_k ranks combinations of several outputs, e.g. (Crop, Soil_Type, Variety).
+# The crop outputs come from independent classifiers, so a combination scores the
+# product of its marginal probabilities. Two ways to get the candidates:
+#   - every combination: a combination in the joint top k can only use classes from
+#     each output's own top k, so k**n_outputs candidates per row cover it instead of
+#     the full product of class counts
+#   - an allowed list (e.g. the combinations seen in training: varieties belong to one
+#     crop): scored as one (rows, combinations) product, and renormalized over the
+#     list so the probabilities are conditional on the combination being valid
+
+
+def top_k(proba, k=3):
+    # (indices, probabilities), both (n, k), best first
+    proba = np.asarray(proba)
+    k = min(k, proba.shape[1])
+    if k < proba.shape[1]:
+        part = np.argpartition(-proba, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(k), (len(proba), k))
+    top = np.take_along_axis(proba, part, axis=1)
+    order = np.argsort(-top, axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+
+def ranked_labels(class_names, proba, k=3):
+    index, top = top_k(proba, k)
+    return np.asarray(class_names, dtype=object)[index], top
+
+
+def joint_top_k(probas, k=3, combinations=None):
+    # probas: one (n, C_i) matrix per output; combinations: optional (m, n_outputs)
+    # array of allowed class indices. Returns (codes (n, k, n_outputs), probabilities (n, k))
+    n = len(probas[0])
+    if combinations is None:
+        picks = [top_k(p, k) for p in probas]
+        codes = np.zeros((n, 1, 0), dtype=np.intp)
+        scores = np.ones((n, 1))
+        # Grow the candidate set one output at a time: every kept code times every pick
+        for index, top in picks:
+            width = index.shape[1]
+            codes = np.concatenate([np.repeat(codes, width, axis=1),
+                                    np.tile(index, (1, codes.shape[1]))[:, :, None]], axis=2)
+            scores = (scores[:, :, None] * top[:, None, :]).reshape(n, -1)
+        best, top = top_k(scores, k)
+        return np.take_along_axis(codes, best[:, :, None], axis=1), top
+
+    combinations = np.asarray(combinations, dtype=np.intp)
+    scores = np.ones((n, len(combinations)))
+    for i, p in enumerate(probas):
+        scores *= np.asarray(p)[:, combinations[:, i]]
+    total = scores.sum(axis=1, keepdims=True)
+    scores /= np.where(total > 0, total, 1.0)
+    best, top = top_k(scores, k)
+    return combinations[best], top
+
+
+def combination_codes(combinations, class_names):
+    # Label tuples -> class index tuples, dropping combinations a model cannot predict
+    lookup = [{name: i for i, name in enumerate(names)} for names in class_names]
+    codes = [[table.get(label) for table, label in zip(lookup, combo)] for combo in combinations]
+    return np.array([c for c in codes if None not in c], dtype=np.intp).reshape(-1, len(class_names))
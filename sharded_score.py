@@ -0,0 +1,210 @@
+import io
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import agro_core
+from batch_score import DEFAULT_CHUNKSIZE, score_stream
+
+# Sharded, resumable scoring of large CSV files on a process pool.
+#
+# The input is cut into byte ranges of about shard_bytes aligned to line boundaries
+# (rows must not contain quoted newlines, which holds for the sensor exports). Each
+# worker process loads the models once, scores whole shards with
+# batch_score.score_stream and writes each result to <output>.shards/shard-NNNNN.csv
+# through a temp file + os.replace, followed by a .done marker holding the row count
+# and the codec corrections of the shard. Rerunning after a crash skips every shard
+# that has a marker; the shards are then concatenated in byte order, so the output
+# rows keep the input order, and their corrections are merged for the report.
+#
+# The layout depends on the input and shard_bytes only, never on the worker count,
+# so a rerun with a different --workers still resumes the finished shards.
+
+DEFAULT_SHARD_BYTES = 64 * 1024 * 1024
+MANIFEST = 'manifest.json'
+
+
+# ================= PLANNING =================
+
+def plan_shards(path, shard_bytes=DEFAULT_SHARD_BYTES):
+    # Returns (header_bytes, [(start, end), ...]) with every range ending on a newline
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        n_shards = max(-(-(size - data_start) // shard_bytes), 1)
+        step = max(1, (size - data_start) // n_shards)
+
+        bounds = [data_start]
+        for i in range(1, n_shards):
+            target = data_start + i * step
+            if target <= bounds[-1]:
+                continue
+            f.seek(target - 1)
+            f.readline()  # finish the row that straddles the cut
+            if f.tell() >= size:
+                break
+            if f.tell() > bounds[-1]:
+                bounds.append(f.tell())
+        bounds.append(size)
+    shards = [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+    return header, shards
+
+
+def _shard_path(work_dir, i):
+    return os.path.join(work_dir, f'shard-{i:05d}.csv')
+
+
+def _load_or_create_manifest(work_dir, manifest):
+    # Reuse finished shards only when they came from the same input and settings
+    path = os.path.join(work_dir, MANIFEST)
+    if os.path.exists(path):
+        with open(path) as f:
+            if json.load(f) == manifest:
+                return True
+        shutil.rmtree(work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(path + '.tmp', path)
+    return False
+
+
+def _read_done(work_dir, i):
+    # (rows, corrections) of a finished shard, or None
+    try:
+        with open(_shard_path(work_dir, i) + '.done') as f:
+            done = json.load(f)
+        return int(done['rows']), done['corrections']
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _merge_corrections(corrections, shard_corrections):
+    for col, fixed in shard_corrections.items():
+        corrections.setdefault(col, {}).update({value: tuple(match) for value, match in fixed.items()})
+
+
+# ================= WORKERS =================
+
+def _init_worker(kind):
+    # Load the models once per process instead of once per shard
+    if kind == 'crop':
+        agro_core.crop_model()
+    else:
+        agro_core.fertilizer_model()
+        agro_core.fertilizer_label_encoders()
+
+
+def _score_shard(kind, path, header, start, end, out_path, chunksize, keep_inputs, invalid, explain,
+                 top_k):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    reader = io.BytesIO(header + data)
+
+    tmp_path = out_path + '.tmp'
+    corrections = {}
+    with open(tmp_path, 'w', newline='') as writer:
+        rows = score_stream(kind, reader, writer, chunksize, keep_inputs, corrections=corrections,
+                            invalid=invalid, explain=explain, top_k=top_k)
+    os.replace(tmp_path, out_path)
+    with open(out_path + '.done.tmp', 'w') as f:
+        json.dump({'rows': rows, 'corrections': {
+            col: {str(value): [str(name), float(confidence)] for value, (name, confidence) in fixed.items()}
+            for col, fixed in corrections.items()}}, f)
+    os.replace(out_path + '.done.tmp', out_path + '.done')
+    return rows, corrections
+
+
+# ================= DRIVER =================
+
+def _merge(shard_paths, output):
+    # Header comes from the first non-empty shard; later shards skip theirs
+    tmp_path = output + '.tmp'
+    wrote_header = False
+    with open(tmp_path, 'wb') as out:
+        for path in shard_paths:
+            with open(path, 'rb') as f:
+                header = f.readline()
+                if not header:
+                    continue
+                if not wrote_header:
+                    out.write(header)
+                    wrote_header = True
+                shutil.copyfileobj(f, out, 1024 * 1024)
+    os.replace(tmp_path, output)
+
+
+def score_file(kind, path, output, workers=None, shard_bytes=DEFAULT_SHARD_BYTES,
+               chunksize=DEFAULT_CHUNKSIZE, keep_inputs=True, keep_shards=False, progress=None,
+               invalid='flag', explain=0, top_k=0, corrections=None):
+    # corrections, when given, collects the codec corrections of every shard, as in score_stream
+    workers = workers or os.cpu_count() or 1
+    header, shards = plan_shards(path, shard_bytes)
+    work_dir = output + '.shards'
+    st = os.stat(path)
+    manifest = {
+        'kind': kind,
+        'input': os.path.abspath(path),
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'shard_bytes': shard_bytes,
+        'shards': [list(shard) for shard in shards],
+        'chunksize': chunksize,
+        'keep_inputs': keep_inputs,
+        'invalid': invalid,
+        'explain': explain,
+        'top_k': top_k,
+    }
+    _load_or_create_manifest(work_dir, manifest)
+
+    rows_done = 0
+    pending = []
+    shard_corrections = {}
+    for i in range(len(shards)):
+        done = _read_done(work_dir, i)
+        if done is None:
+            pending.append(i)
+        else:
+            rows_done += done[0]
+            shard_corrections[i] = done[1]
+    resumed = len(shards) - len(pending)
+    if progress:
+        progress(len(shards) - len(pending), len(shards), rows_done, resumed)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)),
+                                 initializer=_init_worker, initargs=(kind,)) as pool:
+            futures = {pool.submit(_score_shard, kind, path, header, shards[i][0], shards[i][1],
+                                   _shard_path(work_dir, i), chunksize, keep_inputs, invalid, explain,
+                                   top_k): i
+                       for i in pending}
+            finished = resumed
+            for future in as_completed(futures):
+                rows, shard_corrections[futures[future]] = future.result()
+                rows_done += rows
+                finished += 1
+                if progress:
+                    progress(finished, len(shards), rows_done, resumed)
+
+    if corrections is not None:
+        for i in sorted(shard_corrections):
+            _merge_corrections(corrections, shard_corrections[i])
+    _merge([_shard_path(work_dir, i) for i in range(len(shards))], output)
+    if not keep_shards:
+        shutil.rmtree(work_dir)
+    return rows_done
+
+
+def progress_printer(start=None):
+    start = time.perf_counter() if start is None else start
+
+    def progress(finished, total, rows, resumed):
+        elapsed = time.perf_counter() - start
+        note = f", {resumed} resumed" if resumed else ""
+        print(f"⏳ {finished}/{total} shards, {rows} rows ({elapsed:.1f}s{note})", file=sys.stderr)
+    return progress
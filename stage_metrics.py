@@ -0,0 +1,172 @@
+import threading
+import time
+
+# Per-stage timing for the prediction flows.
+#
+# Each `with stage(flow, name):` block records its wall time into a fixed-bucket
+# histogram keyed by (flow, stage); the registry can be dumped as a dict or as
+# Prometheus text exposition. An optional profiling hook wraps every stage as well:
+# set_profile_hook(hook) where hook(flow, stage) returns a context manager. With no
+# hook installed (the default) a stage costs two perf_counter calls and one locked
+# histogram update.
+
+# Upper bounds in seconds; chosen around the observed stage times (µs parsing up to
+# multi-second cold model loads)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        i = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self.max
+
+
+class _StageTimer:
+    __slots__ = ('registry', 'key', 'start', 'hook_cm')
+
+    def __init__(self, registry, key):
+        self.registry = registry
+        self.key = key
+        self.hook_cm = None
+
+    def __enter__(self):
+        hook = self.registry.profile_hook
+        if hook is not None:
+            self.hook_cm = hook(*self.key)
+            self.hook_cm.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.key[0], self.key[1], time.perf_counter() - self.start)
+        if self.hook_cm is not None:
+            self.hook_cm.__exit__(exc_type, exc, tb)
+        return False
+
+
+class StageMetrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self.profile_hook = None
+        self._lock = threading.Lock()
+
+    def stage(self, flow, name):
+        return _StageTimer(self, (flow, name))
+
+    def observe(self, flow, name, seconds):
+        key = (flow, name)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                f'{flow}.{name}': {
+                    'count': h.count,
+                    'sum_s': h.sum,
+                    'mean_ms': h.sum / h.count * 1000 if h.count else 0.0,
+                    'p50_ms': h.quantile(0.5) * 1000,
+                    'p99_ms': h.quantile(0.99) * 1000,
+                    'max_ms': h.max * 1000,
+                }
+                for (flow, name), h in self.histograms.items()
+            }
+
+    def prometheus_text(self, metric='agro_stage_seconds'):
+        lines = [
+            f'# HELP {metric} Wall time spent in each stage of a prediction flow.',
+            f'# TYPE {metric} histogram',
+        ]
+        with self._lock:
+            for (flow, name), h in sorted(self.histograms.items()):
+                labels = f'flow="{flow}",stage="{name}"'
+                cumulative = 0
+                for bound, n in zip(self.buckets, h.counts):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {h.count}')
+                lines.append(f'{metric}_sum{{{labels}}} {h.sum:.9f}')
+                lines.append(f'{metric}_count{{{labels}}} {h.count}')
+        return '\n'.join(lines) + '\n'
+
+
+# ================= PROFILING HOOKS =================
+
+class CProfileHook:
+    # Collects one cProfile.Profile per (flow, stage); install with set_profile_hook
+    def __init__(self):
+        self.profiles = {}
+
+    def __call__(self, flow, name):
+        import cProfile
+
+        profile = self.profiles.get((flow, name))
+        if profile is None:
+            profile = self.profiles[(flow, name)] = cProfile.Profile()
+        return profile
+
+    def print_stats(self, sort='cumulative', limit=15):
+        import pstats
+
+        for (flow, name), profile in sorted(self.profiles.items()):
+            print(f"\n📊 {flow}.{name}")
+            pstats.Stats(profile).sort_stats(sort).print_stats(limit)
+
+
+# Process-wide registry used by the bot and the server
+METRICS = StageMetrics()
+
+
+def stage(flow, name):
+    return METRICS.stage(flow, name)
+
+
+def set_profile_hook(hook):
+    # hook(flow, stage) -> context manager, or None to disable profiling
+    METRICS.profile_hook = hook
+
+
+def snapshot():
+    return METRICS.snapshot()
+
+
+def prometheus_text():
+    return METRICS.prometheus_text()
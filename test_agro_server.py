@@ -0,0 +1,86 @@
+import asyncio
+import json
+import time
+
+import pandas as pd
+
+import agro_core
+from agro_server import AgroServer, score_crop_rows, score_fertilizer_rows
+
+crop_rows = pd.read_csv('sensor_Crop_Dataset.csv', nrows=64)[agro_core.CROP_FEATURES].to_dict('records')
+fert_rows = pd.read_csv('data_core.csv', nrows=64)[agro_core.FERTILIZER_FEATURES].to_dict('records')
+
+
+async def post(port, path, payload):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    body = json.dumps(payload).encode()
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n"
+                 f"Connection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, data = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(data)
+
+
+async def run(max_batch_size):
+    server = AgroServer(port=0, max_batch_size=max_batch_size, max_wait_ms=20)
+    await server.start()
+    try:
+        start = time.perf_counter()
+        responses = await asyncio.gather(
+            *[post(server.port, '/predict/crop', row) for row in crop_rows],
+            *[post(server.port, '/predict/fertilizer', row) for row in fert_rows])
+        elapsed = time.perf_counter() - start
+        bad = await post(server.port, '/predict/crop', [1, 2, 3])
+        return responses, elapsed, {k: b.stats() for k, b in server.batchers.items()}, bad
+    finally:
+        await server.stop()
+
+
+# Concurrent single-row requests are answered exactly as direct scoring would
+expected = score_crop_rows(crop_rows) + score_fertilizer_rows(fert_rows)
+for max_batch_size in (1, 32):
+    responses, elapsed, stats, bad = asyncio.run(run(max_batch_size))
+    assert all(status == 200 for status, _ in responses)
+    assert [payload['predictions'][0] for _, payload in responses] == expected
+    assert bad[0] == 400
+    if max_batch_size > 1:
+        assert stats['crop']['batches'] < len(crop_rows)
+    print(f"max_batch_size={max_batch_size}: {len(responses) / elapsed:.0f} req/s, "
+          f"crop batches={stats['crop']['batches']}, fertilizer batches={stats['fertilizer']['batches']}")
+
+# Malformed request lines and Content-Length headers get a 400 reply, not a dropped connection
+async def raw(port, request):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(request)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+async def malformed():
+    server = AgroServer(port=0)
+    await server.start()
+    try:
+        return [await raw(server.port, request) for request in (
+            b"GARBAGE\r\n",
+            b"POST /predict/crop HTTP/1.1\r\nContent-Length: ten\r\n\r\n{}",
+            b"POST /predict/crop HTTP/1.1\r\nContent-Length: -5\r\n\r\n{}",
+        )]
+    finally:
+        await server.stop()
+
+
+for response in asyncio.run(malformed()):
+    head, _, data = response.partition(b'\r\n\r\n')
+    assert head.startswith(b'HTTP/1.1 400 ') and b'Connection: close' in head
+    assert 'error' in json.loads(data)
+
+# Unknown categories are flagged per row instead of failing the request
+bad_row = dict(fert_rows[0], Crop='NotACrop')
+result = score_fertilizer_rows([bad_row, fert_rows[0]])
+assert not result[0]['valid'] and result[1]['valid']
+
+print('\nTest complete')
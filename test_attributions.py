@@ -0,0 +1,105 @@
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, VotingClassifier
+from sklearn.multioutput import MultiOutputClassifier
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+
+import agro_core
+import compact_model
+import model_artifacts
+from agro_server import score_fertilizer_rows
+from attributions import build_explainer, describe, top_factors
+from batch_score import score_stream
+
+
+def check_exact(explainer, X, expected):
+    proba, bias, contributions, residual = explainer.explain(X)
+    assert np.abs(proba - expected).max() < 1e-9
+    assert np.abs(bias + contributions.sum(axis=1) + residual - proba).max() < 1e-9
+    return proba, bias, contributions, residual
+
+
+# ---------- One tree, checked against a hand walk of its decision path ----------
+crop = pd.read_csv('sensor_Crop_Dataset.csv', nrows=1500)
+X = agro_core.crop_frame(crop)
+y = np.column_stack([pd.factorize(crop[t])[0] for t in agro_core.CROP_TARGETS])
+tree = DecisionTreeClassifier(max_depth=6, random_state=0).fit(X, y[:, 0])
+proba, bias, contributions, _ = check_exact(build_explainer(tree), X[:50], tree.predict_proba(X[:50]))
+t = tree.tree_
+value = t.value[:, 0] / t.value[:, 0].sum(axis=1, keepdims=True)
+path = tree.decision_path(X[:1]).indices
+expected = np.zeros((X.shape[1], value.shape[1]))
+for parent, child in zip(path[:-1], path[1:]):
+    expected[t.feature[parent]] += value[child] - value[parent]
+assert np.allclose(contributions[0], expected) and np.allclose(bias, value[0])
+
+# ---------- Crop-style ensemble: forests explained, the SVC share kept as residual ----------
+voting = VotingClassifier([('rf', RandomForestClassifier(n_estimators=20, random_state=0)),
+                           ('dt', DecisionTreeClassifier(random_state=0)),
+                           ('svc', SVC(probability=True, random_state=0))], voting='soft')
+model = MultiOutputClassifier(voting).fit(X, y)
+X_test = agro_core.crop_frame(pd.read_csv('sensor_Crop_Dataset.csv', skiprows=range(1, 1501), nrows=200))
+explainers = build_explainer(model)
+for explainer, expected in zip(explainers, model.predict_proba(X_test)):
+    proba, bias, contributions, residual = check_exact(explainer, X_test, expected)
+    assert np.allclose(residual.sum(axis=1), 1 / 3)
+assert explainers[0].feature_names == agro_core.CROP_FEATURES
+
+# The memory-mapped export explains to the same numbers
+art_dir = os.path.join(tempfile.mkdtemp(), 'crop')
+model_artifacts.export_model(model, art_dir)
+for a, b in zip(build_explainer(model_artifacts.load_model(art_dir)), explainers):
+    assert np.allclose(a.explain(X_test)[2], b.explain(X_test)[2])
+
+# Compact exports keep leaf values only and say so
+path = os.path.join(tempfile.mkdtemp(), 'tree.agc')
+compact_model.export_compact(RandomForestClassifier(n_estimators=3, random_state=0).fit(X, y[:, 0]), path)
+try:
+    build_explainer(compact_model.load_compact(path))
+    raise AssertionError("compact forest should not be explainable")
+except ValueError as e:
+    assert 'leaf values only' in str(e)
+
+# ---------- The trained fertilizer forest, through agro_core ----------
+fert = pd.read_csv('data_core.csv', nrows=1000)
+fert_X, valid = agro_core.encode_fertilizer_frame(fert)
+fert_X = fert_X[valid]
+names, proba, explanation = agro_core.explain_fertilizer(fert_X)[agro_core.FERTILIZER_TARGET]
+_, expected = agro_core.predict_fertilizer(fert_X)[agro_core.FERTILIZER_TARGET]
+assert np.abs(proba - expected).max() < 1e-9
+assert explanation['features'] == agro_core.FERTILIZER_FEATURES
+
+# Attributions cost a small multiple of walking the same trees for inference
+engine = agro_core._explainer('fertilizer').engine
+matrix = engine._matrix(fert_X.astype('int64'))
+start = time.perf_counter()
+engine.apply(matrix)
+walk = time.perf_counter() - start
+start = time.perf_counter()
+agro_core.explain_fertilizer(fert_X)
+explain = time.perf_counter() - start
+print(f"fertilizer, {len(fert_X)} rows: tree walk {walk * 1000:.0f} ms, attributions {explain * 1000:.0f} ms")
+
+factors = top_factors(explanation, proba.argmax(axis=1), k=2)
+assert len(factors) == len(fert_X) and all(len(f) == 2 for f in factors)
+assert abs(factors[0][0][1]) >= abs(factors[0][1][1])
+assert describe(explanation, proba.argmax(axis=1))[0].endswith('%)')
+
+# ---------- Batch scoring and the HTTP service return them with each prediction ----------
+out = io.StringIO()
+score_stream('fertilizer', io.StringIO(fert.head(5).to_csv(index=False)), out, explain=2)
+scored = pd.read_csv(io.StringIO(out.getvalue()))
+assert scored['Why_FertilizerName'].str.count('pts').eq(2).all()
+
+row = score_fertilizer_rows(fert.head(1).to_dict('records'), explain=True)[0]['FertilizerName']
+parts = row['attributions']
+assert abs(parts['base'] + sum(parts['features'].values()) + parts['non_tree_members']
+           - row['confidence']) < 0.1
+
+print('\nTest complete')
@@ -0,0 +1,162 @@
+import os
+import tempfile
+import textwrap
+import time
+
+import numpy as np
+from joblib.parallel import get_active_backend
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.ensemble import VotingClassifier
+from sklearn.multioutput import MultiOutputClassifier
+
+import agro_core
+import Crop_training_model as crop_training
+import Fertilizer_training_model as fertilizer_training
+from bootstrap import Bootstrap
+from training_utils import Checkpoints, dump_atomic, run_signature
+
+
+def fitted_attributes(estimator):
+    return sorted(k for k in vars(estimator) if k.endswith('_') and not k.startswith('__'))
+
+
+# ---------- Atomic saves and checkpoint signatures ----------
+work = tempfile.mkdtemp()
+dump_atomic({'a': 1}, os.path.join(work, 'model.pkl'))
+assert os.listdir(work) == ['model.pkl']
+
+checkpoints = Checkpoints(os.path.join(work, 'ck'), {'data': '1'})
+checkpoints.save('piece', [1, 2])
+assert Checkpoints(os.path.join(work, 'ck'), {'data': '1'}).load('piece') == [1, 2]
+# Another dataset or configuration starts from scratch
+assert Checkpoints(os.path.join(work, 'ck'), {'data': '2'}).load('piece') is None
+
+# ---------- Fertilizer: checkpointed forest equals one fit, and resumes ----------
+X_train, X_test, y_train, _, _ = fertilizer_training.load_data()
+X_train, y_train = X_train[:2000], y_train[:2000]
+reference = fertilizer_training.build_model().set_params(n_estimators=25).fit(X_train, y_train)
+model = fertilizer_training.build_model().set_params(n_estimators=25)
+checkpoints = Checkpoints(os.path.join(work, 'fert'), run_signature(model, X_train, y_train))
+forest = fertilizer_training.fit_checkpointed(model, X_train, y_train, checkpoints)
+assert len(forest.estimators_) == 25 and not forest.warm_start
+assert fitted_attributes(forest) == fitted_attributes(reference)
+assert np.array_equal(forest.predict_proba(X_test), reference.predict_proba(X_test))
+assert sorted(os.listdir(checkpoints.directory)) == ['manifest.json', 'trees.0.pkl', 'trees.10.pkl',
+                                                     'trees.20.pkl']
+
+# An interrupted run (last batch never saved) only grows the missing trees
+os.remove(checkpoints.path('trees.20'))
+kept = os.stat(checkpoints.path('trees.10')).st_mtime_ns
+model = fertilizer_training.build_model().set_params(n_estimators=25)
+forest = fertilizer_training.fit_checkpointed(
+    model, X_train, y_train, Checkpoints(checkpoints.directory, run_signature(model, X_train, y_train)))
+assert os.stat(checkpoints.path('trees.10')).st_mtime_ns == kept
+assert np.array_equal(forest.predict_proba(X_test), reference.predict_proba(X_test))
+
+# ---------- Crop: parallel member fits equal MultiOutputClassifier.fit ----------
+X_train, X_test, y_train, _, _ = crop_training.load_data()
+X_train, y_train = X_train[:600], y_train[:600]
+params = {'estimator__rf__n_estimators': 10}
+reference = crop_training.build_model().set_params(**params).fit(X_train, y_train)
+model = crop_training.build_model().set_params(**params)
+checkpoints = Checkpoints(os.path.join(work, 'crop'), run_signature(model, X_train, y_train))
+# The (output, member) fits run side by side on a process pool
+crop_training.fit_members(model, X_train, y_train, 3, checkpoints)
+for a, b in zip(model.predict_proba(X_test), reference.predict_proba(X_test)):
+    assert np.allclose(a, b)
+assert (model.predict(X_test) == reference.predict(X_test)).all()
+# Same fitted attributes as a plain fit, on the wrapper and on every voting ensemble
+assert fitted_attributes(model) == fitted_attributes(reference)
+for a, b in zip(model.classes_, reference.classes_):
+    assert np.array_equal(a, b)
+for a, b in zip(model.estimators_, reference.estimators_):
+    assert fitted_attributes(a) == fitted_attributes(b)
+assert len(os.listdir(checkpoints.directory)) == 1 + 9
+
+# Members fitted in the pool can still spread over threads (forests get worker_plan's threads)
+class BackendProbe(ClassifierMixin, BaseEstimator):
+    def fit(self, X, y):
+        self.backend_ = type(get_active_backend()[0]).__name__
+        self.classes_ = np.unique(y)
+        return self
+
+
+probe = MultiOutputClassifier(VotingClassifier([('probe', BackendProbe())], voting='soft'))
+crop_training.fit_members(probe, X_train, y_train, 3)
+assert all(v.named_estimators_['probe'].backend_ == 'ThreadingBackend' for v in probe.estimators_)
+
+# Resuming refits only what is missing
+os.remove(checkpoints.path('Variety.svc'))
+kept = os.stat(checkpoints.path('Crop.svc')).st_mtime_ns
+model = crop_training.build_model().set_params(**params)
+crop_training.fit_members(model, X_train, y_train, 1, checkpoints)
+assert os.stat(checkpoints.path('Crop.svc')).st_mtime_ns == kept
+assert os.path.exists(checkpoints.path('Variety.svc'))
+
+# ---------- Bootstrap runs the scripts side by side and streams their progress ----------
+scripts = []
+for name, code in [('slow_ok.py', 0), ('slow_fail.py', 3)]:
+    path = os.path.join(work, name)
+    with open(path, 'w') as f:
+        f.write(textwrap.dedent(f"""
+            import sys, time
+            assert sys.argv[1] == '--checkpoint-dir'
+            for i in range(1, 5):
+                time.sleep(0.25)
+                print(f"⏳ [{{i}}/4] step", flush=True)
+            sys.exit({code})
+        """))
+    scripts.append(path)
+
+bootstrap = Bootstrap(scripts, checkpoint_dir=os.path.join(work, 'boot')).start()
+seen = []
+start = time.perf_counter()
+failed = bootstrap.wait(lambda script, line: seen.append((script, line)))
+elapsed = time.perf_counter() - start
+print(f"two 1 s scripts finished in {elapsed:.2f}s")
+assert elapsed < 1.9, "scripts did not run concurrently"
+assert failed == [scripts[1]] and bootstrap.done
+assert sum(1 for s, line in seen if s == scripts[0]) == 4
+assert bootstrap.progress[scripts[0]] == 1.0 and bootstrap.progress[scripts[1]] == 1.0
+assert bootstrap.fraction() == 1.0
+
+# poll() drains output without blocking, the way the Tk dialog uses it
+bootstrap = Bootstrap(scripts[:1], checkpoint_dir=os.path.join(work, 'boot')).start()
+lines = []
+while not bootstrap.done:
+    lines += bootstrap.poll()
+    time.sleep(0.05)
+assert len(lines) == 4 and not bootstrap.failed
+assert Bootstrap([], checkpoint_dir=work).fraction() == 1.0
+
+# ---------- Scripts run in agro_core.MODEL_DIR, wherever the app was started from ----------
+path = os.path.join(work, 'writes_model.py')
+with open(path, 'w') as f:
+    f.write(textwrap.dedent("""
+        import sys
+        args = dict(zip(sys.argv[1::2], sys.argv[2::2]))
+        with open('fake_model.pkl', 'w') as f:
+            f.write(args['--n-jobs'])
+    """))
+default_dir, cwd = agro_core.MODEL_DIR, os.getcwd()
+agro_core.MODEL_DIR = os.path.join(work, 'models')
+os.chdir(work)
+try:
+    bootstrap = Bootstrap([path], checkpoint_dir='boot', n_jobs=4).start()
+    assert not bootstrap.wait()
+    with open(os.path.join(agro_core.MODEL_DIR, 'fake_model.pkl')) as f:
+        assert f.read() == '4'
+    # Default scripts and their datasets resolve next to bootstrap.py, not against the cwd,
+    # and the worker budget is split between them
+    bootstrap = Bootstrap(checkpoint_dir='boot', n_jobs=8)
+    assert bootstrap.scripts == ['Crop_training_model.py', 'Fertilizer_training_model.py']
+    assert bootstrap.n_jobs == {'Crop_training_model.py': 6, 'Fertilizer_training_model.py': 2}
+    for script in bootstrap.scripts:
+        command = bootstrap.command(script)
+        assert os.path.isfile(command[2]) and os.path.isfile(command[command.index('--data') + 1])
+        assert os.path.isabs(command[command.index('--checkpoint-dir') + 1])
+finally:
+    agro_core.MODEL_DIR = default_dir
+    os.chdir(cwd)
+
+print('\nTest complete')
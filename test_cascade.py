@@ -0,0 +1,101 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, VotingClassifier
+from sklearn.multioutput import MultiOutputClassifier
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+
+import agro_core
+import model_artifacts
+from cascade import (CascadeMultiOutput, CascadeVoting, calibrate, calibrate_threshold, evaluate,
+                     read_thresholds, write_cascade)
+
+# ---------- Calibration picks the smallest safe margin ----------
+tree = np.array([[0.9, 0.1], [0.6, 0.4], [0.55, 0.45], [0.5, 0.5]])
+full = np.array([[0.8, 0.2], [0.3, 0.7], [0.6, 0.4], [0.4, 0.6]])
+# Margins 0.8, 0.2, 0.1, 0.0; the row at margin 0.2 flips, so only the first may skip
+assert abs(calibrate_threshold(tree, full, bound=1.0, tolerance=0) - 0.8) < 1e-9
+assert calibrate_threshold(tree, full, bound=0.5, tolerance=0) == 0.5
+assert calibrate_threshold(tree, full, bound=0.5, tolerance=0.5) == 0.0
+assert calibrate_threshold(tree, tree, bound=0.5, tolerance=0) == 0.0
+assert calibrate_threshold(tree, full[:, ::-1], bound=0.5, tolerance=0) == 0.5
+
+# ---------- Crop-style ensemble ----------
+crop = pd.read_csv('sensor_Crop_Dataset.csv', nrows=2000)
+X = agro_core.crop_frame(crop)
+y = pd.DataFrame({t: pd.factorize(crop[t])[0] for t in agro_core.CROP_TARGETS})
+voting = VotingClassifier([('rf', RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0)),
+                           ('dt', DecisionTreeClassifier(max_depth=6, random_state=0)),
+                           ('svc', SVC(probability=True, random_state=0))], voting='soft')
+model = MultiOutputClassifier(voting).fit(X[:1500], y[:1500])
+X_cal, X_eval, y_eval = X[1500:1750], X[1750:], y[1750:]
+
+# A zero threshold never asks the SVC; past the bound every row gets the full vote
+cascade = CascadeVoting(model.estimators_[0], 0.0)
+assert cascade.bound == 0.5 and len(cascade.others) == 1
+proba = cascade.predict_proba(X_eval)
+assert cascade.stats()['skip_rate'] == 1.0 and np.allclose(proba, cascade.tree_proba(X_eval))
+cascade = CascadeVoting(model.estimators_[0], 1.01)
+assert np.allclose(cascade.predict_proba(X_eval), model.estimators_[0].predict_proba(X_eval))
+assert cascade.stats()['skipped'] == 0
+
+# Calibrated thresholds keep the labels of full voting within tolerance
+thresholds = calibrate(model, X_cal, tolerance=0.0)
+assert all(0 <= t <= 0.5 for t in thresholds)
+report = evaluate(model, thresholds, X_eval, y_eval, agro_core.CROP_TARGETS)
+for target, r in report.items():
+    print(f"{target}: threshold {r['threshold']:.3f}, SVC skipped {r['skip_rate']:.1%}, "
+          f"agreement {r['agreement']:.2%}, Δacc {r['accuracy_cascade'] - r['accuracy_full']:+.4f}")
+    assert r['agreement'] >= 0.95
+
+# Any margin at or above the bound is safe: those rows keep the full-vote label
+wrapped = CascadeMultiOutput(model, [0.5] * 3)
+for a, b in zip(wrapped.predict(X_eval).T, model.predict(X_eval).T):
+    assert (a == b).all()
+
+# The memory-mapped export cascades the same way
+art_dir = os.path.join(tempfile.mkdtemp(), 'crop')
+model_artifacts.export_model(model, art_dir)
+packed = CascadeMultiOutput(model_artifacts.load_model(art_dir), thresholds)
+for a, b in zip(packed.predict_proba(X_eval), CascadeMultiOutput(model, thresholds).predict_proba(X_eval)):
+    assert np.allclose(a, b)
+
+# ---------- agro_core picks the cascade up while the file matches the model ----------
+model_dir = tempfile.mkdtemp()
+for name in ('crop_model', 'crop_label_encoders'):
+    os.symlink(os.path.abspath(agro_core.model_path(name)), os.path.join(model_dir, agro_core.MODEL_FILES[name]))
+source = os.path.join(model_dir, agro_core.MODEL_FILES['crop_model'])
+path = os.path.join(model_dir, 'crop_cascade.json')
+write_cascade(path, [0.5, 0.5, 0.5], agro_core.CROP_TARGETS, source, 0.0)
+assert read_thresholds(path, source, agro_core.CROP_TARGETS) == [0.5] * 3
+assert read_thresholds(path, 'data_core.csv', agro_core.CROP_TARGETS) is None
+
+full = agro_core.predict_crop(X_eval)
+assert agro_core.cascade_stats() is None
+default_dir, default_enabled = agro_core.MODEL_DIR, agro_core.CASCADE_ENABLED
+agro_core.MODEL_DIR = model_dir
+agro_core.unload()
+try:
+    # Opt-in: the calibrated file alone does not switch the cascade on
+    agro_core.CASCADE_ENABLED = False
+    agro_core.predict_crop(X_eval[:5])
+    assert agro_core.cascade_stats() is None
+    agro_core.CASCADE_ENABLED = True
+    agro_core.unload()
+    fast = agro_core.predict_crop(X_eval)
+    stats = agro_core.cascade_stats()
+    print("agro_core SVC skip rate:", {t: f"{s['skip_rate']:.1%}" for t, s in stats.items()})
+    assert all(s['rows'] == len(X_eval) for s in stats.values())
+    for target in agro_core.CROP_TARGETS:
+        assert (full[target][1].argmax(axis=1) == fast[target][1].argmax(axis=1)).all()
+    # Attributions still decompose the full vote
+    names, proba, _ = agro_core.explain_crop(X_eval[:20])['Crop']
+    assert np.allclose(proba, full['Crop'][1][:20])
+finally:
+    agro_core.MODEL_DIR, agro_core.CASCADE_ENABLED = default_dir, default_enabled
+    agro_core.unload()
+
+print('\nTest complete')
@@ -0,0 +1,67 @@
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+import agro_core
+from batch_score import score_stream
+from categorical_codec import CategoricalCodec, loose, normalize
+
+soils = CategoricalCodec(['Black', 'Clayey', 'Loamy', 'Red', 'Sandy'])
+crops = CategoricalCodec(['Barley', 'Cotton', 'Ground Nuts', 'Maize', 'Sugarcane', 'Wheat'])
+
+assert list(normalize(['  Loamy ', 'Ground   Nuts'])) == ['loamy', 'ground nuts']
+assert list(loose(['Sugar cane', 'Co 0238'])) == ['sugarcane', 'co0238']
+
+# Exact, normalized, loose and fuzzy matches; missing and unrelated values stay -1
+codes, corrections, unknown = crops.encode(['Maize', 'maize ', 'Sugar cane', 'Wheet', 'Maize', None, 'Banana'])
+assert list(codes) == [3, 3, 4, 5, 3, -1, -1]
+assert corrections['maize '] == ('Maize', 1.0) and corrections['Sugar cane'] == ('Sugarcane', 1.0)
+assert corrections['Wheet'][0] == 'Wheat' and 0.8 <= corrections['Wheet'][1] < 1.0
+assert 'Maize' not in corrections
+assert set(unknown) == {'Banana'}
+
+# Weak matches are only suggestions; a tie between two classes is never auto-corrected
+codes, corrections, unknown = soils.encode(['Sand', 'Lom'])
+assert codes[0] == 4 and codes[1] == -1
+assert unknown['Lom'][0] == 'Loamy' and 0.6 <= unknown['Lom'][1] < 0.8
+tied = CategoricalCodec(['Red', 'Rod'], min_confidence=0.6)
+code, confidence, ambiguous = tied.match('Rad')
+assert ambiguous and confidence >= 0.6 and tied.encode(['Rad'])[0][0] == -1
+
+# Keys shared by two classes are ambiguous and resolve to neither
+twins = CategoricalCodec(['Loamy', 'loamy'])
+assert list(twins.encode(['Loamy', 'loamy', 'LOAMY'])[0]) == [0, 1, -1]
+
+# Each distinct value is resolved once, however many rows repeat it
+column = pd.Series(np.array(['Maize', 'maize', 'Sugar cane', 'Whaet', 'Cotton '] * 40000, dtype=object))
+start = time.perf_counter()
+codes, corrections, _ = crops.encode(column)
+elapsed = time.perf_counter() - start
+assert (codes >= 0).all() and len(corrections) == 4
+print(f"Encoded {len(column)} values in {elapsed * 1000:.0f} ms")
+
+# The fertilizer batch path reports what it rewrote
+frame = pd.read_csv('data_core.csv', nrows=6)
+reference, _ = agro_core.encode_fertilizer_frame(frame)
+messy = frame.copy()
+messy['Soil_Type'] = messy['Soil_Type'].str.upper() + '  '
+messy['Crop'] = messy['Crop'].str.lower()
+collected = {}
+X, valid = agro_core.encode_fertilizer_frame(messy, collected)
+assert valid.all() and X.equals(reference)
+assert set(collected) == {'Soil_Type', 'Crop'}
+
+sample = io.StringIO(messy.to_csv(index=False))
+collected = {}
+out = io.StringIO()
+score_stream('fertilizer', sample, out, corrections=collected)
+scored = pd.read_csv(io.StringIO(out.getvalue()))
+assert scored['Valid'].all() and set(collected) == {'Soil_Type', 'Crop'}
+
+# Codecs exist for every crop label column too
+crop_codecs = agro_core.categorical_codecs('crop')
+assert crop_codecs['Variety'].encode(['yukon gold'])[0][0] == list(crop_codecs['Variety'].classes).index('Yukon Gold')
+
+print('\nTest complete')
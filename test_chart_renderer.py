@@ -0,0 +1,95 @@
+import asyncio
+import gc
+import io
+import json
+import os
+import shutil
+import tempfile
+import tracemalloc
+
+import pandas as pd
+from matplotlib._pylab_helpers import Gcf
+
+from agro_server import AgroServer
+from batch_score import chart_writer, score_stream
+from chart_renderer import BarChart, render_chart
+
+inputs = {'Nitrogen': 80.0, 'Phosphorus': 40.0, 'Potassium': 40.0, 'Temperature': 25.0,
+          'Humidity': 80.0, 'Rainfall': 200.0}
+
+# Updates with the same categories reuse the bars and value labels in place
+chart = BarChart()
+chart.update(inputs, "Crop Input Analysis")
+bars, texts = list(chart.bars), list(chart.texts)
+chart.update(dict(inputs, Nitrogen=120.5), "Crop Input Analysis")
+assert chart.bars == bars and chart.texts == texts
+assert bars[0].get_height() == 120.5 and texts[0].get_text() == '120.50'
+assert chart.ax.get_ylim()[1] >= 120.5
+assert len(chart.ax.patches) == len(inputs)
+
+# New categories swap the bars but keep the axes
+chart.update({'A': 10.0, 'B': 90.0}, "Fertilizer Prediction Probabilities (%)")
+assert len(chart.ax.patches) == 2 and chart.texts[1].get_text() == '90%'
+
+# Off-screen PNG/SVG rendering, without pyplot's figure registry
+png = chart.render('png')
+svg = render_chart(inputs, "Crop Input Analysis", fmt='svg')
+assert png.startswith(b'\x89PNG') and b'<svg' in svg
+assert not Gcf.get_all_fig_managers()
+
+# Re-rendering one chart many times keeps memory flat
+tracemalloc.start()
+for i in range(20):
+    chart.update({'A': float(i), 'B': 100.0 - i}, "Fertilizer Prediction Probabilities (%)").render()
+gc.collect()
+before = tracemalloc.get_traced_memory()[0]
+for i in range(200):
+    chart.update({'A': float(i), 'B': 100.0 - i}, "Fertilizer Prediction Probabilities (%)").render()
+gc.collect()
+growth = tracemalloc.get_traced_memory()[0] - before
+tracemalloc.stop()
+print(f"Memory growth over 200 renders: {growth / 1024:.1f} KiB")
+assert growth < 512 * 1024
+chart.release()
+assert not chart.ax.figure.axes
+
+# Batch scoring can write one probability chart per row
+tmp = tempfile.mkdtemp()
+sample = pd.read_csv('data_core.csv', nrows=5).to_csv(index=False)
+score_stream('fertilizer', io.StringIO(sample), io.StringIO(), chunksize=2,
+             on_results=chart_writer('fertilizer', tmp, 'svg'))
+assert sorted(os.listdir(tmp)) == [f'fertilizer_{i:08d}.svg' for i in range(5)]
+shutil.rmtree(tmp)
+
+
+# The service renders charts too
+async def fetch_chart():
+    server = AgroServer(port=0)
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+        body = json.dumps(dict(inputs, pH_Value=6.5)).encode()
+        writer.write(f"POST /chart/crop?format=png HTTP/1.1\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response
+    finally:
+        await server.stop()
+
+head, _, image = asyncio.run(fetch_chart()).partition(b'\r\n\r\n')
+assert b' 200 ' in head.split(b'\r\n')[0] and b'image/png' in head and image.startswith(b'\x89PNG')
+print(f"Server chart: {len(image)} bytes")
+
+# With several inference threads, concurrent chart requests each draw their own figure
+server = AgroServer(port=0, workers=4)
+# (same maximum in every row, so a reused figure keeps the layout of a fresh one)
+rows = [{'Crop': {'percentages': {'A': float(i), 'B': 100.0}}} for i in range(0, 100, 5)]
+expected = [BarChart().update(row['Crop']['percentages'], "Crop Prediction Probabilities (%)").render('png')
+            for row in rows]
+images = list(server.executor.map(lambda row: server._render_chart('crop', row, 'png'), rows * 5))
+assert images == expected * 5
+server.executor.shutdown()
+
+print('\nTest complete')
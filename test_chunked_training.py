@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import Crop_training_model as crop_training
+import Fertilizer_training_model as fertilizer_training
+from chunked_training import ChunkSource, Reservoir, train_chunked
+from dataset_cache import load_dataset
+
+tmp = tempfile.mkdtemp()
+
+# A reservoir keeps a uniform sample of the stream, however it is chunked
+reservoir = Reservoir(1000, 1, seed=0)
+for start in range(0, 100_000, 7_000):
+    reservoir.add(np.arange(start, min(start + 7_000, 100_000), dtype=np.float32)[:, None])
+sample = reservoir.rows()[:, 0]
+assert len(sample) == 1000 and len(np.unique(sample)) == 1000
+assert abs(sample.mean() - 50_000) < 3_000
+assert abs((sample < 50_000).mean() - 0.5) < 0.06
+
+# ---------- Streaming source ----------
+path = os.path.join(tmp, 'sensor_Crop_Dataset.csv')
+shutil.copy('sensor_Crop_Dataset.csv', path)
+columns = crop_training.FEATURES + crop_training.TARGETS
+csv_source = ChunkSource(path, columns, crop_training.TARGETS, chunksize=3_000, use_cache=False)
+chunks = list(csv_source)
+assert max(len(frame) for frame, _ in chunks) <= 3_000
+assert sum(len(frame) for frame, _ in chunks) == len(pd.read_csv(path))
+csv_test = np.concatenate([test for _, test in chunks])
+assert 0.17 < csv_test.mean() < 0.23
+
+# The cached columns stream the same rows, codes and split as the CSV
+load_dataset(path, crop_training.TARGETS)
+cache_source = ChunkSource(path, columns, crop_training.TARGETS, chunksize=3_000)
+assert cache_source.cache_dir is not None
+assert cache_source.categories == csv_source.categories
+for (csv_frame, csv_mask), (cache_frame, cache_mask) in zip(chunks, cache_source):
+    assert csv_frame.equals(cache_frame)
+    assert np.array_equal(csv_mask, cache_mask)
+
+# The split depends on row content, not position
+shuffled = os.path.join(tmp, 'shuffled.csv')
+raw = pd.read_csv(path)
+order = np.random.default_rng(0).permutation(len(raw))
+raw.iloc[order].to_csv(shuffled, index=False)
+shuffled_test = np.concatenate([t for _, t in ChunkSource(shuffled, columns, crop_training.TARGETS,
+                                                          chunksize=5_000, use_cache=False)])
+assert np.array_equal(shuffled_test, csv_test[order])
+
+# ---------- Crop: chunked ensemble ----------
+model_path = os.path.join(tmp, 'crop.pkl')
+encoders_path = os.path.join(tmp, 'crop_encoders.pkl')
+model, encoders, scores = train_chunked('crop', path, chunksize=3_000, bags=4, bag_rows=2_000,
+                                        n_trees=20, epochs=2, model_path=model_path,
+                                        encoders_path=encoders_path)
+assert set(scores) == set(crop_training.TARGETS) | {'subset'}
+model = joblib.load(model_path)
+encoders = joblib.load(encoders_path)
+for voting, target in zip(model.estimators_, crop_training.TARGETS):
+    assert list(voting.named_estimators_) == ['rf', 'dt', 'sgd']
+    assert voting.named_estimators_['rf'].n_estimators == 20
+    assert list(encoders[target].inverse_transform(voting.classes_)) == sorted(raw[target].astype(str).unique())
+
+# Streaming accuracy matches scoring the held-out rows in one go
+X = pd.concat([frame for frame, test in chunks])[columns]
+test = csv_test
+pred = model.predict(X[crop_training.FEATURES][test])
+truth = X[crop_training.TARGETS][test].to_numpy()
+assert abs(scores['subset'] - (pred == truth).all(axis=1).mean()) < 1e-9
+for i, target in enumerate(crop_training.TARGETS):
+    assert abs(scores[target] - (pred[:, i] == truth[:, i]).mean()) < 1e-9
+probas = model.predict_proba(X[crop_training.FEATURES].head(5))
+assert all(np.allclose(p.sum(axis=1), 1) for p in probas)
+
+# ---------- Fertilizer: bagged forest ----------
+path = os.path.join(tmp, 'data_core.csv')
+shutil.copy('data_core.csv', path)
+model, encoders, scores = train_chunked('fertilizer', path, chunksize=1_000, bags=4, bag_rows=1_500,
+                                        n_trees=20, model_path=os.path.join(tmp, 'fert.pkl'),
+                                        encoders_path=os.path.join(tmp, 'fert_encoders.pkl'),
+                                        use_cache=False)
+target = fertilizer_training.TARGET
+assert list(scores) == [target]
+assert model.n_estimators == 20
+assert list(encoders[target].classes_) == sorted(pd.read_csv(path)[target].astype(str).unique())
+assert len(model.classes_) == len(encoders[target].classes_)
+
+shutil.rmtree(tmp)
+print('\nTest complete')
@@ -0,0 +1,68 @@
+import os
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, VotingClassifier
+from sklearn.multioutput import MultiOutputClassifier
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+
+import agro_core
+import compact_model
+
+out_dir = tempfile.mkdtemp()
+
+# Rounding thresholds down to float32 keeps every decision for float32 inputs
+rng = np.random.default_rng(0)
+thresholds = rng.normal(scale=100, size=10_000)
+x = rng.normal(scale=100, size=10_000).astype(np.float32)
+x[::2] = thresholds[::2].astype(np.float32)   # values right at the thresholds
+assert np.array_equal(x <= thresholds, x <= compact_model.floor_float32(thresholds))
+
+# ---------- Fertilizer forest (the trained model) ----------
+fert_X, valid = agro_core.encode_fertilizer_frame(pd.read_csv('data_core.csv', nrows=300))
+fert_X = fert_X[valid].astype('int64')
+source = agro_core.model_path('fertilizer_model')
+original = joblib.load(source)
+for leaf_bits in compact_model.LEAF_BITS:
+    path = os.path.join(out_dir, f'fertilizer_{leaf_bits}.agc')
+    manifest = compact_model.export_compact(original, path, leaf_bits=leaf_bits, source=source)
+    compact = compact_model.load_compact(path)
+    diff = np.abs(original.predict_proba(fert_X) - compact.predict_proba(fert_X)).max()
+    assert diff <= compact_model.tolerance(leaf_bits, has_svc=False) == manifest['tolerance'], leaf_bits
+    assert manifest['stats']['nodes_out'] < manifest['stats']['nodes_in']
+    assert os.path.getsize(path) < os.path.getsize(source) / 20
+    assert compact_model.is_fresh(path, source)
+    print(f"fertilizer, {leaf_bits}-bit leaves: {os.path.getsize(path) / 1e6:.2f} MB, max |Δproba| {diff:.1e}")
+
+# ---------- Crop-style ensemble with kernel SVCs sharing their training rows ----------
+crop = pd.read_csv('sensor_Crop_Dataset.csv', nrows=1500)
+X = agro_core.crop_frame(crop).astype(np.float32)
+y = np.column_stack([pd.factorize(crop[t])[0] for t in agro_core.CROP_TARGETS])
+voting = VotingClassifier([('rf', RandomForestClassifier(n_estimators=20, random_state=0)),
+                           ('dt', DecisionTreeClassifier(random_state=0)),
+                           ('svc', SVC(probability=True, random_state=0))], voting='soft')
+model = MultiOutputClassifier(voting).fit(X, y)
+path = os.path.join(out_dir, 'crop.agc')
+manifest = compact_model.export_compact(model, path, codec='zlib')
+compact = compact_model.load_compact(path)
+X_test = agro_core.crop_frame(pd.read_csv('sensor_Crop_Dataset.csv', skiprows=range(1, 1501), nrows=300))
+for expected, got in zip(model.predict_proba(X_test), compact.predict_proba(X_test)):
+    assert np.abs(expected - got).max() <= manifest['tolerance']
+assert (model.predict(X_test) == compact.predict(X_test)).mean() > 0.99
+# The three SVCs reference one table of support vectors
+sections = manifest['sections']
+assert sections['support_vectors']['shape'][0] <= len(X)
+assert sum(1 for name in sections if name.endswith('.support_index')) == 3
+pickle_path = os.path.join(out_dir, 'crop.pkl')
+joblib.dump(model, pickle_path)
+print(f"crop ensemble: {os.path.getsize(pickle_path) / 1e6:.1f} MB pickle -> {os.path.getsize(path) / 1e6:.2f} MB")
+
+# Unknown members fall back to a compressed pickle inside the file
+path = os.path.join(out_dir, 'fallback.agc')
+compact_model.export_compact({'not': 'a model'}, path)
+assert compact_model.load_compact(path) == {'not': 'a model'}
+
+print('\nTest complete')
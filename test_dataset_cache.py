@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+from dataset_cache import cache_path, label_encoders, load_dataset
+
+TARGETS = ['Crop', 'Soil_Type', 'Variety']
+
+tmp = tempfile.mkdtemp()
+path = os.path.join(tmp, 'sensor_Crop_Dataset.csv')
+shutil.copy('sensor_Crop_Dataset.csv', path)
+original = pd.read_csv(path)
+
+# First load builds the cache; columns match the CSV with float32 numerics and
+# the same codes/classes LabelEncoder produces
+start = time.perf_counter()
+df, categories = load_dataset(path, TARGETS)
+build_s = time.perf_counter() - start
+for col in original.columns:
+    if col in TARGETS:
+        le = LabelEncoder()
+        assert np.array_equal(df[col].to_numpy(), le.fit_transform(original[col]))
+        assert list(label_encoders(categories)[col].classes_) == list(le.classes_)
+    else:
+        assert df[col].dtype == np.float32
+        assert np.array_equal(df[col].to_numpy(), original[col].to_numpy(dtype=np.float32))
+
+# Second load memory-maps the columns without copying: every DataFrame column is
+# still backed by its .npy map
+manifest = os.path.join(cache_path(path), 'manifest.json')
+built_at = os.stat(manifest).st_mtime_ns
+start = time.perf_counter()
+df, categories = load_dataset(path, TARGETS)
+load_s = time.perf_counter() - start
+
+def is_mapped(array):
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+assert all(is_mapped(df[col].to_numpy()) for col in df.columns)
+assert os.stat(manifest).st_mtime_ns == built_at
+print(f"Build {build_s * 1000:.1f} ms, cached load {load_s * 1000:.1f} ms")
+
+# A touched file with the same content keeps the cache (hash matches)
+os.utime(path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+df, _ = load_dataset(path, TARGETS)
+with open(manifest) as f:
+    assert '"mtime_ns": %d' % os.stat(path).st_mtime_ns in f.read()
+
+# Changed content rebuilds it
+original.iloc[:10].to_csv(path, index=False)
+df, categories = load_dataset(path, TARGETS)
+assert len(df) == 10
+
+# Disabled cache: same types straight from the CSV
+parsed, parsed_categories = load_dataset(path, TARGETS, cache_dir='')
+assert parsed.dtypes.to_dict() == df.dtypes.to_dict() and parsed_categories == categories
+
+# float64 numerics (as the crop model loads them) get their own cache with the CSV's exact values
+df, _ = load_dataset(path, TARGETS, numeric_dtype=np.float64)
+for col in original.columns.difference(TARGETS):
+    assert df[col].dtype == np.float64
+    assert np.array_equal(df[col].to_numpy(), original.iloc[:10][col].to_numpy(dtype=np.float64))
+manifest64 = os.path.join(cache_path(path, numeric_dtype=np.float64), 'manifest.json')
+assert os.path.dirname(manifest64) != os.path.dirname(manifest)
+
+# Switching between the dtypes reuses both caches instead of rebuilding either
+built = os.stat(manifest).st_mtime_ns, os.stat(manifest64).st_mtime_ns
+for dtype in (np.float32, np.float64, np.float32, np.float64):
+    df, _ = load_dataset(path, TARGETS, numeric_dtype=dtype)
+    assert all(is_mapped(df[col].to_numpy()) for col in df.columns)
+assert (os.stat(manifest).st_mtime_ns, os.stat(manifest64).st_mtime_ns) == built
+parsed, _ = load_dataset(path, TARGETS, cache_dir='', numeric_dtype=np.float64)
+assert parsed.dtypes.to_dict() == df.dtypes.to_dict()
+
+shutil.rmtree(tmp)
+
+print('\nTest complete')
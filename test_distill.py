@@ -0,0 +1,73 @@
+import os
+import pickle
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, VotingClassifier
+from sklearn.multioutput import MultiOutputClassifier
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+
+import agro_core
+from distill import compare, distill, latency_ms, synthetic_rows
+
+crop = pd.read_csv('sensor_Crop_Dataset.csv', nrows=2500)
+X = agro_core.crop_frame(crop)
+y = pd.DataFrame({t: pd.factorize(crop[t])[0] for t in agro_core.CROP_TARGETS})
+voting = VotingClassifier([('rf', RandomForestClassifier(n_estimators=20, max_depth=5, random_state=0)),
+                           ('dt', DecisionTreeClassifier(max_depth=4, random_state=0)),
+                           ('svc', SVC(probability=True, random_state=0))], voting='soft')
+teacher = MultiOutputClassifier(voting).fit(X[:2000], y[:2000])
+X_test, y_test = X[2000:], y[2000:]
+
+# Synthetic rows stay within the observed feature ranges
+fake = synthetic_rows(X, 1000)
+assert (fake.min() >= X.min()).all() and (fake.max() <= X.max()).all()
+
+student = distill(teacher, X[:2000], synthetic_ratio=1.0,
+                  params={'n_estimators': 20, 'max_depth': 10, 'min_samples_leaf': 2})
+for proba in student.predict_proba(X_test):
+    assert np.allclose(proba.sum(axis=1), 1) and (proba >= 0).all()
+assert [list(e.classes_) for e in student.estimators_] == [list(e.classes_) for e in teacher.estimators_]
+
+report = compare(teacher, student, X_test, y_test, agro_core.CROP_TARGETS)
+for (target, r), classes in zip(report.items(), student.classes):
+    print(f"{target}: agreement {r['agreement']:.1%}, accuracy {r['accuracy_teacher']:.3f} -> "
+          f"{r['accuracy_student']:.3f}, mean |Δp| {r['mean_abs_diff']:.4f}")
+    # The teacher is close to uniform on this data, so probabilities match far better than argmaxes
+    assert r['mean_abs_diff'] < 0.02 and r['agreement'] > 2 / len(classes)
+
+one = X_test.iloc[:1]
+print(f"1 row: teacher {latency_ms(teacher, one):.1f} ms, student {latency_ms(student, one):.2f} ms")
+assert latency_ms(student, one) < latency_ms(teacher, one)
+
+# The per-output views are rebuilt on load, not stored
+restored = pickle.loads(pickle.dumps(student))
+assert 'estimators_' not in student.__getstate__()
+for a, b in zip(restored.predict_proba(X_test), student.predict_proba(X_test)):
+    assert np.array_equal(a, b)
+assert np.array_equal(restored.predict(X_test), student.predict(X_test))
+
+# ---------- agro_core loads it in place of the ensemble ----------
+model_dir = tempfile.mkdtemp()
+joblib.dump(student, os.path.join(model_dir, 'crop_student.pkl'))
+os.symlink(os.path.abspath(agro_core.model_path('crop_label_encoders')),
+           os.path.join(model_dir, agro_core.MODEL_FILES['crop_label_encoders']))
+default_dir = agro_core.MODEL_DIR
+agro_core.MODEL_DIR, agro_core.STUDENT_ENABLED = model_dir, True
+agro_core.unload()
+try:
+    results = agro_core.predict_crop(X_test)
+    for target, p in zip(agro_core.CROP_TARGETS, student.predict_proba(X_test)):
+        assert np.array_equal(results[target][1], p)
+    # Every node holds a distribution, so the student explains exactly
+    names, proba, explanation = agro_core.explain_crop(X_test[:50])['Crop']
+    assert np.abs(explanation['bias'] + explanation['contributions'].sum(axis=1) - proba).max() < 1e-5
+    assert np.abs(proba - results['Crop'][1][:50]).max() < 1e-5
+finally:
+    agro_core.MODEL_DIR, agro_core.STUDENT_ENABLED = default_dir, False
+    agro_core.unload()
+
+print('\nTest complete')
@@ -0,0 +1,54 @@
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.tree import DecisionTreeClassifier
+
+import agro_core
+from forest_engine import ForestEngine
+
+# Parity of the flat-array engine with the fitted sklearn fertilizer forest
+model = joblib.load(agro_core.model_path('fertilizer_model'))
+engine = ForestEngine.from_sklearn(model, keep_estimator=False)
+
+X, valid = agro_core.encode_fertilizer_frame(pd.read_csv('data_core.csv'))
+X = X[valid].astype('int64')
+
+assert np.array_equal(model.predict_proba(X), engine.predict_proba(X))
+assert np.array_equal(model.predict(X), engine.predict(X))
+leaves = np.column_stack([t.apply(X.to_numpy(dtype=np.float32)) for t in model.estimators_])
+assert np.array_equal(leaves + engine.roots, engine.apply(X))
+print(f"Forest parity on {len(X)} rows: OK")
+
+# Off-grid values exercise thresholds the training data never hit exactly
+rng = np.random.default_rng(0)
+noisy = pd.DataFrame(X.to_numpy(dtype=float) + rng.normal(0, 3, X.shape), columns=X.columns)
+assert np.array_equal(model.predict_proba(noisy), engine.predict_proba(noisy))
+print("Forest parity on perturbed rows: OK")
+
+# A single decision tree goes through the same path
+tree = DecisionTreeClassifier(random_state=0).fit(noisy[:2000], model.predict(X)[:2000])
+tree_engine = ForestEngine.from_sklearn(tree, keep_estimator=False)
+assert np.array_equal(tree.predict_proba(noisy), tree_engine.predict_proba(noisy))
+print("Decision tree parity: OK")
+
+# Large batches are handed back to sklearn when the estimator is kept
+hybrid = ForestEngine.from_sklearn(model)
+assert np.array_equal(model.predict_proba(X), hybrid.predict_proba(X))
+
+
+def per_call_ms(fn, row, repeat=200):
+    fn(row)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(row)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+row = X.iloc[:1]
+sk_ms = per_call_ms(model.predict_proba, row)
+engine_ms = per_call_ms(engine.predict_proba, row)
+print(f"Single-row predict_proba: sklearn {sk_ms:.2f} ms, engine {engine_ms:.2f} ms ({sk_ms / engine_ms:.1f}x)")
+
+print('\nTest complete')
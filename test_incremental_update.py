@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+import Crop_training_model as crop_training
+import Fertilizer_training_model as fertilizer_training
+from incremental_update import grow_forest, run_update, update_crop
+
+tmp = tempfile.mkdtemp()
+
+# Growing a forest with a class it has never seen keeps the old trees' votes intact
+rng = np.random.default_rng(0)
+X = rng.normal(size=(300, 4)).astype(np.float32)
+y = (X[:, 0] > 0).astype(int)
+forest = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+before = forest.predict_proba(X)
+X_new = rng.normal(loc=3, size=(60, 4)).astype(np.float32)
+y_new = np.full(60, 2)
+grow_forest(forest, np.vstack([X[:60], X_new]), np.concatenate([y[:60], y_new]), 3, 5, seed=1)
+after = forest.predict_proba(X)
+assert forest.n_estimators == 10 and list(forest.classes_) == [0, 1, 2]
+assert after.shape == (300, 3)
+assert np.allclose(after.sum(axis=1), 1)
+old_votes = np.mean([t.predict_proba(X) for t in forest.estimators_[:5]], axis=0)
+assert np.allclose(old_votes[:, :2], before) and np.all(old_votes[:, 2] == 0)
+new_votes = np.mean([t.predict_proba(X_new) for t in forest.estimators_[5:]], axis=0)
+assert (new_votes.argmax(axis=1) == 2).mean() > 0.9
+
+# ---------- Fertilizer: new rows with an unseen fertilizer ----------
+data = pd.read_csv('data_core.csv')
+base = data.sample(n=min(len(data), 3000), random_state=0)
+base_path = os.path.join(tmp, 'data_core.csv')
+base.to_csv(base_path, index=False)
+new = data.drop(base.index).sample(n=200, random_state=1)
+new.loc[new.index[:60], fertilizer_training.TARGET] = 'Test-Fertilizer'
+new_path = os.path.join(tmp, 'fertilizer_new.csv')
+new.to_csv(new_path, index=False)
+
+X_train, X_test, y_train, y_test, encoders = fertilizer_training.load_data(base_path, use_cache=False)
+model = RandomForestClassifier(n_estimators=20, random_state=42).fit(X_train, y_train)
+model_path = os.path.join(tmp, 'fertilizer_model.pkl')
+encoders_path = os.path.join(tmp, 'fertilizer_label_encoders.pkl')
+joblib.dump(model, model_path)
+joblib.dump(encoders, encoders_path)
+
+model, encoders, results, gap = run_update(
+    'fertilizer', new_path, base_path, model_path, encoders_path,
+    n_trees=10, n_recent=500, compare=True, seed=0)
+target = fertilizer_training.TARGET
+assert encoders[target].classes_[-1] == 'Test-Fertilizer'
+assert list(encoders[target].classes_[:-1]) == sorted(base[target].astype(str).unique())
+assert model.n_estimators == 30 and len(model.classes_) == len(encoders[target].classes_)
+assert set(results) == {'before update', 'incremental', 'full retrain'}
+assert results['incremental'][1][target] >= results['before update'][1][target]
+
+# The saved model and encoders round-trip, and the rows landed in the CSV
+saved = joblib.load(model_path)
+assert saved.n_estimators == 30
+assert len(joblib.load(encoders_path)[target].classes_) == len(encoders[target].classes_)
+assert len(pd.read_csv(base_path)) == len(base) + len(new)
+X_new = new[fertilizer_training.FEATURES].assign(
+    Soil_Type=encoders['Soil_Type'].transform(new['Soil_Type'].astype(str)),
+    Crop=encoders['Crop'].transform(new['Crop'].astype(str)))
+proba = saved.predict_proba(X_new)
+assert proba.shape[1] == len(encoders[target].classes_)
+print(f"Fertilizer: {results['before update'][1][target]:.4f} -> {results['incremental'][1][target]:.4f} "
+      f"(full retrain {results['full retrain'][1][target]:.4f})")
+
+# ---------- Crop: fast profile ensemble on a subset, dry run ----------
+data = pd.read_csv('sensor_Crop_Dataset.csv')
+base = data.sample(n=min(len(data), 2000), random_state=0)
+crop_path = os.path.join(tmp, 'sensor_Crop_Dataset.csv')
+base.to_csv(crop_path, index=False)
+new = data.drop(base.index).sample(n=100, random_state=1)
+new_path = os.path.join(tmp, 'crop_new.csv')
+new.to_csv(new_path, index=False)
+
+X_train, X_test, y_train, y_test, encoders = crop_training.load_data(crop_path, use_cache=False)
+model = crop_training.build_model('fast', 1)
+model.set_params(estimator__rf__n_estimators=10)
+model.fit(X_train, y_train)
+model_path = os.path.join(tmp, 'ensemble_crop_model.pkl')
+encoders_path = os.path.join(tmp, 'crop_label_encoders.pkl')
+joblib.dump(model, model_path)
+joblib.dump(encoders, encoders_path)
+saved_at = os.stat(model_path).st_mtime_ns
+
+model, encoders, results, gap = run_update(
+    'crop', new_path, crop_path, model_path, encoders_path,
+    n_trees=5, n_recent=300, save=False, seed=0)
+for voting in model.estimators_:
+    assert voting.named_estimators_['rf'].n_estimators == 15
+    assert isinstance(voting.named_estimators_['dt'], DecisionTreeClassifier)
+pred = model.predict(new[crop_training.FEATURES])
+assert pred.shape == (len(new), len(crop_training.TARGETS))
+assert 'subset' in results['incremental'][1]
+assert os.stat(model_path).st_mtime_ns == saved_at
+assert len(pd.read_csv(crop_path)) == len(base)
+print(f"Crop (subset): {results['before update'][1]['subset']:.4f} -> {results['incremental'][1]['subset']:.4f}")
+
+# A known code the model never trained on (missing from its training split) sorts between
+# the voting encoder's classes and cannot be appended: the update asks for a rebuild
+missing = np.unique(y_train['Crop'])[1]
+keep = (y_train['Crop'] != missing).to_numpy()
+partial = crop_training.build_model('fast', 1).set_params(estimator__rf__n_estimators=5)
+partial.fit(X_train[keep], y_train[keep])
+rows = pd.concat([X_train, y_train], axis=1)
+try:
+    update_crop(partial, rows, rows.tail(300), 2, 0)
+    raise AssertionError("update_crop accepted a code inside the known range")
+except ValueError as e:
+    assert 'full rebuild' in str(e)
+assert all(v.named_estimators_['rf'].n_estimators == 5 for v in partial.estimators_)
+
+shutil.rmtree(tmp)
+print('\nTest complete')
@@ -0,0 +1,88 @@
+import threading
+import time
+
+from Agro import AgroAidBot
+from inference_worker import InferenceWorker
+
+
+def wait_for(worker, count, timeout=120):
+    # Stand-in for the GUI's root.after loop: poll until `count` results were delivered
+    delivered = 0
+    deadline = time.monotonic() + timeout
+    while delivered < count and time.monotonic() < deadline:
+        delivered += worker.poll()
+        time.sleep(0.01)
+    return delivered
+
+
+# Jobs run off the calling thread and are delivered in submission order by poll()
+worker = InferenceWorker()
+caller = threading.get_ident()
+seen = []
+for i in range(5):
+    worker.submit(lambda i=i: (i, threading.get_ident()), seen.append)
+assert wait_for(worker, 5) == 5 and worker.pending() == 0
+assert [i for i, _ in seen] == list(range(5))
+assert all(thread != caller for _, thread in seen)
+
+# Cancelling drops queued and running jobs
+gate = threading.Event()
+seen = []
+worker.submit(lambda: gate.wait() or 'slow', seen.append)
+worker.submit(lambda: 'queued', seen.append)
+assert worker.cancel_pending() == 2
+worker.submit(lambda: 'latest', seen.append)
+gate.set()
+assert wait_for(worker, 1) == 1 and seen == ['latest']
+
+# 'cancel' policy: a new submission replaces the one in flight
+worker.shutdown()
+worker = InferenceWorker(policy='cancel')
+gate.clear()
+seen = []
+worker.submit(lambda: gate.wait() or 'first', seen.append)
+worker.submit(lambda: 'second', seen.append)
+gate.set()
+assert wait_for(worker, 1) == 1 and seen == ['second'] and worker.pending() == 0
+worker.shutdown()
+
+
+class RecordingGUI:
+    quick_options_visible = False
+
+    def __init__(self):
+        self.graphs = []
+
+    def show_graph(self, data, title, position='left'):
+        self.graphs.append(title)
+
+
+# The bot returns immediately and presents results only when the GUI thread polls
+worker = InferenceWorker()
+bot = AgroAidBot()
+bot.gui = RecordingGUI()
+messages = []
+bot.display_message = messages.append
+bot.runner = worker.submit
+
+for message in ['1', '80', '40', '40', '25', '80', '6.5', '200']:
+    bot.process_input(message)
+assert bot.state == 'main_menu'
+start = time.perf_counter()
+assert wait_for(worker, 1) == 1
+print(f"Crop prediction delivered after {time.perf_counter() - start:.2f}s")
+assert any(m.startswith('🌾 Recommended Crop') for m in messages), messages
+assert bot.gui.graphs == ['Crop Input Analysis', 'Crop Prediction Probabilities (%)']
+
+# Requests queued while one is in flight arrive in order
+bot.inputs = dict(Temperature='26', Humidity='52', Moisture='38', Soil_Type='Sandy', Crop='Maize',
+                  Nitrogen='37', Potassium='0', Phosphorus='0')
+bot.request_prediction('fertilizer')
+bot.inputs['Soil_Type'] = 'Sandyy'
+bot.request_prediction('fertilizer')
+assert wait_for(worker, 2) == 2
+assert messages[-1].startswith("❌ Unknown Soil_Type 'Sandyy'. Did you mean 'Sandy'?")
+assert any(m.startswith('💡 Recommended Fertilizer') for m in messages)
+worker.shutdown()
+
+print('\nTest complete')
@@ -0,0 +1,95 @@
+import io
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+import agro_core
+from agro_server import score_crop_rows
+from batch_score import score_stream
+from input_schema import SCHEMA_FILE, derive_schema, describe_errors, load_schema, outside_training, validate
+
+# The shipped schema matches what the training CSVs give
+for kind in ('crop', 'fertilizer'):
+    assert load_schema(kind) == derive_schema(kind), f"{SCHEMA_FILE} is stale; run input_schema.py build"
+schema = load_schema('crop')
+# Valid ranges are the physical limits; the training range sits inside them
+assert schema['Rainfall']['min'] == 0 and schema['Rainfall']['max'] is None
+assert schema['Humidity']['max'] == 100 and (schema['pH_Value']['min'], schema['pH_Value']['max']) == (0, 14)
+assert 0 < schema['pH_Value']['train_min'] < schema['pH_Value']['train_max'] < 14
+fert_schema = load_schema('fertilizer')
+for col in ('Nitrogen', 'Phosphorus', 'Potassium'):
+    field = fert_schema[col]
+    assert field['dtype'] == 'int' and all(isinstance(field[k], int) for k in ('train_min', 'train_max'))
+
+# Missing, non-numeric and out-of-range cells are flagged per cell and per row
+frame = pd.DataFrame({
+    'Nitrogen': [80, 80, 'lots', 80, None],
+    'Phosphorus': [40] * 5,
+    'Potassium': [40] * 5,
+    'Temperature': [25] * 5,
+    'Humidity': [80, 80, 80, 130, 80],
+    'pH_Value': [6.5, 40, 6.5, 6.5, 6.5],
+    'Rainfall': [200, 200, 200, -5, 200],
+})
+X, errors = validate(frame, schema)
+assert list(errors.any(axis=1)) == [False, True, True, True, True]
+assert list(describe_errors(errors)) == ['', 'pH_Value', 'Nitrogen', 'Humidity, Rainfall', 'Nitrogen']
+assert X.isna().equals(errors)
+
+# Clamping pulls range errors to the limits but still flags unparseable cells
+X, errors = validate(frame, schema, 'clamp')
+assert list(errors.any(axis=1)) == [False, False, True, False, True]
+assert X.loc[1, 'pH_Value'] == 14 and X.loc[3, 'Rainfall'] == 0 and X.loc[3, 'Humidity'] == 100
+
+# Plausible readings outside the training data are valid, and flagged as such
+plausible = frame.iloc[[0]].assign(Nitrogen=400, Temperature=2)
+X, errors = validate(plausible, schema)
+assert not errors.any(axis=1).iloc[0]
+assert list(describe_errors(outside_training(X, schema))) == ['Nitrogen, Temperature']
+
+# Validation is column-wise, so a large batch costs a handful of array passes
+big = pd.concat([frame] * 40000, ignore_index=True)
+X, errors = validate(big, schema)
+assert int(errors.any(axis=1).sum()) == 4 * 40000
+
+# The chatbot reports bad fields instead of predicting on them
+problems = agro_core.input_errors('crop', dict(frame.iloc[3]))
+assert [p.split()[0] for p in problems] == ['Humidity', 'Rainfall']
+assert agro_core.input_errors('crop', dict(frame.iloc[0])) == []
+# Field readings the old training-range bounds refused are accepted with a warning
+reading = {'Temperature': 12, 'Humidity': 30, 'Moisture': 40, 'Nitrogen': 60, 'Potassium': 30, 'Phosphorus': 55}
+assert agro_core.input_errors('fertilizer', reading) == []
+warnings = agro_core.input_warnings('fertilizer', reading)
+assert [w.split()[0] for w in warnings] == ['Temperature', 'Humidity', 'Nitrogen', 'Potassium', 'Phosphorus']
+assert agro_core.input_warnings('crop', dict(frame.iloc[0])) == []
+
+# Batch scoring flags, drops or clamps bad rows without failing the chunk
+csv = frame.to_csv(index=False)
+for invalid, rows, valid in [('flag', 5, 1), ('drop', 1, 1), ('clamp', 5, 3)]:
+    out = io.StringIO()
+    score_stream('crop', io.StringIO(csv), out, chunksize=2, invalid=invalid)
+    scored = pd.read_csv(io.StringIO(out.getvalue()))
+    assert len(scored) == rows and int(scored['Valid'].sum()) == valid, invalid
+    assert scored.loc[~scored['Valid'], 'Predicted_Crop'].isna().all()
+    assert 'Warnings' in scored.columns
+
+fert = pd.read_csv('data_core.csv', nrows=4)
+fert.loc[1, 'Moisture'] = 500
+X, valid = agro_core.encode_fertilizer_frame(fert)
+assert list(valid) == [True, False, True, True]
+X, valid = agro_core.encode_fertilizer_frame(fert, policy='clamp')
+assert valid.all() and X.loc[1, 'Moisture'] == 100
+
+# The HTTP service flags bad rows individually
+result = score_crop_rows([dict(frame.iloc[1]), dict(frame.iloc[0])])
+assert not result[0]['valid'] and result[1]['valid']
+
+# Without the JSON file the schema is derived from the CSVs
+path = os.path.join(tempfile.mkdtemp(), 'missing.json')
+assert load_schema('crop', path) == schema
+with open(SCHEMA_FILE) as f:
+    assert set(json.load(f)) == {'crop', 'fertilizer'}
+
+print('\nTest complete')
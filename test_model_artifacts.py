@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import agro_core
+import model_artifacts
+
+# Export both models to a scratch directory, map them back and compare probabilities
+out_dir = tempfile.mkdtemp()
+
+crop_X = agro_core.crop_frame(pd.read_csv('sensor_Crop_Dataset.csv', nrows=200))
+fert_X, valid = agro_core.encode_fertilizer_frame(pd.read_csv('data_core.csv', nrows=200))
+fert_X = fert_X[valid].astype('int64')
+
+for name, X in [('crop_model', crop_X), ('fertilizer_model', fert_X)]:
+    # Always start from the pickle, even if agro_core would pick up existing artifacts
+    original = joblib.load(agro_core.model_path(name))
+    path = os.path.join(out_dir, name)
+    model_artifacts.export_model(original, path, source=agro_core.model_path(name))
+    packed = model_artifacts.load_model(path)
+
+    expected = original.predict_proba(X)
+    got = packed.predict_proba(X)
+    if not isinstance(expected, list):
+        expected, got = [expected], [got]
+    for e, g in zip(expected, got):
+        assert np.allclose(e, g, atol=1e-9), name
+    assert (np.asarray(original.predict(X)) == np.asarray(packed.predict(X))).all(), name
+    assert model_artifacts.is_fresh(path, agro_core.model_path(name))
+    print(f"{name}: artifacts match on {len(X)} rows")
+
+print('\nTest complete')
@@ -0,0 +1,63 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import agro_core
+from prediction_cache import PredictionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# LRU eviction and TTL expiry
+clock = FakeClock()
+cache = PredictionCache(maxsize=2, ttl=10, clock=clock)
+cache.put('a', 1)
+cache.put('b', 2)
+assert cache.get('a') == 1          # 'a' is now most recently used
+cache.put('c', 3)                   # evicts 'b'
+assert cache.get('b') is None and cache.evictions == 1
+clock.now = 11
+assert cache.get('a') is None and cache.expirations == 1
+print('LRU/TTL:', cache.stats())
+
+# Changing a watched file clears the cache and calls the hook
+fd, source = tempfile.mkstemp()
+os.close(fd)
+reloaded = []
+cache = PredictionCache(maxsize=8, sources=[source], on_invalidate=lambda: reloaded.append(1),
+                        check_interval=0)
+cache.put('a', 1)
+with open(source, 'w') as f:
+    f.write('new model')
+assert cache.check_sources() and cache.get('a') is None and reloaded == [1]
+os.remove(source)
+print('Invalidation:', cache.stats())
+
+# Cached predictions match uncached ones, and repeats never reach the model
+crop_X = agro_core.crop_frame(pd.read_csv('sensor_Crop_Dataset.csv', nrows=20))
+fert_X, _ = agro_core.encode_fertilizer_frame(pd.read_csv('data_core.csv', nrows=20))
+expected_crop = agro_core.predict_crop(crop_X)
+expected_fert = agro_core.predict_fertilizer(fert_X)
+
+agro_core.enable_cache(maxsize=100)
+for _ in range(2):
+    got_crop = agro_core.predict_crop(crop_X)
+    got_fert = agro_core.predict_fertilizer(fert_X)
+    for expected, got in [(expected_crop, got_crop), (expected_fert, got_fert)]:
+        for target, (names, proba) in expected.items():
+            assert list(got[target][0]) == list(names)
+            assert np.array_equal(got[target][1], proba)
+stats = agro_core.cache_stats()
+assert stats['misses'] == 40 and stats['hits'] == 40
+agro_core.disable_cache()
+print('Model cache:', stats)
+
+print('\nTest complete')
@@ -0,0 +1,64 @@
+import io
+import itertools
+
+import numpy as np
+import pandas as pd
+
+import agro_core
+from agro_server import score_crop_rows, score_fertilizer_rows
+from batch_score import score_stream
+from ranking import combination_codes, joint_top_k, top_k
+
+rng = np.random.default_rng(0)
+
+# top_k agrees with a full sort, best first
+proba = rng.dirichlet(np.ones(30), size=500)
+index, top = top_k(proba, 5)
+assert (index == np.argsort(-proba, axis=1)[:, :5]).all()
+assert np.allclose(top, np.sort(proba, axis=1)[:, ::-1][:, :5])
+assert top_k(proba[:, :2], 5)[0].shape == (500, 2)
+
+# Joint top k over independent outputs matches ranking the full product
+probas = [rng.dirichlet(np.ones(c), size=200) for c in (6, 4, 5)]
+full = np.einsum('na,nb,nc->nabc', *probas).reshape(200, -1)
+codes, top = joint_top_k(probas, 4)
+assert np.allclose(top, np.sort(full, axis=1)[:, ::-1][:, :4])
+flat = np.ravel_multi_index(tuple(codes[..., i] for i in range(3)), (6, 4, 5))
+assert np.allclose(np.take_along_axis(full, flat, axis=1), top)
+
+# Restricted to an allowed list, scores renormalize over it
+allowed = np.array(list(itertools.product(range(6), range(4), range(5))))[::7]
+codes, top = joint_top_k(probas, 3, allowed)
+scores = full[:, np.ravel_multi_index(allowed.T, (6, 4, 5))]
+scores /= scores.sum(axis=1, keepdims=True)
+assert np.allclose(top, np.sort(scores, axis=1)[:, ::-1][:, :3])
+assert {tuple(c) for c in codes.reshape(-1, 3)} <= {tuple(c) for c in allowed}
+assert combination_codes([('a', 'x'), ('b', 'zz')], [['a', 'b'], ['x', 'y']]).tolist() == [[0, 0]]
+
+# Crop plans only use (Crop, Soil_Type, Variety) combinations seen in training
+crop = pd.read_csv('sensor_Crop_Dataset.csv', nrows=50)
+results = agro_core.predict_crop(agro_core.crop_frame(crop))
+plans, plan_probs = agro_core.rank_crop_plans(results, 3)
+observed = set(agro_core.crop_combinations())
+assert plans.shape == (50, 3, 3) and all(tuple(p) in observed for p in plans.reshape(-1, 3))
+assert (np.diff(plan_probs, axis=1) <= 0).all() and (plan_probs.sum(axis=1) <= 1 + 1e-9).all()
+labels, top = agro_core.rank(results, 2)['Crop']
+assert (labels[:, 0] == agro_core.top_labels(*results['Crop'])[0]).all()
+
+# Batch scoring adds ranked columns per output and for whole plans
+out = io.StringIO()
+score_stream('crop', io.StringIO(crop.head(5).to_csv(index=False)), out, top_k=2)
+scored = pd.read_csv(io.StringIO(out.getvalue()))
+assert {'Top1_Crop', 'Top2_Crop_Probability', 'Top1_Plan', 'Top2_Plan_Probability'} <= set(scored.columns)
+assert (scored['Top1_Crop'] == scored['Predicted_Crop']).all()
+assert scored['Top1_Plan'].str.count(' / ').eq(2).all()
+
+# The HTTP service returns them with each prediction
+row = score_crop_rows(crop.head(1).to_dict('records'), top_k=3)[0]
+assert len(row['Crop']['top_k']) == 3 and len(row['plans']) == 3
+assert row['Crop']['top_k'][0][0] == row['Crop']['label']
+fert = pd.read_csv('data_core.csv', nrows=1)
+row = score_fertilizer_rows(fert.to_dict('records'), top_k=2)[0]['FertilizerName']
+assert row['top_k'][0][1] >= row['top_k'][1][1]
+
+print('\nTest complete')
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from batch_score import score_stream
+from sharded_score import plan_shards, score_file
+
+tmp = tempfile.mkdtemp()
+inputs = {
+    'crop': os.path.join(tmp, 'crop.csv'),
+    'fertilizer': os.path.join(tmp, 'fertilizer.csv'),
+}
+pd.read_csv('sensor_Crop_Dataset.csv', nrows=300).to_csv(inputs['crop'], index=False)
+fertilizer = pd.read_csv('data_core.csv', nrows=2000)
+# Misspelled soil types in two different shards, for the codec correction report
+fertilizer.loc[[5, 1900], 'Soil_Type'] = ['sandy ', 'Loamyy']
+fertilizer.to_csv(inputs['fertilizer'], index=False)
+
+# Shards cover the data exactly once and every cut lands on a row boundary
+header, shards = plan_shards(inputs['fertilizer'], shard_bytes=4096)
+with open(inputs['fertilizer'], 'rb') as f:
+    data = f.read()
+assert shards[0][0] == len(header) and shards[-1][1] == len(data)
+assert all(a[1] == b[0] for a, b in zip(shards, shards[1:]))
+assert all(data[start - 1:start] == b'\n' for start, _ in shards)
+print(f"Planned {len(shards)} shards")
+
+for kind, path in inputs.items():
+    expected = os.path.join(tmp, kind + '_expected.csv')
+    expected_corrections = {}
+    with open(expected, 'w', newline='') as writer:
+        score_stream(kind, path, writer, corrections=expected_corrections)
+
+    # Sharded output matches the single-process stream byte for byte, and the shards'
+    # codec corrections add up to the stream's
+    output = os.path.join(tmp, kind + '_sharded.csv')
+    corrections = {}
+    rows = score_file(kind, path, output, workers=2, shard_bytes=4096, keep_shards=True,
+                      corrections=corrections)
+    with open(expected, 'rb') as a, open(output, 'rb') as b:
+        assert a.read() == b.read()
+    assert corrections == expected_corrections
+    assert kind == 'crop' or set(corrections['Soil_Type']) == {'sandy ', 'Loamyy'}
+
+    # The layout does not depend on the worker count: another --workers resumes every shard
+    calls = []
+    corrections = {}
+    score_file(kind, path, output, workers=3, shard_bytes=4096, keep_shards=True, corrections=corrections,
+               progress=lambda finished, total, n, resumed: calls.append((finished, total, resumed)))
+    assert calls == [(calls[0][1], calls[0][1], calls[0][1])]
+    assert corrections == expected_corrections
+
+    # Simulate a crash: drop one finished shard and rerun; only that shard is rescored
+    work_dir = output + '.shards'
+    os.remove(os.path.join(work_dir, 'shard-00001.csv.done'))
+    calls = []
+    score_file(kind, path, output, workers=2, shard_bytes=4096,
+               progress=lambda finished, total, n, resumed: calls.append((finished, total, resumed)))
+    assert calls[0][2] == calls[0][1] - 1 and calls[-1][0] == calls[-1][1]
+    assert not os.path.exists(work_dir)
+    with open(expected, 'rb') as a, open(output, 'rb') as b:
+        assert a.read() == b.read()
+    print(f"{kind}: {rows} rows, resumed {calls[0][2]}/{calls[0][1]} shards")
+
+shutil.rmtree(tmp)
+
+print('\nTest complete')
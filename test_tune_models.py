@@ -0,0 +1,94 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import Crop_training_model as crop_training
+import Fertilizer_training_model as fertilizer_training
+from dataset_cache import cache_path
+from training_utils import load_params, plan_workers
+from tune_models import (candidates, cv_folds, default_space, halving_schedule, parse_params,
+                         round_splits, successive_halving, tune)
+
+tmp = tempfile.mkdtemp()
+
+# Search space parsing
+space = parse_params(['n_estimators=50,100', 'max_depth=None,10', "max_features=sqrt,0.5"])
+assert space == {'n_estimators': [50, 100], 'max_depth': [None, 10], 'max_features': ['sqrt', 0.5]}
+assert len(candidates(space, 100)) == 8
+assert len(candidates(space, 5)) == 5
+for profile in crop_training.PROFILES:
+    crop_training.build_model(profile, 1).set_params(**candidates(default_space('crop', profile), 1)[0])
+
+# Worker plans: every (output, member) fit gets a worker, the rest become forest threads
+assert plan_workers(4, n_fits=9, n_threaded=3) == {'fits': 4, 'threads': 1}
+assert plan_workers(16, n_fits=9, n_threaded=3) == {'fits': 9, 'threads': 3}
+assert plan_workers(16, n_fits=9, n_threaded=6) == {'fits': 9, 'threads': 2}
+for profile in crop_training.PROFILES:
+    for n_jobs in range(1, 40):
+        plan = crop_training.worker_plan(profile, n_jobs)
+        threaded = len(crop_training.TARGETS) * len(plan['threaded'])
+        assert plan['fits'] + threaded * (plan['threads'] - 1) <= n_jobs
+
+# Rounds grow by the factor and the last one uses every row
+assert halving_schedule(27, 9000, factor=3, min_rows=100) == [1000, 3000, 9000]
+assert halving_schedule(9, 9000, factor=3, min_rows=2000) == [3000, 9000]
+assert halving_schedule(1, 500) == [500]
+
+# Folds are cached next to the dataset cache and nested across rounds
+data = os.path.join(tmp, 'data_core.csv')
+pd.read_csv('data_core.csv').head(1500).to_csv(data, index=False)
+X_train, X_test, y_train, y_test, _ = fertilizer_training.load_data(data)
+order, fold = cv_folds(len(X_train), 3, data)
+cached = [f for f in os.listdir(cache_path(data)) if f.startswith('cv_folds_')]
+assert len(cached) == 1
+again_order, again_fold = cv_folds(len(X_train), 3, data)
+assert np.array_equal(order, again_order) and np.array_equal(fold, again_fold)
+small = round_splits(order, fold, 300, 3)
+large = round_splits(order, fold, 900, 3)
+for (small_train, small_val), (large_train, large_val) in zip(small, large):
+    assert not set(small_train) & set(small_val)
+    assert set(small_val) <= set(large_val)
+
+# Successive halving keeps the most accurate candidates and reports latency for each trial
+space = {'n_estimators': [5, 40], 'max_depth': [2, None], 'min_samples_leaf': [1, 5]}
+best, history = successive_halving('fertilizer', X_train, y_train, space, n_candidates=8, n_folds=3,
+                                   min_rows=200, n_jobs=1, data_path=data, verbose=False)
+rounds = sorted({e['round'] for e in history})
+assert rounds == [0, 1]
+assert len([e for e in history if e['round'] == 0]) == 8
+assert len([e for e in history if e['round'] == 1]) == 3
+last = [e for e in history if e['round'] == 1]
+assert best['accuracy'] == max(e['accuracy'] for e in last)
+assert all(e['latency_ms'] > 0 and e['batch_ms_per_1k'] > 0 for e in history)
+
+# A latency budget drops the slow configurations
+budget = float(np.median([e['latency_ms'] for e in history if e['round'] == 0]))
+best, history = successive_halving('fertilizer', X_train, y_train, space, n_candidates=8, n_folds=3,
+                                   min_rows=200, latency_budget=budget, n_jobs=1, data_path=data,
+                                   verbose=False)
+assert best['within_budget']
+
+# The crop ensemble is tuned through nested parameter names
+crop_data = os.path.join(tmp, 'sensor_Crop_Dataset.csv')
+pd.read_csv('sensor_Crop_Dataset.csv').head(900).to_csv(crop_data, index=False)
+X_train, X_test, y_train, y_test, _ = crop_training.load_data(crop_data)
+best, history = successive_halving('crop', X_train, y_train, {'estimator__rf__n_estimators': [5, 10]},
+                                   profile='fast', n_folds=2, min_rows=300, n_jobs=1, verbose=False)
+assert best['params']['estimator__rf__n_estimators'] in (5, 10)
+
+# The report is what the training scripts read back with --params
+output = os.path.join(tmp, 'tuning_fertilizer.json')
+report = tune('fertilizer', space={'n_estimators': [5, 10]}, data_path=data, output=output,
+              min_rows=300, n_jobs=1)
+with open(output) as f:
+    saved = json.load(f)
+assert saved['best_params'] == report['best_params']
+assert 'accuracy' in saved['holdout'] and 'latency_ms' in saved['holdout']
+assert load_params(output) == report['best_params']
+
+shutil.rmtree(tmp)
+print('\nTest complete')
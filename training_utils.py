@@ -0,0 +1,151 @@
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+# Small helpers shared by the training scripts.
+
+
+# ================= STAGE TIMING =================
+
+@contextmanager
+def timed(stage, times):
+    # Record the wall-clock seconds spent in a block under times[stage]
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        times[stage] = times.get(stage, 0.0) + time.perf_counter() - start
+
+
+def print_stage_times(times, title="Stage timings"):
+    total = sum(times.values())
+    print(f"\n⏱️ {title}")
+    for stage, seconds in times.items():
+        share = seconds / total * 100 if total else 0.0
+        print(f"  {stage:<12} {seconds:>8.2f}s  {share:>5.1f}%")
+    print(f"  {'total':<12} {total:>8.2f}s")
+
+
+# ================= WORKER BUDGET =================
+
+def resolve_n_jobs(n_jobs):
+    # sklearn convention: None/1 sequential, -1 all cores, -2 all but one, ...
+    cores = os.cpu_count() or 1
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(1, cores + 1 + n_jobs)
+    return max(1, n_jobs)
+
+
+def plan_workers(n_jobs, n_fits=1, n_threaded=0):
+    # Split a worker budget between fits that run side by side and threads inside them.
+    #
+    # joblib only parallelises two levels deep: a pool at the top, threads inside each
+    # worker, and anything nested below that runs sequentially. The n_fits independent
+    # fits therefore share one pool, and once every fit has its own worker, what is left
+    # goes as extra threads to the n_threaded fits that can use them (e.g. forests), so
+    # the total never exceeds the budget.
+    budget = resolve_n_jobs(n_jobs)
+    fits = min(n_fits, budget)
+    threads = 1
+    if fits == n_fits and n_threaded:
+        threads = 1 + (budget - n_fits) // n_threaded
+    return {'fits': fits, 'threads': threads}
+
+
+def plan_text(plan):
+    text = f"{plan['fits']} fits side by side"
+    if plan.get('threaded') and plan['threads'] > 1:
+        text += f", {plan['threads']} threads per {' / '.join(plan['threaded'])}"
+    return text
+
+
+def reset_n_jobs(estimator):
+    # Fitted estimators keep their n_jobs; reset them so saved models predict
+    # single-threaded instead of spinning up a worker pool for every call
+    if hasattr(estimator, 'n_jobs'):
+        estimator.n_jobs = None
+    for child in getattr(estimator, 'estimators_', None) or []:
+        reset_n_jobs(child)
+    inner = getattr(estimator, 'estimator', None)
+    if inner is not None and not isinstance(inner, str):
+        reset_n_jobs(inner)
+    return estimator
+
+
+# ================= TUNED PARAMETERS =================
+
+def load_params(path, profile=None):
+    # best_params of a tune_models.py report, or a plain {parameter: value} JSON file
+    with open(path) as f:
+        data = json.load(f)
+    if 'best_params' not in data:
+        return data
+    if profile is not None and data.get('profile') not in (None, profile):
+        raise ValueError(f"{path} was tuned for the {data['profile']} profile, not {profile}")
+    return data['best_params']
+
+
+# ================= SAVING AND CHECKPOINTS =================
+
+def dump_atomic(obj, path):
+    # Write to a temp file and swap it in, so a reader never loads a half-written pickle
+    import joblib
+    tmp_path = path + '.tmp'
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def print_progress(done, total, what):
+    # "[done/total]" lines are what bootstrap.py turns into a progress bar
+    print(f"⏳ [{done}/{total}] {what}", flush=True)
+
+
+def run_signature(estimator, *frames):
+    # Content hash of the training data plus the estimator's parameters (worker counts
+    # aside), so checkpoints of another dataset or configuration are never reused
+    import pandas as pd
+    h = 0
+    for frame in frames:
+        h = (h * 1000003 + int(pd.util.hash_pandas_object(frame, index=False).sum())) % 2 ** 63
+    params = {k: v for k, v in estimator.get_params().items()
+              if not k.endswith('n_jobs') and not hasattr(v, 'get_params')}
+    return {'data': str(h), 'params': params}
+
+
+class Checkpoints:
+    # Pickles of finished pieces of a training run, kept in one directory per run.
+    # A run whose signature (data hash, parameters, ...) differs from the stored one
+    # starts from an empty directory.
+    def __init__(self, directory, signature):
+        self.directory = directory
+        self.signature = json.loads(json.dumps(signature, sort_keys=True, default=str))
+        manifest = os.path.join(directory, 'manifest.json')
+        try:
+            with open(manifest) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = None
+        if stored != self.signature:
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory)
+            with open(manifest + '.tmp', 'w') as f:
+                json.dump(self.signature, f)
+            os.replace(manifest + '.tmp', manifest)
+
+    def path(self, name):
+        return os.path.join(self.directory, name + '.pkl')
+
+    def load(self, name):
+        import joblib
+        path = self.path(name)
+        return joblib.load(path) if os.path.exists(path) else None
+
+    def save(self, name, obj):
+        dump_atomic(obj, self.path(name))
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
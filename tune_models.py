@@ -0,0 +1,310 @@
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+import Crop_training_model as crop_training
+import Fertilizer_training_model as fertilizer_training
+from dataset_cache import cache_path, CACHE_DIR
+from training_utils import timed, print_stage_times, resolve_n_jobs, reset_n_jobs
+
+# Successive-halving hyperparameter search for the crop ensemble and the fertilizer forest.
+#
+# Every candidate configuration is cross-validated on a small share of the training rows;
+# the best third (--factor) moves on to a round with three times as many rows, until the
+# last round runs on all of them. All (candidate, fold) fits of a round run in parallel
+# across the worker budget, each single-threaded.
+#
+# The folds are fixed once per dataset: a row permutation and a fold id per row, stored
+# in the dataset's columnar cache directory (so they are dropped whenever the CSV changes)
+# and reused by every round, candidate and later run. Round i uses the first n_i rows of
+# the permutation, so smaller rounds are nested in larger ones.
+#
+# Each trial reports cross-validated accuracy (exact-match subset accuracy for the crop
+# targets) and the inference latency of the fitted model: median single-row predict_proba
+# time, as the chatbot and server see it, and batch time per 1000 rows. With
+# --latency-budget, candidates slower than the budget are dropped before each promotion.
+# Latencies are measured in the workers, so they are comparable within one run.
+
+DEFAULT_FACTOR = 3
+DEFAULT_FOLDS = 3
+DEFAULT_CANDIDATES = 27
+DEFAULT_MIN_ROWS = 500
+LATENCY_REPEATS = 10
+
+CROP_SPACES = {
+    'full': {
+        'estimator__rf__n_estimators': [50, 100, 200],
+        'estimator__rf__max_depth': [None, 10, 20],
+        'estimator__dt__max_depth': [None, 10],
+        'estimator__svc__C': [0.5, 1.0, 2.0],
+        'estimator__svc__gamma': ['scale', 0.1],
+    },
+    'fast': {
+        'estimator__rf__n_estimators': [50, 100, 200],
+        'estimator__rf__max_depth': [None, 10, 20],
+        'estimator__dt__max_depth': [None, 10],
+        'estimator__svc__estimator__ridgeclassifier__alpha': [0.1, 1.0, 10.0],
+        'estimator__svc__estimator__nystroem__gamma': [None, 0.1],
+    },
+}
+
+FERTILIZER_SPACE = {
+    'n_estimators': [50, 100, 200, 400],
+    'max_depth': [None, 10, 20],
+    'min_samples_leaf': [1, 2, 5],
+    'max_features': ['sqrt', 0.5],
+}
+
+
+# ================= SEARCH SPACE =================
+
+def parse_value(text):
+    # JSON values (numbers, null, true, quoted strings); bare words stay strings
+    if text == 'None':
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def parse_params(specs):
+    # ['name=v1,v2', ...] -> {name: [v1, v2]}
+    space = {}
+    for spec in specs:
+        name, sep, values = spec.partition('=')
+        if not sep or not values:
+            raise ValueError(f"expected name=value[,value...], got {spec!r}")
+        space[name.strip()] = [parse_value(v.strip()) for v in values.split(',')]
+    return space
+
+
+def default_space(kind, profile='full'):
+    return dict(CROP_SPACES[profile]) if kind == 'crop' else dict(FERTILIZER_SPACE)
+
+
+def candidates(space, n_candidates, seed=42):
+    # The whole grid when it is small enough, otherwise a random sample of it
+    grid = ParameterGrid(space)
+    if len(grid) <= n_candidates:
+        return list(grid)
+    return list(ParameterSampler(space, n_candidates, random_state=seed))
+
+
+def build(kind, profile, params):
+    model = crop_training.build_model(profile, 1) if kind == 'crop' else fertilizer_training.build_model(1)
+    return model.set_params(**params)
+
+
+# ================= CV FOLDS =================
+
+def cv_folds(n_rows, n_folds, data_path=None, seed=42):
+    # (row permutation, fold id per row), cached next to the dataset's columnar cache;
+    # the folds only depend on the row count, so the float32 or float64 cache will do
+    cache_file = None
+    cached = [d for d in (cache_path(data_path, numeric_dtype=t) for t in (np.float32, np.float64))
+              if os.path.isdir(d)] if data_path and CACHE_DIR else []
+    if cached:
+        cache_file = os.path.join(cached[0], f'cv_folds_{n_rows}_{n_folds}_{seed}.npz')
+        if os.path.exists(cache_file):
+            with np.load(cache_file) as saved:
+                return saved['order'], saved['fold']
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(n_rows)
+    fold = np.arange(n_rows) % n_folds
+    if cache_file:
+        tmp_file = cache_file + '.tmp.npz'
+        np.savez(tmp_file, order=order, fold=fold)
+        os.replace(tmp_file, cache_file)
+    return order, fold
+
+
+def round_splits(order, fold, n_rows, n_folds):
+    # (train rows, validation rows) per fold for the first n_rows of the permutation
+    rows = order[:n_rows]
+    ids = fold[:n_rows]
+    return [(rows[ids != k], rows[ids == k]) for k in range(n_folds)]
+
+
+# ================= TRIALS =================
+
+def measure_latency(model, X, repeats=LATENCY_REPEATS):
+    # (median single-row predict_proba ms, ms per 1000 rows in one batch call)
+    single = []
+    for i in range(min(repeats, len(X))):
+        row = X.iloc[i:i + 1]
+        start = time.perf_counter()
+        model.predict_proba(row)
+        single.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    model.predict_proba(X)
+    batch = time.perf_counter() - start
+    return float(np.median(single)) * 1000, batch / len(X) * 1e6
+
+
+def accuracy(model, X, y):
+    # Exact-match (subset) accuracy; the same as model.score for both models
+    pred = np.asarray(model.predict(X)).reshape(len(X), -1)
+    return float((pred == np.asarray(y).reshape(len(X), -1)).all(axis=1).mean())
+
+
+def run_trial(kind, profile, params, X, y, train_rows, val_rows):
+    model = build(kind, profile, params)
+    start = time.perf_counter()
+    model.fit(X.iloc[train_rows], y.iloc[train_rows])
+    fit_s = time.perf_counter() - start
+    reset_n_jobs(model)
+    X_val, y_val = X.iloc[val_rows], y.iloc[val_rows]
+    single_ms, batch_ms = measure_latency(model, X_val)
+    return {'accuracy': accuracy(model, X_val, y_val), 'fit_s': fit_s,
+            'latency_ms': single_ms, 'batch_ms_per_1k': batch_ms}
+
+
+def summarize(trials):
+    keys = trials[0].keys()
+    summary = {k: float(np.mean([t[k] for t in trials])) for k in keys}
+    summary['accuracy_std'] = float(np.std([t['accuracy'] for t in trials]))
+    return summary
+
+
+# ================= SUCCESSIVE HALVING =================
+
+def halving_schedule(n_candidates, n_rows, factor=DEFAULT_FACTOR, min_rows=DEFAULT_MIN_ROWS):
+    # Rows per round: grows by `factor` and ends at n_rows
+    rounds = max(1, math.ceil(math.log(max(n_candidates, 1), factor)))
+    first = max(min(min_rows, n_rows), n_rows // factor ** (rounds - 1))
+    return [min(n_rows, first * factor ** i) for i in range(rounds - 1)] + [n_rows]
+
+
+def successive_halving(kind, X, y, space, profile='full', n_candidates=DEFAULT_CANDIDATES,
+                       factor=DEFAULT_FACTOR, n_folds=DEFAULT_FOLDS, min_rows=DEFAULT_MIN_ROWS,
+                       latency_budget=None, n_jobs=-1, data_path=None, seed=42, verbose=True):
+    configs = candidates(space, n_candidates, seed)
+    order, fold = cv_folds(len(X), n_folds, data_path, seed)
+    alive = list(range(len(configs)))
+    history = []
+    schedule = halving_schedule(len(configs), len(X), factor, min_rows)
+    for round_no, n_rows in enumerate(schedule):
+        splits = round_splits(order, fold, n_rows, n_folds)
+        results = Parallel(n_jobs=resolve_n_jobs(n_jobs))(
+            delayed(run_trial)(kind, profile, configs[c], X, y, train_rows, val_rows)
+            for c in alive for train_rows, val_rows in splits)
+        scored = []
+        for i, c in enumerate(alive):
+            summary = summarize(results[i * n_folds:(i + 1) * n_folds])
+            entry = {'round': round_no, 'rows': n_rows, 'candidate': c, 'params': configs[c], **summary}
+            entry['within_budget'] = latency_budget is None or summary['latency_ms'] <= latency_budget
+            history.append(entry)
+            scored.append(entry)
+        if verbose:
+            print_round(round_no, n_rows, scored)
+
+        eligible = [e for e in scored if e['within_budget']] or scored
+        eligible.sort(key=lambda e: (-e['accuracy'], e['latency_ms']))
+        keep = 1 if round_no == len(schedule) - 1 else max(1, math.ceil(len(alive) / factor))
+        alive = [e['candidate'] for e in eligible[:keep]]
+
+    best = next(e for e in reversed(history) if e['candidate'] == alive[0])
+    return best, history
+
+
+def short_name(param):
+    # 'estimator__rf__max_depth' -> 'rf.max_depth'
+    return '.'.join(param.split('__')[-2:])
+
+
+def print_round(round_no, n_rows, entries):
+    print(f"\n🔎 Round {round_no + 1}: {len(entries)} candidates on {n_rows} rows")
+    print(f"{'#':>4} {'accuracy':>9} {'± std':>7} {'latency ms':>11} {'ms / 1k':>8} {'fit s':>7}  params")
+    for e in sorted(entries, key=lambda e: -e['accuracy']):
+        flag = '' if e['within_budget'] else ' (over budget)'
+        params = ', '.join(f"{short_name(k)}={v}" for k, v in e['params'].items())
+        print(f"{e['candidate']:>4} {e['accuracy']:>9.4f} {e['accuracy_std']:>7.4f} {e['latency_ms']:>11.2f} "
+              f"{e['batch_ms_per_1k']:>8.1f} {e['fit_s']:>7.2f}  {params}{flag}")
+
+
+# ================= COMMAND =================
+
+def tune(kind, profile='full', space=None, data_path=None, output=None, n_candidates=DEFAULT_CANDIDATES,
+         factor=DEFAULT_FACTOR, n_folds=DEFAULT_FOLDS, min_rows=DEFAULT_MIN_ROWS, latency_budget=None,
+         n_jobs=-1, refit=True, seed=42, times=None):
+    times = {} if times is None else times
+    module = crop_training if kind == 'crop' else fertilizer_training
+    space = space or default_space(kind, profile)
+    data_path = data_path or ('sensor_Crop_Dataset.csv' if kind == 'crop' else 'data_core.csv')
+    output = output or f'tuning_{kind}.json'
+
+    X_train, X_test, y_train, y_test, _ = module.load_data(data_path, times)
+
+    with timed('search', times):
+        best, history = successive_halving(kind, X_train, y_train, space, profile, n_candidates, factor,
+                                           n_folds, min_rows, latency_budget, n_jobs, data_path, seed)
+    print(f"\n🏆 Best configuration (candidate {best['candidate']}): {best['params']}")
+    print(f"   CV accuracy {best['accuracy']:.4f}, latency {best['latency_ms']:.2f} ms/row")
+
+    report = {'kind': kind, 'profile': profile if kind == 'crop' else None,
+              'best_params': best['params'], 'best': best, 'space': space,
+              'latency_budget_ms': latency_budget, 'trials': history}
+    if refit:
+        # The chosen configuration on the whole training split, scored on the held-out test split
+        model = build(kind, profile, best['params'])
+        if hasattr(model, 'n_jobs'):
+            model.set_params(n_jobs=resolve_n_jobs(n_jobs))
+        with timed('refit', times):
+            model.fit(X_train, y_train)
+        reset_n_jobs(model)
+        single_ms, batch_ms = measure_latency(model, X_test)
+        report['holdout'] = {'accuracy': accuracy(model, X_test, y_test),
+                             'latency_ms': single_ms, 'batch_ms_per_1k': batch_ms}
+        print(f"📊 Test split: accuracy {report['holdout']['accuracy']:.4f}, "
+              f"latency {single_ms:.2f} ms/row")
+
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"💾 Wrote {output} (train with: --params {output})")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Successive-halving hyperparameter search.")
+    parser.add_argument('kind', choices=['crop', 'fertilizer'])
+    parser.add_argument('--profile', choices=crop_training.PROFILES, default='full',
+                        help="crop training profile whose ensemble is tuned")
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=V1,V2',
+                        help="search values for one parameter (repeatable; replaces the default space)")
+    parser.add_argument('--space', help="JSON file {parameter: [values]} replacing the default space")
+    parser.add_argument('--data', help="dataset CSV")
+    parser.add_argument('--output', help="where to write the best configuration (default tuning_<kind>.json)")
+    parser.add_argument('--candidates', type=int, default=DEFAULT_CANDIDATES,
+                        help="configurations sampled when the grid is larger")
+    parser.add_argument('--factor', type=int, default=DEFAULT_FACTOR, help="halving factor")
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS, help="CV folds")
+    parser.add_argument('--min-rows', type=int, default=DEFAULT_MIN_ROWS, help="rows in the first round")
+    parser.add_argument('--latency-budget', type=float, default=None,
+                        help="drop candidates slower than this many ms per single-row prediction")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="parallel trials (-1 = all cores)")
+    parser.add_argument('--no-refit', action='store_true', help="skip the refit on the whole training split")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    space = None
+    if args.space:
+        with open(args.space) as f:
+            space = json.load(f)
+    if args.param:
+        space = parse_params(args.param)
+
+    times = {}
+    tune(args.kind, args.profile, space, args.data, args.output, args.candidates, args.factor,
+         args.folds, args.min_rows, args.latency_budget, args.n_jobs, not args.no_refit, args.seed, times)
+    print_stage_times(times)
+
+
+if __name__ == '__main__':
+    main()